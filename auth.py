@@ -4,8 +4,9 @@ from datetime import datetime, timedelta
 import hmac
 import hashlib
 import base64
+import time
 
-from config import BOT_SECRET_KEY
+from config import BOT_SECRET_KEY, GOOGLE_SHEETS_WEBHOOK_SECRET, GOOGLE_SHEETS_WEBHOOK_MAX_AGE
 
 SECRET_KEY = "mysecretkey"
 ALGORITHM = "HS256"
@@ -54,4 +55,34 @@ def verify_bot_token(token: str) -> dict:
 
         return data
     except Exception as e:
-        raise ValueError(f"Неверный токен: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Неверный токен: {str(e)}")
+
+
+def is_sheets_webhook_configured() -> bool:
+    """
+    Проверяет, что секрет вебхука задан (не пустой и не заглушка из config.py).
+    """
+    return GOOGLE_SHEETS_WEBHOOK_SECRET not in ("", "...")
+
+
+def verify_sheets_webhook_signature(body: bytes, timestamp: str, signature: str):
+    """
+    Проверяет подпись вебхука из Apps Script: HMAC-SHA256 от строки "<timestamp>.<тело запроса>".
+    """
+    if not is_sheets_webhook_configured():
+        # С известным секретом-заглушкой подписать запрос может кто угодно
+        raise ValueError("Секрет вебхука не настроен.")
+
+    try:
+        request_time = int(timestamp)
+    except (TypeError, ValueError):
+        raise ValueError("Некорректная метка времени запроса.")
+
+    if abs(time.time() - request_time) > GOOGLE_SHEETS_WEBHOOK_MAX_AGE:
+        raise ValueError("Запрос устарел.")
+
+    signed_data = f"{timestamp}.".encode() + body
+    expected_signature = hmac.new(GOOGLE_SHEETS_WEBHOOK_SECRET.encode(), signed_data, hashlib.sha256).hexdigest()
+
+    if not signature or not hmac.compare_digest(signature.lower(), expected_signature):
+        raise ValueError("Подпись запроса не совпадает.")
@@ -0,0 +1,91 @@
+# Замер скорости категоризации по ключевым словам на синтетическом наборе
+#
+# python benchmark_keyword_classifier.py                         - 500 слов, 100 000 описаний
+# python benchmark_keyword_classifier.py --keywords 2000 --rows 200000
+#
+# Сравнивает регулярное выражение по префиксному дереву (KeywordClassifier) с простым
+# перечислением слов через "|" и проверяет, что оба дают одинаковые категории.
+
+import argparse
+import random
+import re
+import time
+
+from utils.tinkoff.expense_classifier import KeywordClassifier
+
+
+ALPHABET = "абвгдежзиклмнопрстуфхцчшэюяabcdefghiklmnoprstuvwxyz"
+PREFIXES = ["аптека", "азс", "кафе", "магазин", "такси", "market", "shop", "pay", "yandex", "ozon"]
+
+
+def make_keywords(count, rng):
+    """Ключевые слова разной длины, многие с общими префиксами, как названия сетей и магазинов."""
+    keywords = set()
+    while len(keywords) < count:
+        word = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 8)))
+        keywords.add(f"{rng.choice(PREFIXES)} {word}" if rng.random() < 0.5 else word)
+    return sorted(keywords)
+
+
+def make_descriptions(keywords, count, hit_share, rng):
+    """Описания расходов: часть содержит ключевое слово в случайном регистре, остальные - шум."""
+    descriptions = []
+    for _ in range(count):
+        noise = "".join(rng.choice(ALPHABET + " 0123456789") for _ in range(rng.randint(15, 40)))
+        if rng.random() < hit_share:
+            keyword = rng.choice(keywords)
+            position = rng.randint(0, len(noise))
+            descriptions.append(f"{noise[:position]} {keyword.upper() if rng.random() < 0.5 else keyword} {noise[position:]}")
+        else:
+            descriptions.append(noise)
+    return descriptions
+
+
+class AlternationClassifier(KeywordClassifier):
+    """Те же ключевые слова одним перечислением через "|" (длинные слова первыми) - точка сравнения."""
+
+    def __init__(self, keywords):
+        super().__init__(keywords)
+        if self.categories:
+            words = sorted(self.categories, key=len, reverse=True)
+            self.pattern = re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+
+
+def measure(classifier, descriptions):
+    started = time.perf_counter()
+    matches = [classifier.classify(description) for description in descriptions]
+    elapsed = time.perf_counter() - started
+    return matches, len(descriptions) / elapsed if elapsed else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер скорости категоризации по ключевым словам")
+    parser.add_argument("--keywords", type=int, default=500, help="Число ключевых слов")
+    parser.add_argument("--rows", type=int, default=100000, help="Число описаний")
+    parser.add_argument("--hit-share", type=float, default=0.3, help="Доля описаний с ключевым словом")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keywords = make_keywords(args.keywords, rng)
+    descriptions = make_descriptions(keywords, args.rows, args.hit_share, rng)
+    triples = [(keyword, index % 20, f"Категория {index % 20}") for index, keyword in enumerate(keywords)]
+
+    started = time.perf_counter()
+    trie = KeywordClassifier(triples)
+    print(f"Сборка выражения по дереву: {time.perf_counter() - started:.3f} с, длина {len(trie.pattern.pattern)} символов")
+    alternation = AlternationClassifier(triples)
+
+    trie_matches, trie_speed = measure(trie, descriptions)
+    alternation_matches, alternation_speed = measure(alternation, descriptions)
+
+    mismatches = sum(1 for left, right in zip(trie_matches, alternation_matches) if left != right)
+    print(f"{len(keywords)} слов, {len(descriptions)} описаний, "
+          f"с категорией: {sum(1 for match in trie_matches if match)}")
+    print(f"Дерево:       {trie_speed:>10.0f} строк/с")
+    print(f"Перечисление: {alternation_speed:>10.0f} строк/с")
+    print(f"Ускорение: {trie_speed / alternation_speed:.1f}x, расхождений: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Замер скорости перевода дат выгрузки в юникс время и обратно на синтетическом наборе
+#
+# python benchmark_time_utils.py                                 - 100 000 строк, Europe/Moscow
+# python benchmark_time_utils.py --rows 200000 --timezone Europe/Berlin
+#
+# Сравнивает быстрый путь time_utils (разбор срезами и постоянное смещение пояса) с прежним
+# strptime + pytz.timezone().localize и с упрощённым вариантом: tz.localize по закэшированному поясу.
+# Проверяет, что все способы дают одинаковый результат.
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from utils.tinkoff.time_utils import (
+    DATE_TIME_FORMAT,
+    EPOCH,
+    format_unix_times,
+    get_timezone,
+    get_unix_time_ms_from_string,
+    parse_date_time
+)
+
+
+def make_date_strings(count, rng):
+    """Даты операций за последние два года с точностью до секунды, как в выгрузке банка."""
+    started = datetime(2025, 1, 1)
+    return [
+        (started + timedelta(seconds=rng.randint(0, 2 * 365 * 24 * 60 * 60))).strftime(DATE_TIME_FORMAT)
+        for _ in range(count)
+    ]
+
+
+def parse_strptime_localize(date_strings, timezone_str):
+    """Прежняя реализация get_unix_time_ms_from_string."""
+    return [
+        int(pytz.timezone(timezone_str).localize(datetime.strptime(date_str, DATE_TIME_FORMAT)).timestamp() * 1000)
+        for date_str in date_strings
+    ]
+
+
+def parse_cached_localize(date_strings, timezone_str):
+    """Без внутренних полей pytz: разбор срезами и localize по закэшированному поясу."""
+    tz = get_timezone(timezone_str)
+    return [int(tz.localize(parse_date_time(date_str)).timestamp() * 1000) for date_str in date_strings]
+
+
+def parse_fast(date_strings, timezone_str):
+    return [get_unix_time_ms_from_string(date_str, timezone_str) for date_str in date_strings]
+
+
+def format_astimezone(unix_times_ms, timezone_str):
+    """Прежняя реализация convert_unix_to_local_datetime."""
+    tz = get_timezone(timezone_str)
+    return [
+        pytz.UTC.localize(EPOCH + timedelta(milliseconds=unix_time_ms)).astimezone(tz).strftime(DATE_TIME_FORMAT)
+        for unix_time_ms in unix_times_ms
+    ]
+
+
+def measure(convert, values, timezone_str):
+    started = time.perf_counter()
+    result = convert(values, timezone_str)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер скорости перевода дат выгрузки в юникс время")
+    parser.add_argument("--rows", type=int, default=100000, help="Число строк")
+    parser.add_argument("--timezone", default="Europe/Moscow", help="Часовой пояс")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    date_strings = make_date_strings(args.rows, random.Random(args.seed))
+    print(f"{len(date_strings)} строк, часовой пояс {args.timezone}")
+
+    print("Строка -> юникс время:")
+    results = {}
+    for name, convert in (
+        ("strptime + localize", parse_strptime_localize),
+        ("срезы + localize", parse_cached_localize),
+        ("time_utils", parse_fast)
+    ):
+        results[name], elapsed = measure(convert, date_strings, args.timezone)
+        print(f"  {name:<20} {elapsed:.3f} с, {len(date_strings) / elapsed:>10.0f} строк/с")
+    mismatches = sum(1 for values in zip(*results.values()) if len(set(values)) > 1)
+    print(f"  расхождений: {mismatches}")
+
+    unix_times_ms = sorted(results["time_utils"])
+    print("Юникс время -> строка:")
+    formatted = {}
+    for name, convert in (("astimezone", format_astimezone), ("format_unix_times", format_unix_times)):
+        formatted[name], elapsed = measure(convert, unix_times_ms, args.timezone)
+        print(f"  {name:<20} {elapsed:.3f} с, {len(unix_times_ms) / elapsed:>10.0f} строк/с")
+    print(f"  расхождений: {sum(1 for left, right in zip(*formatted.values()) if left != right)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
-import databases
 import sqlalchemy
 import asyncio
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DATABASE_POOL_SIZE,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_POOL_RECYCLE
+)
 
-from config import DATABASE_URL
-
-database = databases.Database(DATABASE_URL)
 metadata = sqlalchemy.MetaData()
 
 web_users = sqlalchemy.Table(
@@ -19,23 +25,37 @@ web_users = sqlalchemy.Table(
     ),  # Add role with default value
 )
 
+# Синхронный движок - для фоновых потоков (планировщики, синхронизация с Google Sheets)
 engine = sqlalchemy.create_engine(DATABASE_URL)
 metadata.create_all(engine)
 Session = sessionmaker(bind=engine)
 
+# Асинхронный движок (asyncpg) - для эндпоинтов и задач в цикле событий приложения
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=DATABASE_POOL_SIZE,
+    max_overflow=DATABASE_MAX_OVERFLOW,
+    pool_timeout=DATABASE_POOL_TIMEOUT,
+    pool_recycle=DATABASE_POOL_RECYCLE,
+    pool_pre_ping=True
+)
+# Объекты не сбрасываются после commit, чтобы к их полям можно было обращаться без await
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 
 async def get_db():
-    await database.connect()
-    try:
-        yield database
-    finally:
-        await database.disconnect()
+    """
+    Общая зависимость FastAPI: асинхронная сессия на время запроса.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
 
 
 async def main():
-    await database.connect()
-    print("Connected to the database!")
-    await database.disconnect()
+    async with async_engine.connect() as connection:
+        await connection.execute(sqlalchemy.text("SELECT 1"))
+        print("Connected to the database!")
+    await async_engine.dispose()
     print("Disconnected from the database!")
 
 
@@ -1,11 +1,11 @@
 # Перенос айдишников из бд в гугл таблицы и категорий из гугл таблицы в бд
 
-import gspread
 from datetime import datetime
 
 from routes.directory.tinkoff.expenses import get_expenses_from_db
-from routes.directory.tinkoff.categories import get_categories_from_db, update_expense_category
+from routes.directory.tinkoff.categories import get_categories_from_db, update_expenses_categories
 from utils.tinkoff.time_utils import get_period_range
+from utils.google_clients import google_clients
 
 from utils.tinkoff.expenses_google_sheets import is_date_string
 
@@ -123,9 +123,11 @@ def match_expenses(sheet_expenses, db_expenses, row_indices, categories):
 def update_db_with_categories(db, expenses_to_update_in_db):
     """Пакетно обновляет категории в базе данных."""
     try:
-        for expense in expenses_to_update_in_db:
-            update_expense_category(db, expense['expense_id'], expense['category_id'])
-        print(f"Обновлено {len(expenses_to_update_in_db)} записей в базе данных.")
+        results = update_expenses_categories(
+            db, [(expense['expense_id'], expense['category_id']) for expense in expenses_to_update_in_db]
+        )
+        updated_count = sum(1 for status in results.values() if status == "updated")
+        print(f"Обновлено {updated_count} записей в базе данных.")
     except Exception as e:
         print(f"Ошибка при обновлении базы данных: {str(e)}")
 
@@ -205,9 +207,7 @@ def start():
 
 if __name__ == '__main__':
     try:
-        gc = gspread.service_account(filename="credentials.json")
-        sht2 = gc.open_by_url("https://docs.google.com/spreadsheets/d/1-Y9Gg6bf9c6j8PhLEqSgjtFAXuX4uE9S1k00eNwMjrM/edit?usp=sharing")
-        worksheet = sht2.get_worksheet(0)
+        worksheet = google_clients.get_worksheet("https://docs.google.com/spreadsheets/d/1-Y9Gg6bf9c6j8PhLEqSgjtFAXuX4uE9S1k00eNwMjrM/edit?usp=sharing")
         start()
     except Exception as e:
         print(f"Ошибка при инициализации gspread: {str(e)}")
\ No newline at end of file
@@ -2,6 +2,9 @@
 const INACTIVITY_DELAY = 3 * 60 * 1000; // 3 минуты в миллисекундах
 const CACHE_KEY = "last_edit_time";
 const HIDDEN_SHEET_NAME = "HiddenChanges";
+// Вебхук сервера: в свойствах скрипта задаются WEBHOOK_URL (.../tinkoff/expenses/categories/webhook/)
+// и WEBHOOK_SECRET (совпадает с GOOGLE_SHEETS_WEBHOOK_SECRET в config.py)
+const WEBHOOK_TRIGGER_FUNCTION = "pushChangesIfIdle";
 
 // Накопление изменений + запуск таймера
 function onEdit(e) {
@@ -67,29 +70,105 @@ function createHiddenSheet(spreadsheet) {
   return hiddenSheet;
 }
 
-function doGet() {
-  const hiddenSheet = SpreadsheetApp.getActiveSpreadsheet().getSheetByName("HiddenChanges");
-  if (!hiddenSheet) {
-    return ContentService.createTextOutput("error: hidden sheet not found")
-      .setMimeType(ContentService.MimeType.TEXT);
-  }
+// Проверка накопленных изменений: статус в том же формате, что отдаёт doGet
+function getChangesStatus(hiddenSheet) {
+  if (!hiddenSheet) return "error: hidden sheet not found";
 
   const changes = hiddenSheet.getDataRange().getValues();
   const isEmpty = changes.every(row => row.every(cell => cell === "" || cell === null));
-  if (isEmpty) {
-    return ContentService.createTextOutput("false: no changes detected")
-      .setMimeType(ContentService.MimeType.TEXT);
-  }
+  if (isEmpty) return "false: no changes detected";
 
   const cache = CacheService.getScriptCache();
   const lastEditTime = parseInt(cache.get(CACHE_KEY) || "0");
-  const now = Date.now();
+  if (Date.now() - lastEditTime <= INACTIVITY_DELAY) return "false: waiting period not passed";
 
-  if (now - lastEditTime <= INACTIVITY_DELAY) {
-    return ContentService.createTextOutput("false: waiting period not passed")
-      .setMimeType(ContentService.MimeType.TEXT);
-  }
+  return "true: ready to process";
+}
 
-  return ContentService.createTextOutput("true: ready to process")
+// Резервный опрос со стороны сервера
+function doGet() {
+  const hiddenSheet = SpreadsheetApp.getActiveSpreadsheet().getSheetByName(HIDDEN_SHEET_NAME);
+  return ContentService.createTextOutput(getChangesStatus(hiddenSheet))
     .setMimeType(ContentService.MimeType.TEXT);
 }
+
+// Однократная установка триггера, который раз в минуту проверяет окно неактивности (запускается вручную)
+function installWebhookTrigger() {
+  ScriptApp.getProjectTriggers()
+    .filter(trigger => trigger.getHandlerFunction() === WEBHOOK_TRIGGER_FUNCTION)
+    .forEach(trigger => ScriptApp.deleteTrigger(trigger));
+
+  ScriptApp.newTrigger(WEBHOOK_TRIGGER_FUNCTION).timeBased().everyMinutes(1).create();
+}
+
+// Отправка изменений на сервер после окончания окна неактивности
+function pushChangesIfIdle() {
+  const hiddenSheet = SpreadsheetApp.getActiveSpreadsheet().getSheetByName(HIDDEN_SHEET_NAME);
+  if (getChangesStatus(hiddenSheet) !== "true: ready to process") return;
+
+  const scriptLock = LockService.getScriptLock();
+  let rows;
+  try {
+    scriptLock.waitLock(5000);
+    rows = hiddenSheet.getDataRange().getValues()
+      .filter(row => row[3] && Number.isInteger(Number(row[4])));
+  } finally {
+    scriptLock.releaseLock();
+  }
+
+  if (rows.length === 0) return;
+
+  const payload = JSON.stringify({
+    changes: rows.map(row => ({ expense_id: Number(row[4]), category: String(row[3]) }))
+  });
+
+  const response = UrlFetchApp.fetch(getScriptProperty("WEBHOOK_URL"), {
+    method: "post",
+    contentType: "application/json",
+    payload: payload,
+    headers: signPayload(payload),
+    muteHttpExceptions: true
+  });
+
+  if (response.getResponseCode() !== 200) {
+    console.error(`Вебхук вернул ${response.getResponseCode()}: ${response.getContentText()}`);
+    return;  // Изменения останутся на листе: повторим на следующем запуске или их заберёт опрос
+  }
+
+  removeSentChanges(hiddenSheet, rows);
+}
+
+// Заголовки с подписью HMAC-SHA256 от "<timestamp>.<тело запроса>"
+function signPayload(payload) {
+  const timestamp = Math.floor(Date.now() / 1000).toString();
+  const signature = Utilities.computeHmacSha256Signature(
+    `${timestamp}.${payload}`, getScriptProperty("WEBHOOK_SECRET"), Utilities.Charset.UTF_8
+  );
+  const hex = signature.map(byte => ("0" + (byte & 0xFF).toString(16)).slice(-2)).join("");
+
+  return { "X-Webhook-Timestamp": timestamp, "X-Webhook-Signature": hex };
+}
+
+// Удаляет отправленные строки (пока шла отправка, на лист могли добавиться новые изменения)
+function removeSentChanges(hiddenSheet, sentRows) {
+  const sentKeys = new Set(sentRows.map(row => `${row[0]}|${row[1]}|${row[4]}|${row[5]}`));
+  const scriptLock = LockService.getScriptLock();
+
+  try {
+    scriptLock.waitLock(5000);
+    const data = hiddenSheet.getDataRange().getValues();
+    for (let i = data.length - 1; i >= 0; i--) {
+      if (sentKeys.has(`${data[i][0]}|${data[i][1]}|${data[i][4]}|${data[i][5]}`)) {
+        hiddenSheet.deleteRow(i + 1);
+      }
+    }
+  } finally {
+    scriptLock.releaseLock();
+  }
+}
+
+function getScriptProperty(name) {
+  const value = PropertiesService.getScriptProperties().getProperty(name);
+  if (!value) throw new Error(`Не задано свойство скрипта ${name}`);
+  return value;
+}
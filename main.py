@@ -1,11 +1,16 @@
 ﻿# main.py
 
+# Библиотеки Python
+import asyncio
+
 # Сторонние библиотеки
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from threading import Thread
 
 # Собственные модули
+import config
+
 from routes import (
     auth_tinkoff,
     general,
@@ -16,6 +21,7 @@ from routes import (
     browser_session
 )
 
+from utils.loop_lag_monitor import loop_lag_monitor
 from utils.tinkoff.scheduler_utils import start_scheduler
 from utils.tinkoff.sync_google_category import start_inactivity_scheduler
  
@@ -32,6 +38,19 @@ app.include_router(bot.router)
 app.include_router(scheduler.router)
 app.include_router(browser_session.router)
 
+@app.on_event("startup")
+async def on_startup():
+    # Общий браузер и задачи планировщика выполняются в цикле событий приложения
+    config.browser_pool.bind_loop(asyncio.get_running_loop())
+    loop_lag_monitor.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Досылаем уведомления из очереди и закрываем сессию
+    await config.bot_notifier.flush(config.BOT_NOTIFIER_TIMEOUT)
+
+
 # Запуск планировщика в отдельном потоке
 Thread(target=start_scheduler, daemon=True).start()
 Thread(target=start_inactivity_scheduler, daemon=True).start()
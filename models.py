@@ -3,7 +3,7 @@
 from utils.tinkoff.browser_utils import PageType
 
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Boolean, TIMESTAMP, BigInteger, func, Time
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Boolean, TIMESTAMP, BigInteger, func, Time, Index, Date, Numeric
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from typing import List, Optional
@@ -27,6 +27,17 @@ class Keyword(BaseModel):
 class SaveKeywordsRequest(BaseModel):
     keywords: List[Keyword]
 
+class CategoryKeywordRequest(BaseModel):
+    keyword: str
+    category_id: int
+
+class SheetCategoryChange(BaseModel):
+    expense_id: int
+    category: str
+
+class SheetCategoriesWebhookRequest(BaseModel):
+    changes: List[SheetCategoryChange]
+
 class TokenizedUrlRequest(BaseModel):
     token: str  # Токен из ссылки
 
@@ -65,6 +76,24 @@ class Expense(Base):
 
     category = relationship("CategoryExpenses", back_populates="expenses")
 
+    __table_args__ = (
+        Index("expenses_timestamp_idx", timestamp),
+        Index("expenses_card_number_timestamp_idx", card_number, timestamp),
+        # Естественный ключ расхода, описание индексируется по хэшу
+        Index("expenses_natural_key_uidx", timestamp, card_number, amount, func.md5(description), unique=True),
+    )
+
+
+# Суммы расходов по дням (по московскому времени), картам и категориям
+class ExpenseDailyRollup(Base):
+    __tablename__ = "expense_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    card_number = Column(Text, primary_key=True, default="")  # "" - переводы
+    category_id = Column(Integer, primary_key=True, default=0)  # 0 - без категории
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)  # Сумма модулей расходов
+    expense_count = Column(Integer, nullable=False, default=0)
+
 
 class TemporaryCode(Base):
     __tablename__ = 'temporary_code'
@@ -132,4 +161,25 @@ class Schedule(Base):
     id = Column(Integer, primary_key=True, index=True)
     export_type = Column(String, nullable=False)  # 'expenses' или 'full'
     export_time = Column(Time, nullable=False)
-    created_at = Column(TIMESTAMP, server_default=func.now())
\ No newline at end of file
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+# Состояние синхронизации расходов с Google Sheets (одна запись)
+class GoogleSheetsSyncState(Base):
+    __tablename__ = "google_sheets_sync_state"
+
+    id = Column(Integer, primary_key=True)
+    last_expense_id = Column(Integer, nullable=False, default=0)  # Последний выгруженный расход
+    row_count = Column(Integer, nullable=False, default=0)  # Число строк в таблице после выгрузки
+    last_month = Column(Text)  # Последний записанный месяц ("МАРТ")
+    last_date = Column(Text)  # Последний записанный день ("02  марта")
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+# Строки расходов в Google Sheets с контрольной суммой категории
+class GoogleSheetsSyncRow(Base):
+    __tablename__ = "google_sheets_sync_rows"
+
+    expense_id = Column(Integer, primary_key=True)
+    row_number = Column(Integer, nullable=False)
+    checksum = Column(String(32), nullable=False)
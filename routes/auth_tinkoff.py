@@ -16,17 +16,15 @@ from auth import decode_access_token
 import config as config
 from config import (
     timer_selector, 
-    resend_sms_button_selector, 
-    browser_instance as browser
+    resend_sms_button_selector
 )
 
 from utils.bot import check_miniapp_token
+from utils.loop_lag_monitor import loop_lag_monitor
 from utils.tinkoff.browser_manager import BrowserManager
 from utils.tinkoff.browser_input_utils import paged_login, close_login_via_sms_page, get_user_name_from_otp_login, skip_control_questions
 from utils.tinkoff.browser_utils import get_text, detect_page_type, PageType, click_button
 
-from database import Session
-
 # from dependencies import get_authenticated_user
 
 
@@ -34,23 +32,13 @@ router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 
-def get_db():
-    db = Session()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/tinkoff/")
-async def get_login_type(request: Request, background_tasks: BackgroundTasks, token: Optional[str] = Query(default=None), db: Session = Depends(get_db)):
+async def get_login_type(request: Request, background_tasks: BackgroundTasks, token: Optional[str] = Query(default=None)):
     """
     Вход в тинькофф.
     Инициализирует браузер, если нужно.
     Переходит на расходы.
     """
-    global browser
-    
     if token:
         if not check_miniapp_token(token):
             return
@@ -59,27 +47,21 @@ async def get_login_type(request: Request, background_tasks: BackgroundTasks, to
         # return
 
     
-    # Открытие браузера если закрыт, если открыт обновление времени выключения
-    if await check_for_page(browser):
-        browser.reset_interaction_time()
-    elif await check_for_browser(browser):
-        await browser.create_context_and_page()
-    else:
-        browser = BrowserManager(config.PATH_TO_CHROME_PROFILE,
-                                 config.DOWNLOAD_DIRECTORY,
-                                 config.BROWSER_TIMEOUT)
-        await browser.create_context_and_page()
-
     try:
-        await browser.page.goto(config.EXPENSES_URL, wait_until="domcontentloaded")  # Переход на страницу расходов
-        detected_type = await detect_page_type(browser, 10)  # Асинхронное определение типа страницы
+        # Аренда общего браузера (запускается, если закрыт, если открыт обновляется время выключения).
+        # С этого момента страница закреплена за входом пользователя, автозагрузка ждёт его окончания
+        async with loop_lag_monitor.measure("Вход в тинькофф"), config.browser_pool.lease(login=True) as browser:
+            await browser.page.goto(config.EXPENSES_URL, wait_until="domcontentloaded")  # Переход на страницу расходов
+            await browser.log_page_load_timing("входа")
+            detected_type = await detect_page_type(browser, 10)  # Асинхронное определение типа страницы
 
         if detected_type:
-            return await next_page(request=request, background_tasks=background_tasks, step=detected_type.value, token=token, db=db)
+            return await next_page(request=request, background_tasks=background_tasks, step=detected_type.value, token=token)
         else:
             raise HTTPException(status_code=500, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
     except Exception as e:
         print(f"Ошибка в get_login_type(): {e}")
+        config.browser_pool.finish_login()
         raise HTTPException(status_code=500, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
     
 
@@ -96,14 +78,16 @@ async def login(request: Request, data: str = Body(...), token: Optional[str] =
         # return
 
     
-    # Если страница неактивна кидаем ошибку
-    if not await browser.is_page_active():
-        raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
-    
-    try:
-        current_page_type, next_page_type = await paged_login(browser, data, 10)  # Отправка данных, получает тип нынешней и следующей страницы
+    async with config.browser_pool.lease_page() as browser:
+        # Если страница неактивна кидаем ошибку
+        if not browser:
+            raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
+
+        async with loop_lag_monitor.measure("Ввод данных для входа"):
+            current_page_type, next_page_type = await paged_login(browser, data, 10)  # Отправка данных, получает тип нынешней и следующей страницы
         await save_browser_cache()  # Сохранение кэша браузера
 
+    try:
         if next_page_type:
             return LoginResponse(status="success", next_page_type=next_page_type, current_page_type=current_page_type) 
         raise HTTPException(status_code=307, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
@@ -115,7 +99,6 @@ async def login(request: Request, data: str = Body(...), token: Optional[str] =
 async def next_page(request: Request, 
                     background_tasks: BackgroundTasks,
                     step: str | None = Query(default=None), 
-                    db: Session = Depends(get_db), 
                     token: Optional[str] = Query(default=None)):
     """
     Универсальный эндпоинт для загрузки следующей страницы.
@@ -128,41 +111,44 @@ async def next_page(request: Request,
         # return
 
     
-    # Если страница неактивна кидаем ошибку
-    if not browser or not await browser.is_page_active():
-        raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
-    
-    # Определяем `page_type`, пытаясь преобразовать `step` в `PageType`
-    if step:
-        try:
-            page_type = PageType.from_string(step)  # Используем метод класса
-        except ValueError:
-            raise HTTPException(status_code=307, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
-    else:
-        page_type = await detect_page_type(browser, 5)
-        if not page_type:
-            raise HTTPException(status_code=307, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
+    async with config.browser_pool.lease_page() as browser:
+        # Если страница неактивна кидаем ошибку
+        if not browser:
+            raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
+
+        # Определяем `page_type`, пытаясь преобразовать `step` в `PageType`
+        if step:
+            try:
+                page_type = PageType.from_string(step)  # Используем метод класса
+            except ValueError:
+                raise HTTPException(status_code=307, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
+        else:
+            page_type = await detect_page_type(browser, 5)
+            if not page_type:
+                raise HTTPException(status_code=307, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
 
-     # Отмена входа по смс, переход на вход через номер телефона
-    if page_type == PageType.LOGIN_SMS_CODE:
-        page_type = await close_login_via_sms_page(browser)
-    
-    if page_type == PageType.CONTROL_QUESTIONS:
-        page_type = await skip_control_questions(browser)
+         # Отмена входа по смс, переход на вход через номер телефона
+        if page_type == PageType.LOGIN_SMS_CODE:
+            page_type = await close_login_via_sms_page(browser)
 
-    # Получаем путь к нужному шаблону
-    template_path = page_type.template_path()
+        if page_type == PageType.CONTROL_QUESTIONS:
+            page_type = await skip_control_questions(browser)
 
-    if not template_path:
-        raise HTTPException(status_code=307, detail="Ошибка загрузки страницы")
+        # Получаем путь к нужному шаблону
+        template_path = page_type.template_path()
+
+        if not template_path:
+            raise HTTPException(status_code=307, detail="Ошибка загрузки страницы")
+
+        if page_type == PageType.LOGIN_OTP:
+            return templates.TemplateResponse(template_path, {"request": request, "name": await get_user_name_from_otp_login(browser), "is_miniapp": bool(token)})
 
-    if page_type == PageType.LOGIN_OTP:
-        return templates.TemplateResponse(template_path, {"request": request, "name": await get_user_name_from_otp_login(browser), "is_miniapp": bool(token)})
-    
     if page_type == PageType.EXPENSES:
+        # Вход завершён - браузер снова доступен автозагрузке
+        config.browser_pool.finish_login()
         if token:
             from utils.tinkoff.fixed_time_import_expenses import resume_load_expenses
-            background_tasks.add_task(resume_load_expenses, db, token)
+            background_tasks.add_task(resume_load_expenses, token)
             return templates.TemplateResponse("tinkoff/success_login.html", {"request": request})
         redirect = redirect_by_token(request)
         if redirect:
@@ -176,19 +162,20 @@ async def get_sms_timer():
     """
     Эндпоинт для получения таймера при вводе смс.
     """
-    # Если страница неактивна кидаем ошибку
-    if not await browser.is_page_active():
-        raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
-    
-    try:
-        await asyncio.sleep(1)
-        # Получаем оставшееся время в секундах
-        time_left = await get_text(browser.page, timer_selector)
-        return {"time_left": time_left}
+    await asyncio.sleep(1)
+    async with config.browser_pool.lease_page() as browser:
+        # Если страница неактивна кидаем ошибку
+        if not browser:
+            raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
 
-    except Exception as e:
-        print(f"Ошибка при получении таймера: {e}")
-        raise HTTPException(status_code=500, detail="Не удалось получить таймер")
+        try:
+            # Получаем оставшееся время в секундах
+            time_left = await get_text(browser.page, timer_selector)
+            return {"time_left": time_left}
+
+        except Exception as e:
+            print(f"Ошибка при получении таймера: {e}")
+            raise HTTPException(status_code=500, detail="Не удалось получить таймер")
 
 
 @router.post("/tinkoff/resend_sms/")
@@ -196,20 +183,20 @@ async def resend_sms():
     """
     Эндпоинт для повторной отправки смс.
     """
-    # Если страница неактивна кидаем ошибку
-    if not await browser.is_page_active():
-        raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
-    
-    try:
-        browser.reset_interaction_time()
-        # Нажимаем на кнопку повторной отправки
-        await click_button(browser.page, resend_sms_button_selector)
-        await save_browser_cache()
-        return {"status": "success", "message": "SMS успешно отправлено"}
+    async with config.browser_pool.lease_page() as browser:
+        # Если страница неактивна кидаем ошибку
+        if not browser:
+            raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
 
-    except Exception as e:
-        print(f"Ошибка при нажатии на кнопку: {e}")
-        raise HTTPException(status_code=500, detail="Не удалось отправить SMS повторно")
+        try:
+            # Нажимаем на кнопку повторной отправки
+            await click_button(browser.page, resend_sms_button_selector)
+            await save_browser_cache()
+            return {"status": "success", "message": "SMS успешно отправлено"}
+
+        except Exception as e:
+            print(f"Ошибка при нажатии на кнопку: {e}")
+            raise HTTPException(status_code=500, detail="Не удалось отправить SMS повторно")
 
 
 @router.post("/tinkoff/cancel_otp/")
@@ -217,22 +204,22 @@ async def cancel_otp():
     """
     Эндпоинт для отмены входа по временному паролю.
     """
-    # Если страница неактивна кидаем ошибку
-    if not await browser.is_page_active():
-        raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
-    
-    try:
-        browser.reset_interaction_time()
-        # Закрываем вход по смс
-        next_page_type = await close_login_via_sms_page(browser) 
-        await save_browser_cache()
-        if next_page_type:
-            return LoginResponse(status="success", next_page_type=next_page_type, current_page_type=None)
-        raise HTTPException(status_code=307, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
+    async with config.browser_pool.lease_page() as browser:
+        # Если страница неактивна кидаем ошибку
+        if not browser:
+            raise HTTPException(status_code=307, detail="Сессия истекла. Пожалуйста, войдите заново.")
 
-    except Exception as e:
-        print(f"Ошибка при нажатии на кнопку: {e}")
-        raise HTTPException(status_code=500, detail="Не удалось отменить вход по временному паролю.")
+        try:
+            # Закрываем вход по смс
+            next_page_type = await close_login_via_sms_page(browser)
+            await save_browser_cache()
+        except Exception as e:
+            print(f"Ошибка при нажатии на кнопку: {e}")
+            raise HTTPException(status_code=500, detail="Не удалось отменить вход по временному паролю.")
+
+    if next_page_type:
+        return LoginResponse(status="success", next_page_type=next_page_type, current_page_type=None)
+    raise HTTPException(status_code=307, detail="Ошибка входа в тинькофф. Попробуйте войти снова")
     
 
 async def check_for_browser(browser: BrowserManager):
@@ -251,15 +238,16 @@ async def check_for_page(browser: BrowserManager):
 
 def get_browser() -> BrowserManager:
     """
-    Возвращаем браузер.
+    Возвращаем общий браузер (None, если он ещё не запускался).
     """
-    return browser
+    return config.browser_pool.browser
 
 
 async def save_browser_cache():
     """
     Сохраняем кэш браузера.
     """
+    browser = get_browser()
     if browser:
         await browser.save_browser_cache()
 
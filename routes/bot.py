@@ -3,10 +3,11 @@
 # Сторонние модули
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Собственные модули
-from routes.directory.bot import check_user_and_store_tg_tmp_user
-from database import Session
+from routes.directory.bot import check_user_and_store_tg_tmp_user_async
+from database import get_db
 from auth import verify_bot_token
 
 from models import TokenizedUrlRequest
@@ -15,16 +16,8 @@ from models import TokenizedUrlRequest
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-def get_db():
-    db = Session()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/bot/check_access/")
-async def check_access(request: TokenizedUrlRequest, db: Session = Depends(get_db)):
+async def check_access(request: TokenizedUrlRequest, db: AsyncSession = Depends(get_db)):
     """
     Проверяет токенизированный доступ и записывает данные в tg_tmp_users.
     """
@@ -40,7 +33,7 @@ async def check_access(request: TokenizedUrlRequest, db: Session = Depends(get_d
             raise HTTPException(status_code=400, detail="Неполные данные в токене.")
 
         # Проводим проверку пользователя и сохраняем данные
-        user, message = check_user_and_store_tg_tmp_user(db, tg_nickname, chat_id)
+        user, message = await check_user_and_store_tg_tmp_user_async(db, tg_nickname, chat_id)
         if not user:
             raise HTTPException(status_code=403, detail=message)
 
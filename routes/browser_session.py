@@ -17,6 +17,8 @@ from routes.auth_tinkoff import check_for_browser, get_browser
 from dependencies import get_authenticated_user
 
 from utils.google_drive_file_utils import upload_file
+from utils.tinkoff.browser_utils import get_page_detection_metrics
+from routes.directory.tinkoff.cache import get_cache_metrics
 
 
 router = APIRouter()
@@ -54,5 +56,27 @@ async def save_session_to_google(user: dict = Depends(get_authenticated_user)):
     except Exception as e:
         print(f"Произошла ошибка при выгрузке файла в гугл диск: {e}")
         return {"status": "error", "message": "Произошла ошибка при выгрузке файла."}
-    
-    
\ No newline at end of file
+
+
+@router.get('/tinkoff/metrics/page_detection/')
+async def page_detection_metrics(user: dict = Depends(get_authenticated_user)):
+    """
+    Метрики определения типа страницы: число определений, попыток, повторов и время (в секундах).
+    """
+    return get_page_detection_metrics()
+
+
+@router.get('/tinkoff/metrics/notifications/')
+async def notification_metrics(user: dict = Depends(get_authenticated_user)):
+    """
+    Метрики отправки уведомлений боту: доставлено, ошибок, повторов, отброшено и время доставки (в секундах).
+    """
+    return config.bot_notifier.get_metrics()
+
+
+@router.get('/tinkoff/metrics/cache/')
+async def cache_metrics(user: dict = Depends(get_authenticated_user)):
+    """
+    Метрики кэша справочников: попадания и промахи по каждому кэшу.
+    """
+    return get_cache_metrics()
@@ -4,6 +4,9 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from models import Users, TgTmpUsers
 
+from routes.directory.tinkoff.notifications import invalidate_notification_caches
+from routes.directory.tinkoff.utils import async_counterpart
+
 def check_user_and_store_tg_tmp_user(db: Session, tg_nickname: str, chat_id: int):
     """
     Проверяет, существует ли пользователь с указанным tg-ником, и записывает его в tg_tmp_users.
@@ -29,12 +32,14 @@ def check_user_and_store_tg_tmp_user(db: Session, tg_nickname: str, chat_id: int
             # Если chat_id отличается, обновляем его
             tmp_user.chat_id = chat_id
             db.commit()
+            invalidate_notification_caches()
             return user, f"Доступ обновлён с новым chat_id: {chat_id}"
     else:
         # Если записи нет, создаём новую
         new_tmp_user = TgTmpUsers(user_id=user.id, chat_id=chat_id)
         db.add(new_tmp_user)
         db.commit()
+        invalidate_notification_caches()
         return user, f"Доступ разрешён. Номер карты: {user.card_number}"
 
 
@@ -44,3 +49,8 @@ def get_card_number_by_chat_id(db: Session, chat_id: int) -> Optional[str]:
     """
     tg_user = db.query(TgTmpUsers).filter(TgTmpUsers.chat_id == chat_id).first()
     return tg_user.user.card_number if tg_user and tg_user.user else None
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+check_user_and_store_tg_tmp_user_async = async_counterpart(check_user_and_store_tg_tmp_user)
+get_card_number_by_chat_id_async = async_counterpart(get_card_number_by_chat_id)
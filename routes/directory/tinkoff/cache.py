@@ -0,0 +1,99 @@
+# routes/directory/tinkoff/cache.py
+
+# Стандартные модули Python
+import copy
+import threading
+import time
+from functools import wraps
+
+
+# Все кэши справочников (для метрик и сброса)
+caches = {}
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float):
+        """
+        Кэш одного значения на ttl секунд со счётчиками попаданий и промахов.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._value = None
+        self._expires_at = 0.0
+        self._version = 0  # Растёт при каждом сбросе, чтобы не сохранить значение, загруженное до сброса
+        self._lock = threading.Lock()
+
+
+    def get(self, loader):
+        """
+        Возвращает копию закэшированного значения, при промахе загружает его через loader().
+        Блокировка не удерживается во время loader(): через AsyncSession.run_sync загрузка идёт
+        в гринлете в потоке цикла событий, и второй запрос, ждущий блокировку, остановил бы весь цикл.
+        Одновременные промахи поэтому загружают значение каждый сам.
+        """
+        with self._lock:
+            if time.monotonic() < self._expires_at:
+                self.hits += 1
+                return copy.deepcopy(self._value)
+
+            self.misses += 1
+            version = self._version
+
+        value = loader()
+
+        with self._lock:
+            if self._version == version:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl
+        return copy.deepcopy(value)
+
+
+    def invalidate(self):
+        """Сбрасывает значение, следующий вызов прочитает данные из БД."""
+        with self._lock:
+            self._value = None
+            self._expires_at = 0.0
+            self._version += 1
+
+
+    def get_metrics(self):
+        requests = self.hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+
+def ttl_cache(ttl: float):
+    """
+    Кэширует результат функции справочника вида f(db) на ttl секунд.
+    У обёрнутой функции появляется invalidate() для сброса из мест записи.
+    """
+    def decorator(func):
+        cache = TTLCache(func.__name__, ttl)
+        caches[cache.name] = cache
+
+        @wraps(func)
+        def wrapper(db):
+            return cache.get(lambda: func(db))
+
+        wrapper.cache = cache
+        wrapper.invalidate = cache.invalidate
+        return wrapper
+
+    return decorator
+
+
+def invalidate_all():
+    """Сбрасывает все кэши справочников."""
+    for cache in caches.values():
+        cache.invalidate()
+
+
+def get_cache_metrics():
+    """Возвращает счётчики попаданий и промахов по каждому кэшу."""
+    return {name: cache.get_metrics() for name, cache in caches.items()}
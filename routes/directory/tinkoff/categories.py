@@ -4,13 +4,23 @@
 from fastapi import HTTPException
 from typing import Optional
 
+from sqlalchemy import Integer, cast, column, update, values
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 
 # Собственные модули
 from models import CategoryExpenses, Expense
 
+from routes.directory.tinkoff.cache import ttl_cache
+from routes.directory.tinkoff.rollups import add_rollup_delta, apply_rollup_deltas, new_rollup_deltas
+from routes.directory.tinkoff.utils import async_counterpart
 
+
+# Время жизни кэша справочника категорий (с)
+CATEGORIES_CACHE_TTL = 300
+
+
+@ttl_cache(CATEGORIES_CACHE_TTL)
 def get_categories_from_db(db):
     """
     Получение категорий из базы данных (с цветом).
@@ -35,6 +45,85 @@ def get_categories_from_db(db):
     return categories_list
 
 
+def normalize_category_id(category_id):
+    """Приводит ID категории к int или None (пустые значения означают очистку категории)."""
+    if category_id in (None, 'null', ''):
+        return None
+    return int(category_id)
+
+
+def update_expenses_categories(db: Session, assignments):
+    """
+    Пакетно обновляет категории у расходов одним запросом UPDATE ... FROM (VALUES ...)
+    и переносит их суммы между категориями в дневной сводке.
+    :param db: Сессия БД
+    :param assignments: Пары (ID расхода, ID категории или None для очистки)
+    :return: Словарь {ID расхода: "updated" | "expense_not_found" | "category_not_found"}
+    """
+    new_categories = {}
+    for expense_id, category_id in assignments:
+        new_categories[int(expense_id)] = normalize_category_id(category_id)  # Последнее назначение побеждает
+
+    if not new_categories:
+        return {}
+
+    # Проверяем все категории одним запросом
+    category_ids = {category_id for category_id in new_categories.values() if category_id is not None}
+    existing_category_ids = set()
+    if category_ids:
+        query = select(CategoryExpenses.id).where(CategoryExpenses.id.in_(category_ids))
+        existing_category_ids = set(db.execute(query).scalars().all())
+
+    results = {}
+    rows = []
+    for expense_id, category_id in new_categories.items():
+        if category_id is not None and category_id not in existing_category_ids:
+            results[expense_id] = "category_not_found"
+        else:
+            rows.append((expense_id, category_id))
+
+    if rows:
+        # Прежние категории нужны, чтобы перенести суммы в дневной сводке
+        query = (
+            select(Expense.id, Expense.timestamp, Expense.card_number, Expense.amount, Expense.category_id)
+            .where(Expense.id.in_([expense_id for expense_id, _ in rows]))
+            .with_for_update()
+        )
+        old_expenses = {row.id: row for row in db.execute(query)}
+
+        # Набор новых категорий - CTE (WITH ... AS (VALUES ...)): так запрос выполняется и на SQLite в тестах
+        new_values = values(
+            column("expense_id", Integer),
+            column("category_id", Integer),
+            name="new_categories"
+        ).data(rows).cte("new_categories")
+
+        query = (
+            update(Expense)
+            .where(Expense.id == new_values.c.expense_id)
+            .values(category_id=cast(new_values.c.category_id, Integer))
+            .returning(Expense.id)
+        )
+        updated_ids = set(db.execute(query).scalars().all())
+
+        deltas = new_rollup_deltas()
+        for expense_id, category_id in rows:
+            expense = old_expenses.get(expense_id)
+            if expense_id in updated_ids and expense and expense.category_id != category_id:
+                add_rollup_delta(deltas, expense.timestamp, expense.card_number, expense.category_id, expense.amount, -1)
+                add_rollup_delta(deltas, expense.timestamp, expense.card_number, category_id, expense.amount)
+        apply_rollup_deltas(db, deltas)
+        db.commit()
+
+        for expense_id, _ in rows:
+            results[expense_id] = "updated" if expense_id in updated_ids else "expense_not_found"
+
+    updated_count = sum(1 for status in results.values() if status == "updated")
+    print(f"Обновлены категории у {updated_count} из {len(results)} расходов")
+
+    return results
+
+
 def update_expense_category(db: Session, expense_id: int, category_id: Optional[int]):
     """
     Обновляет категорию у расхода или очищает её.
@@ -42,20 +131,15 @@ def update_expense_category(db: Session, expense_id: int, category_id: Optional[
     :param expense_id: ID расхода
     :param category_id: ID категории (или None для очистки)
     """
-    expense = db.query(Expense).filter(Expense.id == expense_id).first()
-    if not expense:
+    status = update_expenses_categories(db, [(expense_id, category_id)])[int(expense_id)]
+
+    if status == "expense_not_found":
         raise HTTPException(status_code=404, detail=f"Расход с ID {expense_id} не найден")
+    if status == "category_not_found":
+        raise HTTPException(status_code=422, detail=f"Категория с ID {category_id} не найдена")
 
-    category = None
-    if category_id == 'null' or category_id == '':
-        category_id = None
-        
-    if category_id:
-        category = db.query(CategoryExpenses).filter(CategoryExpenses.id == category_id).first()
-        if not category:
-            raise HTTPException(status_code=422, detail=f"Категория с ID {category_id} не найдена")
-    
-    print(f"Для расхода {expense.description} с id {expense.id} изменена категория на {category.title if category else None}")
 
-    expense.category_id = category_id  # Устанавливаем или очищаем категорию
-    db.commit()
\ No newline at end of file
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_categories_from_db_async = async_counterpart(get_categories_from_db)
+update_expenses_categories_async = async_counterpart(update_expenses_categories)
+update_expense_category_async = async_counterpart(update_expense_category)
@@ -9,6 +9,8 @@ from sqlalchemy.orm import Session
 # Собственные модули
 from models import LastError
 
+from routes.directory.tinkoff.utils import async_counterpart
+
 
 def set_last_error(db: Session, error_text: str):
     """
@@ -40,4 +42,10 @@ def get_last_unreceived_error(db: Session):
     if last_error:
         last_error.is_received = True  # Отмечаем ошибку как полученную
         db.commit()
-    return last_error
\ No newline at end of file
+    return last_error
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+set_last_error_async = async_counterpart(set_last_error)
+delete_last_error_async = async_counterpart(delete_last_error)
+get_last_unreceived_error_async = async_counterpart(get_last_unreceived_error)
@@ -1,24 +1,28 @@
 # routes/directory/tinkoff/expenses.py
 
 # Стандартные модули Python
+from itertools import islice
 from typing import Optional
 
 # Сторонние модули
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, func, insert, or_, true, tuple_
 from sqlalchemy.future import select
 
 # Собственные модули
 from utils.tinkoff.time_utils import (
     get_unix_time_ms_from_string,
-    convert_unix_to_local_datetime
+    format_unix_times
 )
 
-from models import Expense
+from models import CategoryExpenses, Expense, UserNotifications, Users
 
-from routes.directory.tinkoff.utils import generate_period_message
-from routes.directory.tinkoff.categories import get_categories_from_db
-from routes.directory.tinkoff.notifications import get_card_nums_for_transfer_notifications
+from routes.directory.tinkoff.rollups import add_rollup_delta, apply_rollup_deltas, new_rollup_deltas
+from routes.directory.tinkoff.utils import async_counterpart, generate_period_message
+
+
+# Количество расходов, проверяемых на дубли одним запросом
+SAVE_EXPENSES_BATCH_SIZE = 1000
 
 
 def filter_by_date(query, unix_range_start, unix_range_end):
@@ -29,61 +33,148 @@ def filter_by_date(query, unix_range_start, unix_range_end):
     return query
 
 
-def filter_by_card_number(query, db, card_number, show_all_expenses):
-    transfer_notifications_users = get_card_nums_for_transfer_notifications(db)
-    is_card_number_in_transfer_users = card_number in transfer_notifications_users
-    show_all_expenses = show_all_expenses if is_card_number_in_transfer_users else False
-    
-    if card_number and not show_all_expenses:
-        if card_number in transfer_notifications_users:
-            query = query.filter(
-                (Expense.card_number == "*" + card_number) | (Expense.card_number == "")
-            )
-        else:
-            query = query.filter(Expense.card_number == "*" + card_number)
-    return query
+def filter_by_card_number(query, card_number, show_all_expenses):
+    """
+    Фильтрация по номеру карты. Пользователям, получающим все расходы, дополнительно
+    показываются переводы (или все расходы при show_all_expenses). Проверка
+    пользователя выполняется подзапросом в том же запросе.
+    """
+    if not card_number:
+        return query
+
+    is_transfer_user = (
+        select(Users.id)
+        .join(UserNotifications, Users.id == UserNotifications.user_id)
+        .where(Users.card_number == card_number, UserNotifications.receive_transfer_notifications == True)
+        .exists()
+    )
+    transfer_filter = true() if show_all_expenses else Expense.card_number == ""
+
+    return query.filter(or_(
+        Expense.card_number == "*" + card_number,
+        and_(is_transfer_user, transfer_filter)
+    ))
 
 
 def sort_expenses(query, sort_order):
+    # ID - второй ключ сортировки, чтобы порядок расходов с одинаковым временем был стабильным между страницами
     if sort_order == "desc":
-        query = query.order_by(desc(Expense.timestamp))  # Сортировка от позднего к раннему
+        query = query.order_by(desc(Expense.timestamp), desc(Expense.id))  # Сортировка от позднего к раннему
     else:
-        query = query.order_by(Expense.timestamp)  # Сортировка от раннего к позднему
+        query = query.order_by(Expense.timestamp, Expense.id)  # Сортировка от раннего к позднему
     return query
 
 
-def generate_period_message_for_expenses(expenses, unix_range_start, unix_range_end, card_number):
-    if expenses:
-        min_timestamp = min(expense.timestamp for expense in expenses)
-        max_timestamp = max(expense.timestamp for expense in expenses)
-        return generate_period_message(min_timestamp, max_timestamp, unix_range_start, unix_range_end, card_number)
+def parse_expenses_cursor(cursor: Optional[str]):
+    """
+    Разбирает курсор страницы расходов вида "<timestamp>_<id>" (None - первая страница).
+    """
+    if not cursor:
+        return None
+    try:
+        timestamp, expense_id = cursor.split("_")
+        return int(timestamp), int(expense_id)
+    except ValueError:
+        raise ValueError(f"Некорректный курсор страницы расходов: {cursor}")
+
+
+def filter_by_cursor(query, cursor, sort_order):
+    """
+    Keyset-пагинация: расходы строго после последнего расхода предыдущей страницы по (timestamp, id).
+    """
+    if cursor is None:
+        return query
+    key = tuple_(Expense.timestamp, Expense.id)
+    return query.filter(key < cursor if sort_order == "desc" else key > cursor)
+
+
+def generate_period_message_for_expenses(summary, unix_range_start, unix_range_end, card_number):
+    if summary["count"]:
+        return generate_period_message(
+            summary["min_timestamp"], summary["max_timestamp"], unix_range_start, unix_range_end, card_number
+        )
     else:
         return "Данные не найдены за выбранный период."
 
 
-def format_expenses_response(expenses, categories_dict, timezone_str, card_number):
-    categories_map = {category["id"]: category["category_name"] for category in categories_dict}
+def summarize_expenses(expenses):
+    """
+    Итоги по уже выбранным и отсортированным по времени расходам (тот же формат, что у get_expenses_summary).
+    """
+    by_card = {}
+    for expense in expenses:
+        by_card[expense.card_number] = by_card.get(expense.card_number, 0) + abs(expense.amount)
+
+    return {
+        "count": len(expenses),
+        "total": round(float(sum(by_card.values())), 2),
+        "by_card": {card_number: round(float(total), 2) for card_number, total in by_card.items()},
+        # Расходы отсортированы по времени, поэтому крайние значения - первая и последняя строки
+        "min_timestamp": min(expenses[0].timestamp, expenses[-1].timestamp) if expenses else None,
+        "max_timestamp": max(expenses[0].timestamp, expenses[-1].timestamp) if expenses else None
+    }
+
 
-    expenses_list = [
+def get_expenses_summary(
+    db: Session,
+    unix_range_start: Optional[int] = None,
+    unix_range_end: Optional[int] = None,
+    card_number: Optional[str] = None,
+    show_all_expenses: bool = False
+):
+    """
+    Итоги расходов за период одним агрегирующим запросом (без выборки самих расходов):
+    количество, сумма, суммы по картам и крайние даты.
+    """
+    query = select(
+        Expense.card_number,
+        func.count(Expense.id),
+        func.sum(func.abs(Expense.amount)),
+        func.min(Expense.timestamp),
+        func.max(Expense.timestamp)
+    )
+    query = filter_by_date(query, unix_range_start, unix_range_end)
+    query = filter_by_card_number(query, card_number, show_all_expenses)
+    rows = db.execute(query.group_by(Expense.card_number)).all()
+
+    return {
+        "count": sum(row[1] for row in rows),
+        "total": round(float(sum(row[2] for row in rows)), 2) if rows else 0.0,
+        "by_card": {row[0]: round(float(row[2]), 2) for row in rows},
+        "min_timestamp": min((row[3] for row in rows), default=None),
+        "max_timestamp": max((row[4] for row in rows), default=None)
+    }
+
+
+def format_expenses_response(rows, timezone_str, card_number):
+    """
+    Формирует список расходов из строк (id, timestamp, card_number, amount, description, category).
+    """
+    if card_number:
+        return [
+            {
+                "id": expense_id,
+                "amount": float(abs(amount)),
+                "description": description,
+                "category": category or "Не указана"
+            }
+            for expense_id, _, _, amount, description, category in rows
+        ]
+
+    # Дата и время всех расходов форматируются одним проходом
+    date_times = format_unix_times([row[1] for row in rows], timezone_str)
+
+    return [
         {
-            "id": expense.id,
-            "amount": float(abs(expense.amount)),
-            "description": expense.description,
-            "category": categories_map.get(expense.category_id) or "Не указана"
+            "id": expense_id,
+            "amount": float(abs(amount)),
+            "description": description,
+            "category": category or "Не указана",
+            "date_time": date_time,
+            "card_number": expense_card_number
         }
-        for expense in expenses
+        for (expense_id, _, expense_card_number, amount, description, category), date_time in zip(rows, date_times)
     ]
-    
-    # Добавление дополнительных полей, если номер карты не указан
-    if not card_number:
-        for expense_item, expense in zip(expenses_list, expenses):
-            expense_item.update({
-                "date_time": convert_unix_to_local_datetime(expense.timestamp, timezone_str),
-                "card_number": expense.card_number
-            })
-
-    return expenses_list
-
 
 
 def get_expenses_from_db(
@@ -93,102 +184,246 @@ def get_expenses_from_db(
     timezone_str: str = "Europe/Moscow",
     card_number: Optional[str] = None,
     show_all_expenses: bool = False,
-    sort_order: str = "desc"  # "asc" (от раннего) или "desc" (от позднего)
+    sort_order: str = "desc",  # "asc" (от раннего) или "desc" (от позднего)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
 ):
     """
     Получение расходов за выбранный период из базы данных.
+    Выбираются только нужные столбцы, название категории подтягивается в том же запросе.
+    Если задан limit, возвращается одна страница из limit расходов после cursor и курсор
+    следующей страницы (next_cursor). Итоги за весь период (summary, cards, message)
+    считаются отдельным агрегирующим запросом только для первой страницы.
     """
-    query = db.query(Expense)
+    query = (
+        select(
+            Expense.id,
+            Expense.timestamp,
+            Expense.card_number,
+            Expense.amount,
+            Expense.description,
+            CategoryExpenses.title
+        )
+        .outerjoin(CategoryExpenses, Expense.category_id == CategoryExpenses.id)
+    )
     
     # Применение фильтрации по дате
     query = filter_by_date(query, unix_range_start, unix_range_end)
     
     # Применение фильтрации по номеру карты
-    query = filter_by_card_number(query, db, card_number, show_all_expenses)
+    query = filter_by_card_number(query, card_number, show_all_expenses)
     
     # Применение сортировки
     sort_order = 'asc' if card_number else sort_order
     query = sort_expenses(query, sort_order)
-    
-    expenses = query.all()
-    
-    # Генерация сообщения о периоде
-    period_message = generate_period_message_for_expenses(expenses, unix_range_start, unix_range_end, card_number)
-    
-    categories_dict = get_categories_from_db(db)
-    
+
+    if limit is None:
+        expenses = db.execute(query).all()
+        next_cursor = None
+    else:
+        # Лишняя строка показывает, есть ли следующая страница
+        query = filter_by_cursor(query, parse_expenses_cursor(cursor), sort_order)
+        expenses = db.execute(query.limit(limit + 1)).all()
+        next_cursor = None
+        if len(expenses) > limit:
+            expenses = expenses[:limit]
+            next_cursor = f"{expenses[-1].timestamp}_{expenses[-1].id}"
+
     # Формирование списка расходов
-    expenses_list = format_expenses_response(expenses, categories_dict, timezone_str, card_number)
-    
     result = {
-        "expenses": expenses_list,
-        "message": period_message
+        "expenses": format_expenses_response(expenses, timezone_str, card_number),
+        "next_cursor": next_cursor
     }
-    
+
+    # Следующим страницам итоги не нужны, они уже есть у клиента
+    if cursor:
+        return result
+
+    if limit is None:
+        summary = summarize_expenses(expenses)  # Все расходы периода уже выбраны
+    else:
+        summary = get_expenses_summary(db, unix_range_start, unix_range_end, card_number, show_all_expenses)
+
+    # Генерация сообщения о периоде
+    result["message"] = generate_period_message_for_expenses(summary, unix_range_start, unix_range_end, card_number)
+    result["summary"] = {key: summary[key] for key in ("count", "total", "by_card")}
+
     if not card_number:
-        unique_cards = list({expense.card_number for expense in expenses})
-        result.update({"cards": unique_cards, "source": "database"})
-    
+        result.update({"cards": list(summary["by_card"]), "source": "database"})
+
     return result
 
 
-def save_expenses_to_db(db, expenses, time_zone):
+def get_expense_totals_by_card(db: Session, unix_range_start: int, unix_range_end: int):
     """
-    Сохранение расходов в БД и возврат списка сохранённых расходов с их ID.
+    Суммы расходов за период по каждой карте одним агрегирующим запросом.
+    Возвращает словарь {номер карты: сумма} (переводы - под пустым номером карты).
     """
-    saved_expenses = []
-    
+    query = (
+        select(Expense.card_number, func.sum(func.abs(Expense.amount)))
+        .where(Expense.timestamp >= unix_range_start, Expense.timestamp <= unix_range_end)
+        .group_by(Expense.card_number)
+    )
+    result = db.execute(query)
+    return {card_number: round(float(total), 2) for card_number, total in result}
+
+
+def get_categorized_expenses(db: Session):
+    """
+    Описание, номер карты и категория всех размеченных расходов (обучающая выборка модели категорий).
+    """
+    query = (
+        select(Expense.description, Expense.card_number, Expense.category_id)
+        .where(Expense.category_id.is_not(None))
+        .order_by(Expense.id)
+    )
+    return db.execute(query).all()
+
+
+def get_uncategorized_expenses(db: Session, after_id: int = 0, limit: int = SAVE_EXPENSES_BATCH_SIZE):
+    """
+    Следующая пачка расходов без категории с ID больше after_id (id, описание, номер карты).
+    """
+    query = (
+        select(Expense.id, Expense.description, Expense.card_number)
+        .where(Expense.category_id.is_(None), Expense.id > after_id)
+        .order_by(Expense.id)
+        .limit(limit)
+    )
+    return db.execute(query).all()
+
+
+def get_expense_key(timestamp, card_number, amount, description):
+    """
+    Естественный ключ расхода (по нему ищутся дубли).
+    """
+    return (int(timestamp), card_number, float(amount), description)
+
+
+def find_existing_expenses(db: Session, keys):
+    """
+    Одним запросом находит уже сохранённые расходы по естественным ключам.
+    Возвращает словарь {ключ: id}.
+    """
+    if not keys:
+        return {}
+
+    query = select(
+        Expense.id,
+        Expense.timestamp,
+        Expense.card_number,
+        Expense.amount,
+        Expense.description
+    ).where(
+        tuple_(
+            Expense.timestamp,
+            Expense.card_number,
+            Expense.amount,
+            Expense.description
+        ).in_(list(keys))
+    )
+
+    result = db.execute(query)
+    return {
+        get_expense_key(row.timestamp, row.card_number, row.amount, row.description): row.id
+        for row in result
+    }
+
+
+def format_saved_expense(expense, expense_id, category=None):
+    return {
+        "id": expense_id,
+        "date_time": expense["date_time"],
+        "card_number": expense["card_number"],
+        "transaction_type": "расход",
+        "amount": expense["amount"],
+        "description": expense["description"],
+        "category": category or expense.get("category", "Не указана"),
+    }
+
+
+def save_expenses_batch(db: Session, expenses, time_zone, classifier=None):
+    """
+    Сохраняет пачку расходов: один запрос на поиск дублей, одна вставка новых
+    (INSERT ... RETURNING на всю пачку) и одно обновление дневных сумм. Если передан classifier (ExpenseCategorizer),
+    новым расходам сразу проставляется категория.
+    """
+    keyed_expenses = []
     for expense in expenses:
-        # Перевод времени в Unix-формат
-        timestamp = get_unix_time_ms_from_string(expense["date_time"], time_zone)
-
-        # Проверяем, существует ли расход с такими же параметрами
-        query = select(Expense).where(
-            and_(
-                Expense.timestamp == timestamp,
-                Expense.card_number == expense["card_number"],
-                Expense.amount == expense["amount"],
-                Expense.description == expense["description"],
-            )
-        )
+        # Время в Unix-формате приходит из разбора выгрузки, иначе переводим строку
+        timestamp = expense.get("timestamp")
+        if timestamp is None:
+            timestamp = get_unix_time_ms_from_string(expense["date_time"], time_zone)
+        key = get_expense_key(timestamp, expense["card_number"], expense["amount"], expense["description"])
+        keyed_expenses.append((key, expense))
 
-        result = db.execute(query)
-        existing_expense = result.scalars().first()
-
-        # Если такого расхода нет, добавляем его в базу
-        if existing_expense is None:
-            new_expense = Expense(
-                timestamp=timestamp,
-                card_number=expense["card_number"],
-                amount=expense["amount"],
-                description=expense["description"],
-            )
-            db.add(new_expense)
-            db.flush()  # Получаем ID без коммита
-
-            # Добавляем в список
-            saved_expenses.append({
-                "id": new_expense.id,
-                "date_time": expense["date_time"],
-                "card_number": expense["card_number"],
-                "transaction_type": "расход",
-                "amount": expense["amount"],
-                "description": expense["description"],
-                "category": expense.get("category", "Не указана"),
-            })
-        else:
-            # Если расход уже есть, добавляем его ID
-            saved_expenses.append({
-                "id": existing_expense.id,
-                "date_time": expense["date_time"],
+    # Проверяем, какие расходы уже есть в БД
+    expense_ids = find_existing_expenses(db, {key for key, _ in keyed_expenses})
+
+    # Новые расходы (одинаковые строки внутри пачки сохраняются один раз)
+    new_expenses = {}
+    for key, expense in keyed_expenses:
+        if key not in expense_ids and key not in new_expenses:
+            new_expenses[key] = {
+                "timestamp": key[0],
                 "card_number": expense["card_number"],
-                "transaction_type": "расход",
                 "amount": expense["amount"],
                 "description": expense["description"],
-                "category": expense.get("category", "Не указана"),
-            })
-    
+                "category_id": None
+            }
+
+    categories = {}
+    if new_expenses and classifier:
+        matches = classifier.classify_all([
+            (new_expense["description"], new_expense["card_number"]) for new_expense in new_expenses.values()
+        ])
+        for (key, new_expense), match in zip(new_expenses.items(), matches):
+            if match:
+                new_expense["category_id"], categories[key] = match
+
+    if new_expenses:
+        # Вставка всей пачки без коммита. Не через add_all + flush: на SQLite ORM вставляет такие строки
+        # по одной. ID сопоставляются по естественному ключу, поэтому порядок возвращённых строк не важен
+        result = db.execute(
+            insert(Expense).returning(Expense.id, Expense.timestamp, Expense.card_number, Expense.amount, Expense.description),
+            list(new_expenses.values())
+        )
+        expense_ids.update({
+            get_expense_key(row.timestamp, row.card_number, row.amount, row.description): row.id
+            for row in result
+        })
+
+        # Дневные суммы обновляются в той же транзакции, что и вставка
+        deltas = new_rollup_deltas()
+        for new_expense in new_expenses.values():
+            add_rollup_delta(deltas, new_expense["timestamp"], new_expense["card_number"], new_expense["category_id"], new_expense["amount"])
+        apply_rollup_deltas(db, deltas)
+
+    return [format_saved_expense(expense, expense_ids[key], categories.get(key)) for key, expense in keyed_expenses]
+
+
+def save_expenses_to_db(db, expenses, time_zone, batch_size: int = SAVE_EXPENSES_BATCH_SIZE, classifier=None):
+    """
+    Сохранение расходов в БД и возврат списка сохранённых расходов с их ID.
+    Расходы проверяются и вставляются пачками по batch_size строк.
+    """
+    saved_expenses = []
+
+    # expenses может быть генератором, поэтому читаем его пачками
+    expenses = iter(expenses)
+    while batch := list(islice(expenses, batch_size)):
+        saved_expenses += save_expenses_batch(db, batch, time_zone, classifier)
+
     # Сохраняем изменения в БД
     db.commit()
 
-    return saved_expenses 
\ No newline at end of file
+    return saved_expenses
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_expenses_from_db_async = async_counterpart(get_expenses_from_db)
+get_expenses_summary_async = async_counterpart(get_expenses_summary)
+get_expense_totals_by_card_async = async_counterpart(get_expense_totals_by_card)
+find_existing_expenses_async = async_counterpart(find_existing_expenses)
+save_expenses_batch_async = async_counterpart(save_expenses_batch)
+save_expenses_to_db_async = async_counterpart(save_expenses_to_db)
@@ -0,0 +1,94 @@
+# routes/directory/tinkoff/google_sheets_sync.py
+
+# Стандартные модули Python
+from typing import Optional
+
+# Сторонние модули
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+
+# Собственные модули
+from models import GoogleSheetsSyncState, GoogleSheetsSyncRow
+
+from routes.directory.tinkoff.utils import async_counterpart
+
+
+def get_sync_state(db: Session) -> Optional[GoogleSheetsSyncState]:
+    """
+    Получить состояние синхронизации с Google Sheets (None, если синхронизации ещё не было).
+    """
+    return db.query(GoogleSheetsSyncState).first()
+
+
+def save_sync_state(db: Session, last_expense_id: int, row_count: int, last_month: Optional[str], last_date: Optional[str]):
+    """
+    Сохранить состояние синхронизации, перезаписывая старое, если оно есть.
+    """
+    state = db.query(GoogleSheetsSyncState).first()
+    if not state:
+        state = GoogleSheetsSyncState()
+        db.add(state)
+
+    state.last_expense_id = last_expense_id
+    state.row_count = row_count
+    state.last_month = last_month
+    state.last_date = last_date
+    db.commit()
+    return state
+
+
+def get_row_checksums(db: Session, expense_ids) -> dict:
+    """
+    Возвращает словарь {id расхода: (номер строки, контрольная сумма)} для выгруженных расходов.
+    """
+    if not expense_ids:
+        return {}
+
+    query = select(
+        GoogleSheetsSyncRow.expense_id,
+        GoogleSheetsSyncRow.row_number,
+        GoogleSheetsSyncRow.checksum
+    ).where(GoogleSheetsSyncRow.expense_id.in_(list(expense_ids)))
+
+    result = db.execute(query)
+    return {row.expense_id: (row.row_number, row.checksum) for row in result}
+
+
+def save_row_checksums(db: Session, rows: dict):
+    """
+    Сохраняет строки расходов одним запросом.
+    :param rows: Словарь {id расхода: (номер строки, контрольная сумма)}
+    """
+    if not rows:
+        return
+
+    query = insert(GoogleSheetsSyncRow).values([
+        {"expense_id": expense_id, "row_number": row_number, "checksum": checksum}
+        for expense_id, (row_number, checksum) in rows.items()
+    ])
+    query = query.on_conflict_do_update(
+        index_elements=[GoogleSheetsSyncRow.expense_id],
+        set_={
+            "row_number": query.excluded.row_number,
+            "checksum": query.excluded.checksum
+        }
+    )
+    db.execute(query)
+    db.commit()
+
+
+def clear_row_checksums(db: Session):
+    """
+    Удаляет все сохранённые строки расходов (без коммита, в транзакции вызывающего).
+    """
+    db.execute(delete(GoogleSheetsSyncRow))
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_sync_state_async = async_counterpart(get_sync_state)
+save_sync_state_async = async_counterpart(save_sync_state)
+get_row_checksums_async = async_counterpart(get_row_checksums)
+save_row_checksums_async = async_counterpart(save_row_checksums)
+clear_row_checksums_async = async_counterpart(clear_row_checksums)
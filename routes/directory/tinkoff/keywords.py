@@ -0,0 +1,101 @@
+# routes/directory/tinkoff/keywords.py
+
+# Сторонние модули
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+
+# Собственные модули
+from models import CategoryExpenses, CategoryKeyword
+
+from utils.tinkoff.expense_classifier import ExpenseCategorizer, KeywordClassifier
+
+from routes.directory.tinkoff.cache import ttl_cache
+from routes.directory.tinkoff.categories import get_categories_from_db
+from routes.directory.tinkoff.utils import async_counterpart
+
+
+# Время жизни кэша классификатора (с); изменения через эндпоинты сбрасывают его сразу
+KEYWORDS_CACHE_TTL = 300
+
+
+def get_category_keywords_from_db(db: Session):
+    """
+    Получение ключевых слов категорий вместе с названием категории.
+    """
+    query = (
+        select(CategoryKeyword.id, CategoryKeyword.keyword, CategoryKeyword.category_id, CategoryExpenses.title)
+        .join(CategoryExpenses, CategoryKeyword.category_id == CategoryExpenses.id)
+        .order_by(CategoryKeyword.id)
+    )
+    return [
+        {
+            "id": keyword_id,
+            "keyword": keyword,
+            "category_id": category_id,
+            "category_name": title
+        }
+        for keyword_id, keyword, category_id, title in db.execute(query)
+    ]
+
+
+@ttl_cache(KEYWORDS_CACHE_TTL)
+def get_keyword_classifier(db: Session) -> KeywordClassifier:
+    """
+    Классификатор, собранный из всех ключевых слов (пересобирается после изменения слов или истечения кэша).
+    """
+    return KeywordClassifier(
+        (keyword["keyword"], keyword["category_id"], keyword["category_name"])
+        for keyword in get_category_keywords_from_db(db)
+    )
+
+
+def get_expense_categorizer(db: Session, model, threshold: float) -> ExpenseCategorizer:
+    """
+    Категоризатор новых расходов: ключевые слова и, если она обучена, модель категорий.
+    :param model: CategoryModel или None (модель читается из файла заранее, вне сессии БД)
+    """
+    return ExpenseCategorizer(
+        get_keyword_classifier(db),
+        model,
+        {category["id"]: category["category_name"] for category in get_categories_from_db(db)},
+        threshold
+    )
+
+
+def add_category_keyword(db: Session, keyword: str, category_id: int):
+    """
+    Добавляет ключевое слово категории.
+    """
+    keyword = keyword.strip()
+    if not keyword:
+        raise HTTPException(status_code=422, detail="Ключевое слово не может быть пустым")
+    if db.get(CategoryExpenses, category_id) is None:
+        raise HTTPException(status_code=422, detail=f"Категория с ID {category_id} не найдена")
+
+    category_keyword = CategoryKeyword(keyword=keyword, category_id=category_id)
+    db.add(category_keyword)
+    db.commit()
+    get_keyword_classifier.invalidate()
+    return category_keyword.id
+
+
+def delete_category_keyword(db: Session, keyword_id: int):
+    """
+    Удаляет ключевое слово категории.
+    """
+    result = db.execute(delete(CategoryKeyword).where(CategoryKeyword.id == keyword_id))
+    db.commit()
+    get_keyword_classifier.invalidate()
+
+    if not result.rowcount:
+        raise HTTPException(status_code=404, detail=f"Ключевое слово с ID {keyword_id} не найдено")
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_category_keywords_from_db_async = async_counterpart(get_category_keywords_from_db)
+get_keyword_classifier_async = async_counterpart(get_keyword_classifier)
+get_expense_categorizer_async = async_counterpart(get_expense_categorizer)
+add_category_keyword_async = async_counterpart(add_category_keyword)
+delete_category_keyword_async = async_counterpart(delete_category_keyword)
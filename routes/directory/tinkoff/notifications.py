@@ -1,6 +1,7 @@
 # routes/directory/tinkoff/notifications.py
 
 # Сторонние модули
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 
@@ -11,6 +12,24 @@ from models import (
     Users
 ) 
 
+from routes.directory.tinkoff.cache import ttl_cache
+from routes.directory.tinkoff.utils import async_counterpart
+
+
+# Время жизни кэша подписчиков уведомлений (с)
+NOTIFICATIONS_CACHE_TTL = 120
+
+
+def invalidate_notification_caches():
+    """
+    Сбрасывает кэши подписчиков (вызывать после изменения настроек уведомлений или привязки чатов).
+    """
+    get_chat_ids_for_error_notifications.invalidate()
+    get_chat_ids_for_transfer_notifications.invalidate()
+    get_card_nums_for_transfer_notifications.invalidate()
+
+
+@ttl_cache(NOTIFICATIONS_CACHE_TTL)
 def get_chat_ids_for_error_notifications(db: Session):
     """
     Получает список chat_id из tg_tmp_users для пользователей,
@@ -25,6 +44,7 @@ def get_chat_ids_for_error_notifications(db: Session):
     return [str(row[0]) for row in result.fetchall()]
 
 
+@ttl_cache(NOTIFICATIONS_CACHE_TTL)
 def get_chat_ids_for_transfer_notifications(db: Session):
     """
     Получает список chat_id из tg_tmp_users для пользователей,
@@ -39,6 +59,7 @@ def get_chat_ids_for_transfer_notifications(db: Session):
     return [str(row[0]) for row in result.fetchall()]
 
 
+@ttl_cache(NOTIFICATIONS_CACHE_TTL)
 def get_card_nums_for_transfer_notifications(db: Session):
     """
     Получает список карт из users для пользователей,
@@ -50,4 +71,28 @@ def get_card_nums_for_transfer_notifications(db: Session):
         .where(UserNotifications.receive_transfer_notifications == True)
     )
     result = db.execute(query)
-    return [str(row[0]) for row in result.fetchall()]
\ No newline at end of file
+    return [str(row[0]) for row in result.fetchall()]
+
+
+def get_expense_notification_recipients(db: Session, card_numbers):
+    """
+    Получает получателей уведомлений о расходах одним запросом: chat_id, карту пользователя
+    и признак получения всех расходов. Берутся пользователи, которым нужно отправлять
+    все расходы, и пользователи с картами из card_numbers.
+    """
+    receive_transfers = UserNotifications.receive_transfer_notifications == True
+    query = (
+        select(TgTmpUsers.chat_id, Users.card_number, receive_transfers)
+        .join(Users, TgTmpUsers.user_id == Users.id)
+        .outerjoin(UserNotifications, TgTmpUsers.user_id == UserNotifications.user_id)
+        .where(or_(receive_transfers, Users.card_number.in_(card_numbers)))
+    )
+    result = db.execute(query)
+    return [(str(chat_id), card_number, bool(is_transfer)) for chat_id, card_number, is_transfer in result]
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_chat_ids_for_error_notifications_async = async_counterpart(get_chat_ids_for_error_notifications)
+get_chat_ids_for_transfer_notifications_async = async_counterpart(get_chat_ids_for_transfer_notifications)
+get_card_nums_for_transfer_notifications_async = async_counterpart(get_card_nums_for_transfer_notifications)
+get_expense_notification_recipients_async = async_counterpart(get_expense_notification_recipients)
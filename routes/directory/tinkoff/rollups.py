@@ -0,0 +1,168 @@
+# routes/directory/tinkoff/rollups.py
+
+# Стандартные модули Python
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+# Сторонние модули
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import delete, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+
+# Собственные модули
+from utils.tinkoff.time_utils import get_local_datetime_from_unix, get_timezone
+
+from models import CategoryExpenses, ExpenseDailyRollup
+
+from routes.directory.tinkoff.utils import async_counterpart
+
+
+ROLLUP_TIMEZONE = "Europe/Moscow"  # Часовой пояс, по которому расходы раскладываются по дням
+NO_CATEGORY_ID = 0  # Ключ расходов без категории
+SUMMARY_PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+
+def get_rollup_key(timestamp, card_number, category_id):
+    """
+    Ключ строки сводной таблицы: (день, номер карты, ID категории).
+    """
+    day = get_local_datetime_from_unix(int(timestamp), ROLLUP_TIMEZONE).date()
+    return (day, card_number or "", category_id or NO_CATEGORY_ID)
+
+
+def add_rollup_delta(deltas, timestamp, card_number, category_id, amount, sign: int = 1):
+    """
+    Добавляет расход (sign=1) или его отмену (sign=-1) к накопленным изменениям {ключ: [сумма, количество]}.
+    """
+    delta = deltas[get_rollup_key(timestamp, card_number, category_id)]
+    delta[0] += sign * abs(Decimal(str(amount)))
+    delta[1] += sign
+
+
+def new_rollup_deltas():
+    return defaultdict(lambda: [Decimal(0), 0])
+
+
+def apply_rollup_deltas(db: Session, deltas):
+    """
+    Применяет изменения к сводной таблице одним upsert (без коммита, в транзакции вызывающего).
+    Опустевшие строки удаляются.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[1] or delta[0]}
+    if not deltas:
+        return
+
+    query = insert(ExpenseDailyRollup).values([
+        {
+            "day": day,
+            "card_number": card_number,
+            "category_id": category_id,
+            "total_amount": total,
+            "expense_count": count
+        }
+        for (day, card_number, category_id), (total, count) in deltas.items()
+    ])
+    query = query.on_conflict_do_update(
+        index_elements=[ExpenseDailyRollup.day, ExpenseDailyRollup.card_number, ExpenseDailyRollup.category_id],
+        set_={
+            "total_amount": ExpenseDailyRollup.total_amount + query.excluded.total_amount,
+            "expense_count": ExpenseDailyRollup.expense_count + query.excluded.expense_count
+        }
+    )
+    db.execute(query)
+
+    db.execute(
+        delete(ExpenseDailyRollup)
+        .where(
+            tuple_(ExpenseDailyRollup.day, ExpenseDailyRollup.card_number, ExpenseDailyRollup.category_id).in_(list(deltas)),
+            ExpenseDailyRollup.expense_count <= 0
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_summary_range(period: str, anchor_date: Optional[date] = None):
+    """
+    Первый и последний день месяца, квартала или года, в который попадает anchor_date (по умолчанию - сегодня).
+    """
+    if period not in SUMMARY_PERIOD_MONTHS:
+        raise ValueError("Unsupported period type. Use 'month', 'quarter' or 'year'.")
+
+    if anchor_date is None:
+        anchor_date = datetime.now(get_timezone(ROLLUP_TIMEZONE)).date()
+
+    months = SUMMARY_PERIOD_MONTHS[period]
+    first_month = (anchor_date.month - 1) // months * months + 1
+    start = anchor_date.replace(month=first_month, day=1)
+    end = start + relativedelta(months=months) - timedelta(days=1)
+    return start, end
+
+
+def get_expense_summary(db: Session, period: str = "month", anchor_date: Optional[date] = None,
+                        card_number: Optional[str] = None):
+    """
+    Итоги расходов за месяц, квартал или год из сводной таблицы: общая сумма, суммы по картам,
+    по категориям и по дням (для месяца) или месяцам (для квартала и года).
+    Объём выборки зависит от числа дней в периоде, а не от числа расходов.
+    """
+    start, end = get_summary_range(period, anchor_date)
+
+    query = (
+        select(
+            ExpenseDailyRollup.day,
+            ExpenseDailyRollup.card_number,
+            ExpenseDailyRollup.category_id,
+            CategoryExpenses.title,
+            ExpenseDailyRollup.total_amount,
+            ExpenseDailyRollup.expense_count
+        )
+        .outerjoin(CategoryExpenses, ExpenseDailyRollup.category_id == CategoryExpenses.id)
+        .where(ExpenseDailyRollup.day >= start, ExpenseDailyRollup.day <= end)
+    )
+    if card_number:
+        query = query.where(ExpenseDailyRollup.card_number == "*" + card_number)
+
+    series_format = "%Y-%m-%d" if period == "month" else "%Y-%m"
+    total = Decimal(0)
+    count = 0
+    by_card = defaultdict(Decimal)
+    by_category = {}
+    series = defaultdict(Decimal)
+
+    for day, row_card_number, category_id, title, row_total, row_count in db.execute(query):
+        total += row_total
+        count += row_count
+        by_card[row_card_number] += row_total
+        series[day.strftime(series_format)] += row_total
+
+        category = by_category.setdefault(category_id, {
+            "id": category_id or None,
+            "category": title or "Не указана",
+            "total": Decimal(0),
+            "count": 0
+        })
+        category["total"] += row_total
+        category["count"] += row_count
+
+    return {
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total": float(total),
+        "count": count,
+        "by_card": {card: float(card_total) for card, card_total in sorted(by_card.items())},
+        "by_category": sorted(
+            ({**category, "total": float(category["total"])} for category in by_category.values()),
+            key=lambda category: category["total"],
+            reverse=True
+        ),
+        "series": [{"date": key, "total": float(value)} for key, value in sorted(series.items())]
+    }
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_expense_summary_async = async_counterpart(get_expense_summary)
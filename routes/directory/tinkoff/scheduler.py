@@ -4,7 +4,15 @@ from sqlalchemy.orm import Session
 from models import Schedule  # Импорт модели
 from datetime import time
 
+from routes.directory.tinkoff.cache import ttl_cache
+from routes.directory.tinkoff.utils import async_counterpart
 
+
+# Время жизни кэша расписания (с), при изменении расписания кэш сбрасывается сразу
+IMPORT_TIMES_CACHE_TTL = 600
+
+
+@ttl_cache(IMPORT_TIMES_CACHE_TTL)
 def get_import_times(db: Session) -> dict:
     """
     Получить все времена экспорта пользователя в виде словаря {export_type: export_time}.
@@ -28,6 +36,7 @@ def set_export_time(db: Session, export_type: str, export_time: time):
         db.add(new_schedule)  # Добавляем новую запись
 
     db.commit()
+    get_import_times.invalidate()
 
 
 def delete_export_time(db: Session, export_type: str):
@@ -37,4 +46,11 @@ def delete_export_time(db: Session, export_type: str):
     db.query(Schedule).filter(
         Schedule.export_type == export_type
     ).delete()
-    db.commit()
\ No newline at end of file
+    db.commit()
+    get_import_times.invalidate()
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_import_times_async = async_counterpart(get_import_times)
+set_export_time_async = async_counterpart(set_export_time)
+delete_export_time_async = async_counterpart(delete_export_time)
@@ -6,6 +6,8 @@ from sqlalchemy.orm import Session
 # Собственные модули
 from models import TemporaryCode
 
+from routes.directory.tinkoff.utils import async_counterpart
+
 
 def set_temporary_code(db: Session, code: str):
     """
@@ -38,4 +40,9 @@ def get_temporary_code(db: Session) -> str:
         raise ValueError("Найдено несколько временных кодов. Все записи удалены.")
 
     # Если есть только одна запись, возвращаем её код
-    return codes[0].code
\ No newline at end of file
+    return codes[0].code
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+set_temporary_code_async = async_counterpart(set_temporary_code)
+get_temporary_code_async = async_counterpart(get_temporary_code)
@@ -6,6 +6,8 @@ from collections import defaultdict
 # Собственные модули
 from models import TgTmpUsers, Users
 
+from routes.directory.tinkoff.utils import async_counterpart
+
 
 def get_all_cards_by_chat_ids(db, chat_ids):
     """
@@ -19,4 +21,8 @@ def get_all_cards_by_chat_ids(db, chat_ids):
     for chat_id, card_number in results:
         cards_by_chat_id[str(chat_id)].append(card_number)
 
-    return cards_by_chat_id
\ No newline at end of file
+    return cards_by_chat_id
+
+
+# Асинхронные варианты (для эндпоинтов и задач в цикле событий приложения)
+get_all_cards_by_chat_ids_async = async_counterpart(get_all_cards_by_chat_ids)
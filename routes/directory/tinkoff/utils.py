@@ -1,9 +1,30 @@
 # routes/directory/tinkoff/utils.py
 
 # Стандартные модули Python
+from functools import wraps
 from typing import Optional
 from datetime import datetime
 
+# Сторонние модули
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def async_counterpart(func):
+    """
+    Делает асинхронный вариант функции доступа к данным вида f(db, ...).
+    Функция выполняется через AsyncSession.run_sync: ожидание ответа БД на каждый запрос
+    уходит в asyncpg и не блокирует цикл событий (в цикле остаются только сборка запросов и
+    разбор строк), а логика запросов (и кэш справочников) остаётся общей с синхронным вариантом.
+    Замер под параллельной нагрузкой - tests/test_async_db_concurrency.py.
+    """
+    @wraps(func)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(func, *args, **kwargs)
+
+    wrapper.__name__ = f"{func.__name__}_async"
+    wrapper.__qualname__ = wrapper.__name__
+    return wrapper
+
 
 def generate_period_message(
     min_timestamp: Optional[int],
@@ -3,37 +3,46 @@
 # Библиотеки Python
 import json
 import time
+from datetime import datetime
 
 # Сторонние библиотеки
 from fastapi import APIRouter, Depends, Query, Request, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Собственные модули
 from routes.auth_tinkoff import get_browser, check_for_browser
 
-from routes.directory.tinkoff.expenses import get_expenses_from_db
-from routes.directory.tinkoff.errors import get_last_unreceived_error
-from routes.directory.tinkoff.temporary_codes import set_temporary_code
-from routes.directory.tinkoff.notifications import get_chat_ids_for_transfer_notifications
-from routes.directory.tinkoff.scheduler import get_import_times
+from routes.directory.tinkoff.expenses import get_expenses_from_db_async, parse_expenses_cursor
+from routes.directory.tinkoff.rollups import get_expense_summary_async
+from routes.directory.tinkoff.keywords import (
+    get_category_keywords_from_db_async,
+    add_category_keyword_async,
+    delete_category_keyword_async
+)
+from routes.directory.tinkoff.errors import get_last_unreceived_error_async
+from routes.directory.tinkoff.temporary_codes import set_temporary_code_async
+from routes.directory.tinkoff.notifications import get_chat_ids_for_transfer_notifications_async
+from routes.directory.tinkoff.scheduler import get_import_times_async
 from routes.directory.tinkoff.categories import (
-    get_categories_from_db,
-    update_expense_category
+    get_categories_from_db_async,
+    update_expenses_categories_async
 )
-from routes.directory.bot import get_card_number_by_chat_id
+from routes.directory.bot import get_card_number_by_chat_id_async
 
 from utils.bot import check_miniapp_token
 
 from utils.tinkoff.expenses_utils import load_expenses_from_site
 from utils.tinkoff.time_utils import get_period_range
 from utils.tinkoff.browser_utils import PageType
+from utils.tinkoff.sync_google_category import apply_sheet_category_changes_async
 
 import config as config
-from database import Session
-from models import SaveKeywordsRequest
-from auth import create_temp_token, verify_bot_token
+from database import get_db
+from models import CategoryKeywordRequest, SaveKeywordsRequest, SheetCategoriesWebhookRequest
+from auth import create_temp_token, is_sheets_webhook_configured, verify_bot_token, verify_sheets_webhook_signature
 
 from dependencies import get_authenticated_user, get_current_user, get_token_from_cookie
 
@@ -41,13 +50,8 @@ from dependencies import get_authenticated_user, get_current_user, get_token_fro
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-
-def get_db():
-    db = Session()
-    try:
-        yield db
-    finally:
-        db.close()
+EXPENSES_PAGE_SIZE = 200  # Расходов на странице /tinkoff/expenses/, если передан cursor без limit
+EXPENSES_MAX_PAGE_SIZE = 1000
 
 
 # Эндпоинт для отображения страницы расходов
@@ -67,12 +71,25 @@ async def get_expenses(
     rangeEnd: Optional[str] = None,
     time_zone: str = Query("Europe/Moscow"),
     source: str = Query('db'),
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=EXPENSES_MAX_PAGE_SIZE),  # Без limit и cursor - все расходы периода
+    cursor: Optional[str] = Query(None),  # next_cursor предыдущей страницы
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_authenticated_user)
 ):
     """
     Универсальный эндпоинт для получения расходов. Работает и для бота, и для основного интерфейса.
+    Без limit и cursor расходы из базы отдаются за весь период одним ответом (так их запрашивает бот).
+    С limit они отдаются страницами: первая страница содержит итоги за весь период (summary)
+    и next_cursor, по которому запрашивается следующая страница.
     """
+    try:
+        parse_expenses_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if cursor and limit is None:
+        limit = EXPENSES_PAGE_SIZE
+
     card_num = None
     chat_id = None
     if token:
@@ -96,7 +113,10 @@ async def get_expenses(
         if source == 'tinkoff':
             expenses_data = await get_expenses_from_tinkoff(unix_range_start, unix_range_end, db, time_zone)
         else:
-            expenses_data = get_expenses_from_db(db, unix_range_start, unix_range_end, time_zone, card_num, show_all_expenses)
+            expenses_data = await get_expenses_from_db_async(
+                db, unix_range_start, unix_range_end, time_zone, card_num, show_all_expenses,
+                limit=limit, cursor=cursor
+            )
     except Exception as e:
         print(f"Ошибка загрузки расходов: {e}")
         return response_with_token(request, 
@@ -106,10 +126,40 @@ async def get_expenses(
                                     time_zone, 
                                     "Необходима авторизация")
 
+    # Следующие страницы догружает скрипт, итоги и шаблон им не нужны
+    if cursor:
+        return JSONResponse(content=expenses_data)
+
     return generate_expense_response(request, expenses_data, 
                                      token is not None, 
-                                     str(chat_id) in get_chat_ids_for_transfer_notifications(db),
-                                     get_import_times(db))
+                                     str(chat_id) in await get_chat_ids_for_transfer_notifications_async(db),
+                                     await get_import_times_async(db))
+
+
+@router.get("/tinkoff/expenses/summary/")
+async def get_expenses_summary(
+    period: str = Query("month"),  # "month", "quarter" или "year"
+    date: Optional[str] = Query(None),  # Любой день периода (YYYY-MM-DD), по умолчанию - сегодня
+    token: Optional[str] = Query(None),  # Если передан, значит, запрос от бота
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_authenticated_user)
+):
+    """
+    Итоги расходов за месяц, квартал или год из дневной сводки (без чтения отдельных расходов).
+    """
+    card_num = None
+    if token:
+        # Боту доступны только расходы по карте пользователя
+        card_num, _ = await process_bot_request(token, db)
+    else:
+        if isinstance(user, RedirectResponse):
+            pass  # return user  # Если пользователь не аутентифицирован
+
+    try:
+        anchor_date = datetime.strptime(date, "%Y-%m-%d").date() if date else None
+        return await get_expense_summary_async(db, period, anchor_date, card_num)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 
 def get_user_role_from_request(request: Request):
@@ -122,14 +172,14 @@ def get_user_role_from_request(request: Request):
     return payload.get("role")
 
 
-async def process_bot_request(token: str, db: Session) -> str:
+async def process_bot_request(token: str, db: AsyncSession) -> str:
     """Проверяет токен бота и возвращает номер карты."""
     try:
         user_data = verify_bot_token(token)
         chat_id = int(user_data.get("chat_id"))
         auth_date = int(user_data.get("auth_date", 0))
 
-        card_num = get_card_number_by_chat_id(db, chat_id)
+        card_num = await get_card_number_by_chat_id_async(db, chat_id)
         if not card_num:
             raise HTTPException(status_code=403, detail="Пользователь не найден.")
         return card_num, chat_id
@@ -137,11 +187,12 @@ async def process_bot_request(token: str, db: Session) -> str:
         raise HTTPException(status_code=403, detail=str(e))
 
 
-async def get_expenses_from_tinkoff(start: int, end: int, db: Session, time_zone: str):
+async def get_expenses_from_tinkoff(start: int, end: int, db: AsyncSession, time_zone: str):
     """Загружает расходы с сайта Тинькофф."""
     browser = get_browser()
     if browser and await check_for_browser(browser):
-        return await load_expenses_from_site(browser, start, end, db, time_zone)
+        async with config.browser_pool.lease() as browser:
+            return await load_expenses_from_site(browser, start, end, db, time_zone)
     else:
         raise HTTPException(status_code=403, detail="Необходима авторизация.")
 
@@ -222,17 +273,17 @@ def set_temp_token(response, period, rangeStart, rangeEnd, time_zone):
 
 
 @router.get("/tinkoff/expenses/categories/")
-def get_categories(db: Session = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_db)):
     """
     Эндпоинт для получения всех категорий.
     """
-    return get_categories_from_db(db)
+    return await get_categories_from_db_async(db)
 
 
 @router.post("/tinkoff/expenses/keywords/")
 async def save_categories(
     request: SaveKeywordsRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_authenticated_user),
     token: Optional[str] = Query(None)
 ):
@@ -246,16 +297,90 @@ async def save_categories(
         if isinstance(user, RedirectResponse):
             pass  # return user  # Если пользователь не аутентифицирован
 
-    for keyword in request.keywords:
-        update_expense_category(db, keyword.expense_id, keyword.category_id)
+    results = await update_expenses_categories_async(
+        db, [(keyword.expense_id, keyword.category_id) for keyword in request.keywords]
+    )
+
+    failed = {expense_id: status for expense_id, status in results.items() if status != "updated"}
+    message = "Категории успешно обновлены" if not failed else f"Категории обновлены, не удалось обновить {len(failed)} расходов"
+
+    return JSONResponse(content={"message": message, "results": results})
+
+
+@router.get("/tinkoff/expenses/category_keywords/")
+async def get_category_keywords(db: AsyncSession = Depends(get_db)):
+    """
+    Эндпоинт для получения ключевых слов автокатегоризации.
+    """
+    return await get_category_keywords_from_db_async(db)
+
+
+@router.post("/tinkoff/expenses/category_keywords/")
+async def add_category_keyword(
+    request: CategoryKeywordRequest,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_authenticated_user)
+):
+    """
+    Эндпоинт для добавления ключевого слова (новые расходы с ним в описании получат категорию).
+    """
+    if isinstance(user, RedirectResponse):
+        pass  # return user  # Если пользователь не аутентифицирован
+
+    keyword_id = await add_category_keyword_async(db, request.keyword, request.category_id)
+    return {"message": "Ключевое слово добавлено", "id": keyword_id}
+
+
+@router.delete("/tinkoff/expenses/category_keywords/{keyword_id}")
+async def delete_category_keyword(
+    keyword_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_authenticated_user)
+):
+    """
+    Эндпоинт для удаления ключевого слова.
+    """
+    if isinstance(user, RedirectResponse):
+        pass  # return user  # Если пользователь не аутентифицирован
+
+    await delete_category_keyword_async(db, keyword_id)
+    return {"message": "Ключевое слово удалено"}
+
+
+@router.post("/tinkoff/expenses/categories/webhook/")
+async def sheet_categories_webhook(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Вебхук от Apps Script: изменения категорий из таблицы после окончания периода неактивности.
+    """
+    if not is_sheets_webhook_configured():
+        raise HTTPException(status_code=503, detail="Вебхук не настроен: задайте GOOGLE_SHEETS_WEBHOOK_SECRET в config.py")
+
+    body = await request.body()
+    try:
+        verify_sheets_webhook_signature(
+            body,
+            request.headers.get("X-Webhook-Timestamp"),
+            request.headers.get("X-Webhook-Signature")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    try:
+        payload = SheetCategoriesWebhookRequest.model_validate_json(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    results = await apply_sheet_category_changes_async(
+        db, [(change.category, change.expense_id) for change in payload.changes]
+    )
 
-    return JSONResponse(content={"message": "Категории успешно обновлены"})
+    return JSONResponse(content={"message": "Изменения категорий применены", "results": results})
 
 
 @router.post("/tinkoff/save_otp/")
 async def save_otp(
     otp: str = Query(...), 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_authenticated_user),
     token: Optional[str] = Query(None)
 ):
@@ -272,15 +397,15 @@ async def save_otp(
             pass # return user  # Если пользователь не аутентифицирован
     
     if otp and len(otp) == 4:
-        set_temporary_code(db, otp)
+        await set_temporary_code_async(db, otp)
 
 
 @router.get("/tinkoff/expenses/last_error/")
-def get_last_error(db: Session = Depends(get_db)):
+async def get_last_error(db: AsyncSession = Depends(get_db)):
     """
     Эндпоинт для получения последней ошибки при автовыгрузке расходов.
     """
-    last_error = get_last_unreceived_error(db)
+    last_error = await get_last_unreceived_error_async(db)
     if last_error:
         return {"last_error": last_error.error_text}
     return {"last_error": None}
\ No newline at end of file
@@ -4,7 +4,7 @@
 from fastapi import APIRouter
 
 # Собственные модули
-from routes.auth_tinkoff import get_browser
+import config as config
 
 
 router = APIRouter()
@@ -14,7 +14,8 @@ router = APIRouter()
 @router.post("/tinkoff/disconnect/")
 async def disconnect():
     print("Пользователь покинул страницу. Закрываем context.")
-    browser = get_browser()
-    if browser:
-        await browser.close_browser()
-    return {"message": "Браузер закрыт"}
\ No newline at end of file
+    async with config.browser_pool.lease_page() as browser:  # Не закрываем контекст посреди автозагрузки
+        if browser:
+            await browser.close_context_and_page()  # Сам браузер остаётся запущенным для следующих входов
+    config.browser_pool.finish_login()
+    return {"message": "Контекст браузера закрыт"}
\ No newline at end of file
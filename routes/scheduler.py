@@ -6,9 +6,10 @@ from datetime import datetime
 # Сторонние модули
 from fastapi import APIRouter, Depends
 from fastapi.responses import RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Собственные модули
-from routes.directory.tinkoff.scheduler import set_export_time
+from routes.directory.tinkoff.scheduler import set_export_time_async
 
 from utils.tinkoff.scheduler_utils import update_scheduler
 
@@ -16,23 +17,16 @@ from dependencies import get_authenticated_user
 
 from models import ScheduleData
 
-from database import Session
+from database import get_db
 
 
 
 router = APIRouter()
 
-def get_db():
-    db = Session()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 @router.put("/tinkoff/schedular/")
 async def update_schedule(schedule_data: ScheduleData, 
-                          db: Session = Depends(get_db),
+                          db: AsyncSession = Depends(get_db),
                           user: dict = Depends(get_authenticated_user)):
     if isinstance(user, RedirectResponse):
         print("пользователь не аутентифицирован") # return user  # Если пользователь не аутентифицирован
@@ -48,10 +42,10 @@ async def update_schedule(schedule_data: ScheduleData,
         full_time = datetime.fromisoformat(full_time_str).time()
 
         if expenses_time:
-            set_export_time(db=db, export_type="expenses", export_time=expenses_time)
+            await set_export_time_async(db, export_type="expenses", export_time=expenses_time)
             print(f"Изменено время первой выгрузки: {expenses_time}")
         if full_time:
-            set_export_time(db=db, export_type="full", export_time=full_time)
+            await set_export_time_async(db, export_type="full", export_time=full_time)
             print(f"Изменено время второй выгрузки: {full_time}")
         
         update_scheduler(expenses_time, full_time)
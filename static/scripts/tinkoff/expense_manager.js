@@ -1,11 +1,15 @@
 class ExpenseManager {
-    constructor(expenses, categories, isMiniApp) {
+    constructor(expenses, categories, isMiniApp, summary = null) {
         if (!expenses) throw new Error("Расходы не должны быть пустыми!");
         this.originalExpenses = expenses;
         this.filteredExpenses = [...expenses];
         this.categories = categories;
         this.isMiniApp = isMiniApp;
 
+        // Итоги за весь период с сервера (расходы догружаются страницами)
+        this.summary = summary;
+        this.cardFilter = null;
+
         // Журнал изменений
         this.changesJournal = {};
 
@@ -19,6 +23,7 @@ class ExpenseManager {
 
     // Метод для фильтрации по карте
     filterByCard(card) {
+        this.cardFilter = card;
         this.filteredExpenses = this.originalExpenses.filter(expense => expense.card_number === card);
         this.currentPage = 1; // Сбрасываем на первую страницу
         this.render();
@@ -26,11 +31,35 @@ class ExpenseManager {
 
     // Метод для сброса фильтра
     resetFilter() {
+        this.cardFilter = null;
         this.filteredExpenses = [...this.originalExpenses];
         this.render();
     }
 
+    // Добавление следующей страницы расходов
+    appendExpenses(expenses) {
+        this.originalExpenses.push(...expenses);
+        const newExpenses = this.cardFilter
+            ? expenses.filter(expense => expense.card_number === this.cardFilter)
+            : expenses;
+        this.filteredExpenses.push(...newExpenses);
+
+        if (this.isMiniApp) {
+            // В миниаппе показываются все расходы, поэтому дорисовываем только новые строки
+            const tableBody = $('#expensesTable tbody');
+            newExpenses.forEach(expense => tableBody.append(this.createRow(expense)));
+            this.renderTotal();
+        } else {
+            this.render();
+        }
+    }
+
     calculateTotalExpense() {
+        if (this.summary) {
+            const total = this.cardFilter ? (this.summary.by_card[this.cardFilter] || 0) : this.summary.total;
+            return total.toFixed(2);
+        }
+
         const total = this.filteredExpenses.reduce((total, expense) => {
             return total + parseFloat(expense.amount); // Преобразуем строку в число
         }, 0);
@@ -110,79 +139,91 @@ class ExpenseManager {
         const expensesToRender = this.filteredExpenses.slice(startIndex, endIndex);
 
         expensesToRender.forEach(expense => {
-            let row;
-            const selectedCategory = this.categories.find(cat => cat.category_name === expense.category);
-            const categoryColor = selectedCategory ? selectedCategory.color : 'transparent'; 
-            const categoryId = selectedCategory ? selectedCategory.id : null; 
-
-            if (this.isMiniApp) {
-                row = $(`<tr>
-                            <td>${expense.amount} ₽</td>
-                            <td>${expense.description}</td>
-                            <td>
-                                <div class="custom-select" data-id="${expense.id}">
-                                    <div class="selected">
-                                        <div style="background-color: ${categoryColor}" data-category-id="${categoryId}" class="category-text circle-selection">${expense.category}</div>
-                                        <div class="icons">
-                                            <div class="close-icon">
-                                                <svg xmlns="http://www.w3.org/2000/svg" width="9" height="9" viewBox="0 0 100 100">
-                                                    <path d="M10 10L90 90M90 10L10 90" stroke="black" stroke-width="20"/>
-                                                </svg>
-                                            </div>
-                                            <div class="dropdown-icon">▼</div>
+            tableBody.append(this.createRow(expense));
+        });
+
+        this.renderTotal();
+        this.renderPaginationControls();
+    }
+
+    // Отображаем общую сумму
+    renderTotal() {
+        const totalExpense = this.calculateTotalExpense();
+        let text = `Общая сумма расходов: ${totalExpense} ₽`;
+        if (this.summary && this.originalExpenses.length < this.summary.count) {
+            text += ` (загружено ${this.originalExpenses.length} из ${this.summary.count})`;
+        }
+        $('#totalExpenses').text(text);
+    }
+
+    // Строка таблицы для расхода
+    createRow(expense) {
+        let row;
+        const selectedCategory = this.categories.find(cat => cat.category_name === expense.category);
+        const categoryColor = selectedCategory ? selectedCategory.color : 'transparent'; 
+        const categoryId = selectedCategory ? selectedCategory.id : null; 
+
+        if (this.isMiniApp) {
+            row = $(`<tr>
+                        <td>${expense.amount} ₽</td>
+                        <td>${expense.description}</td>
+                        <td>
+                            <div class="custom-select" data-id="${expense.id}">
+                                <div class="selected">
+                                    <div style="background-color: ${categoryColor}" data-category-id="${categoryId}" class="category-text circle-selection">${expense.category}</div>
+                                    <div class="icons">
+                                        <div class="close-icon">
+                                            <svg xmlns="http://www.w3.org/2000/svg" width="9" height="9" viewBox="0 0 100 100">
+                                                <path d="M10 10L90 90M90 10L10 90" stroke="black" stroke-width="20"/>
+                                            </svg>
                                         </div>
+                                        <div class="dropdown-icon">▼</div>
                                     </div>
                                 </div>
-                            </td>
-                        </tr>`);
-            }
-            else {
-                row = $(`<tr>
-                            <td>${expense.date_time}</td>
-                            <td>${expense.card_number}</td>
-                            <td>${expense.amount} ₽</td>
-                            <td>${expense.description}</td>
-                            <td>
-                                <div class="custom-select" data-id="${expense.id}">
-                                    <div class="selected">
-                                        <div style="background-color: ${categoryColor}" data-category-id="${categoryId}" class="category-text circle-selection">${expense.category}</div>
-                                        <div class="icons">
-                                            <div class="close-icon">
-                                                <svg xmlns="http://www.w3.org/2000/svg" width="9" height="9" viewBox="0 0 100 100">
-                                                    <path d="M10 10L90 90M90 10L10 90" stroke="black" stroke-width="20"/>
-                                                </svg>
-                                            </div>
-                                            <div class="dropdown-icon">▼</div>
+                            </div>
+                        </td>
+                    </tr>`);
+        }
+        else {
+            row = $(`<tr>
+                        <td>${expense.date_time}</td>
+                        <td>${expense.card_number}</td>
+                        <td>${expense.amount} ₽</td>
+                        <td>${expense.description}</td>
+                        <td>
+                            <div class="custom-select" data-id="${expense.id}">
+                                <div class="selected">
+                                    <div style="background-color: ${categoryColor}" data-category-id="${categoryId}" class="category-text circle-selection">${expense.category}</div>
+                                    <div class="icons">
+                                        <div class="close-icon">
+                                            <svg xmlns="http://www.w3.org/2000/svg" width="9" height="9" viewBox="0 0 100 100">
+                                                <path d="M10 10L90 90M90 10L10 90" stroke="black" stroke-width="20"/>
+                                            </svg>
                                         </div>
+                                        <div class="dropdown-icon">▼</div>
                                     </div>
                                 </div>
-                            </td>
-                        </tr>`);
-            }
+                            </div>
+                        </td>
+                    </tr>`);
+        }
 
-            row.find('.custom-select').click((e) => {
-                const target = $(e.target).closest('.custom-select');
-                const existingWrapper = $('.select-wrapper');
+        row.find('.custom-select').click((e) => {
+            const target = $(e.target).closest('.custom-select');
+            const existingWrapper = $('.select-wrapper');
 
-                if (existingWrapper.length && existingWrapper.is(':visible')) {
-                    existingWrapper.remove();
-                    return;
-                }
-                this.showDropdown(target);
-            });
+            if (existingWrapper.length && existingWrapper.is(':visible')) {
+                existingWrapper.remove();
+                return;
+            }
+            this.showDropdown(target);
+        });
 
-            row.find('.close-icon').click(() => {
-                this.clickCategoryReset(row);
-            });
-            
-            tableBody.append(row);
+        row.find('.close-icon').click(() => {
+            this.clickCategoryReset(row);
         });
- 
-        // Отображаем общую сумму
-        const totalExpense = this.calculateTotalExpense();
-        $('#totalExpenses').text(`Общая сумма расходов: ${totalExpense} ₽`);
 
-        this.renderPaginationControls();
+        return row;
     }
 
     showDropdown(target) {
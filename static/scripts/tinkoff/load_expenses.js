@@ -1,7 +1,12 @@
 let expenseManager = null;
+const EXPENSES_PAGE_SIZE = 200; // Расходов на странице: первая показывается сразу, остальные догружаются по курсору
+let expensesLoadId = 0; // Номер текущей загрузки (догрузка старого периода прекращается при смене периода)
+
+// Общая функция для обработки возвращенной таблицы расходов с бэка.
+// requestUrl - запрос, которым получена первая страница (по нему догружаются следующие)
+async function loadExpenses(data, requestUrl = window.location.href) {
+    const loadId = ++expensesLoadId;
 
-// Общая функция для обработки возвращенной таблицы расходов с бэка
-async function loadExpenses(data) {
     // Настройка фильтра по уникальным картам
     const uniqueCards = data.cards || [];
     $('#cardFilter').select2({
@@ -25,9 +30,45 @@ async function loadExpenses(data) {
 
     // Инициализация ExpenseManager
     if (data.expenses) {
-        expenseManager = new ExpenseManager(data.expenses, categories, isMiniApp);
+        expenseManager = new ExpenseManager(data.expenses, categories, isMiniApp, data.summary);
+
+        // Первая страница уже показана, остальные догружаются в фоне
+        if (data.next_cursor) {
+            loadRemainingExpenses(requestUrl, data.next_cursor, loadId);
+        }
+    }
+}
+
+// Догрузка следующих страниц расходов по курсору
+async function loadRemainingExpenses(requestUrl, cursor, loadId) {
+    const url = new URL(requestUrl, window.location.origin);
+
+    try {
+        while (cursor) {
+            url.searchParams.set('cursor', cursor);
+
+            const response = await fetch(url.toString(), {
+                method: "GET",
+                headers: { "X-Requested-With": "XMLHttpRequest" }
+            });
+
+            if (!response.ok) {
+                const errorData = await response.json();
+                showErrorToast(errorData.detail || "Не удалось загрузить все расходы за период.");
+                return;
+            }
+
+            const data = await response.json();
+
+            // Пока страница грузилась, пользователь выбрал другой период
+            if (loadId !== expensesLoadId) return;
+
+            expenseManager.appendExpenses(data.expenses || []);
+            cursor = data.next_cursor;
+        }
+    } catch (error) {
+        console.error('Ошибка при догрузке расходов:', error);
     }
-    
 }
 
 // Функция для получения значения параметра из текущего URL
@@ -57,6 +98,7 @@ async function loadExpensesByDefaultPeriod(period = 'month') {
         url.searchParams.append('period', period);
         url.searchParams.append('time_zone', userTimeZone);
         url.searchParams.append('source', currentDataSource);
+        url.searchParams.append('limit', EXPENSES_PAGE_SIZE);
 
         const response = await fetch(url.toString(), {
             method: "GET",
@@ -96,7 +138,7 @@ async function loadExpensesByDefaultPeriod(period = 'month') {
             return;
         }
 
-        await loadExpenses(data);
+        await loadExpenses(data, url.toString());
     } catch (error) {
         console.error('Ошибка при загрузке расходов:', error);
     } finally {
@@ -121,6 +163,7 @@ async function loadExpensesByPeriod(startDate, endDate) {
         url.searchParams.append('rangeEnd', endDate);
         url.searchParams.append('time_zone', userTimeZone);
         url.searchParams.append('source', currentDataSource);
+        url.searchParams.append('limit', EXPENSES_PAGE_SIZE);
 
         const response = await fetch(url.toString(), {
             method: "GET",
@@ -159,7 +202,7 @@ async function loadExpensesByPeriod(startDate, endDate) {
             showInfoToast("Нет данных за выбранный период.");
             return;
         }
-        await loadExpenses(data);
+        await loadExpenses(data, url.toString());
     } catch (error) {
         console.error('Ошибка при загрузке расходов:', error);
     } finally {
@@ -190,6 +233,7 @@ if (checkbox)
             url.searchParams.append('rangeEnd', rangeEnd);
             url.searchParams.append('time_zone', userTimeZone);
             url.searchParams.append('show_all_expenses', showAllExpenses);
+            url.searchParams.append('limit', EXPENSES_PAGE_SIZE);
 
             const response = await fetch(url.toString(), {
                 method: "GET",
@@ -223,7 +267,7 @@ if (checkbox)
                 return;
             }
 
-            await loadExpenses(data);
+            await loadExpenses(data, url.toString());
         } catch (error) {
             console.error('Ошибка при загрузке расходов:', error);
         } finally {
@@ -0,0 +1,50 @@
+# tests/conftest.py
+
+# Стандартные модули Python
+import hashlib
+import os
+import sys
+
+# Сторонние модули
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+
+# Тесты импортируют модули проекта от корня репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+@pytest.fixture
+def make_db():
+    """
+    Создаёт сессии на отдельных базах SQLite в памяти со схемой из models (вместо PostgreSQL).
+    md5 нужен уникальному индексу расходов.
+    """
+    from models import Base
+
+    engines, sessions = [], []
+
+    def make():
+        engine = create_engine("sqlite://")
+
+        @event.listens_for(engine, "connect")
+        def add_md5(connection, _):
+            connection.create_function("md5", 1, lambda value: hashlib.md5(value.encode()).hexdigest(), deterministic=True)
+
+        Base.metadata.create_all(engine)
+        engines.append(engine)
+        sessions.append(Session(engine))
+        return sessions[-1]
+
+    yield make
+    for session in sessions:
+        session.close()
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def db(make_db):
+    return make_db()
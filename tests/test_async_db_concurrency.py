@@ -0,0 +1,127 @@
+# tests/test_async_db_concurrency.py
+
+# Стандартные модули Python
+import asyncio
+import hashlib
+import time
+
+# Сторонние модули
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+# Собственные модули
+from models import Base
+
+from routes.directory.tinkoff.expenses import get_expenses_from_db, get_expenses_from_db_async, save_expenses_to_db
+from utils.loop_lag_monitor import LoopLagMonitor
+
+from test_save_expenses import make_expenses
+
+
+pytest.importorskip("aiosqlite")  # Асинхронный драйвер SQLite вместо asyncpg
+
+
+CONCURRENT_REQUESTS = 20
+QUERY_LATENCY = 0.01  # Задержка на каждый запрос к БД (сеть до PostgreSQL), с
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """
+    Синхронный и асинхронный движки на одной базе SQLite в файле.
+    Задержка добавляется в потоке, который выполняет запрос: для синхронной сессии это цикл событий,
+    для aiosqlite - поток соединения (как ожидание ответа от asyncpg, которое не блокирует цикл).
+    """
+    path = tmp_path / "expenses.db"
+    latency = {"seconds": 0.0}
+
+    def delay(statement):
+        time.sleep(latency["seconds"])
+
+    sync_engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=CONCURRENT_REQUESTS)
+
+    @event.listens_for(sync_engine, "connect")
+    def setup_sync_connection(connection, _):
+        connection.create_function("md5", 1, lambda value: hashlib.md5(value.encode()).hexdigest(), deterministic=True)
+        connection.set_trace_callback(delay)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def setup_async_connection(connection, _):
+        connection.run_async(lambda driver_connection: driver_connection.set_trace_callback(delay))
+
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        save_expenses_to_db(db, make_expenses(2000), "Europe/Moscow")
+
+    latency["seconds"] = QUERY_LATENCY
+    yield sync_engine, async_engine
+    asyncio.run(async_engine.dispose())
+    sync_engine.dispose()
+
+
+def run_requests(request):
+    """
+    Выполняет CONCURRENT_REQUESTS одновременно пришедших запросов: общее время,
+    время ответа (от общего старта, с ожиданием в очереди) и задержка цикла событий.
+    """
+    async def main():
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.1)
+        started = time.perf_counter()
+
+        async def timed_request():
+            result = await request()
+            return time.perf_counter() - started, result
+
+        async with monitor.measure("requests") as section:
+            responses = await asyncio.gather(*(timed_request() for _ in range(CONCURRENT_REQUESTS)))
+            total = time.perf_counter() - started
+            await asyncio.sleep(monitor.interval * 2)  # Замер, который пришёлся на запросы
+        await monitor.stop()
+        return total, responses, section["max_lag"]
+
+    total, responses, max_lag = asyncio.run(main())
+    latencies = sorted(latency for latency, _ in responses)
+    return {
+        "total": total,
+        "median": latencies[len(latencies) // 2],
+        "max": latencies[-1],
+        "loop_lag": max_lag,
+        "results": [result for _, result in responses]
+    }
+
+
+def test_async_session_serves_concurrent_requests(engines, capsys):
+    sync_engine, async_engine = engines
+    # Период выгрузки make_expenses (28-29.03.2026), первая страница с итогами
+    arguments = dict(unix_range_start=1774656000000, unix_range_end=1774828800000, timezone_str="Europe/Moscow", limit=200)
+
+    async def old_request():
+        # Прежний путь: синхронная сессия прямо в async-эндпоинте
+        with Session(sync_engine) as db:
+            return get_expenses_from_db(db, **arguments)
+
+    async def new_request():
+        async with AsyncSession(async_engine) as db:
+            return await get_expenses_from_db_async(db, **arguments)
+
+    # Первый прогон открывает соединения пулов, замеряется второй
+    for request in (old_request, new_request):
+        run_requests(request)
+    old, new = run_requests(old_request), run_requests(new_request)
+
+    with capsys.disabled():
+        print(f"\n{CONCURRENT_REQUESTS} параллельных запросов /tinkoff/expenses/ (задержка БД {QUERY_LATENCY * 1000:.0f} мс):")
+        for name, timings in (("Session", old), ("AsyncSession", new)):
+            print(
+                f"  {name:<12} всего {timings['total']:.3f} с, медиана {timings['median']:.3f} с, "
+                f"максимум {timings['max']:.3f} с, задержка цикла событий {timings['loop_lag']:.3f} с"
+            )
+
+    assert new["results"] == old["results"]
+    # Синхронные запросы выполняются по очереди и блокируют цикл событий, асинхронные - параллельно
+    assert new["total"] * 2 < old["total"]
+    assert new["max"] * 2 < old["max"]
+    assert new["loop_lag"] * 3 < old["loop_lag"]
@@ -0,0 +1,129 @@
+# tests/test_bot_notifier.py
+
+# Стандартные модули Python
+import asyncio
+import threading
+
+# Сторонние модули
+from aiohttp import web
+
+# Собственные модули
+from utils.tinkoff.bot_notifier import BotNotifier
+
+
+class StubBot:
+    """Сервер бота на локальном порту: запоминает запросы и отвечает заданными статусами."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)  # Ответы по порядку, затем 200
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append((request.path, await request.json()))
+        return web.json_response({}, status=self.statuses.pop(0) if self.statuses else 200)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/expenses", self.handle)
+        app.router.add_post("/errors", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.runner.cleanup()
+
+
+def make_notifier(bot, **options):
+    return BotNotifier(f"{bot.url}/expenses", f"{bot.url}/errors", **options)
+
+
+def test_queued_notifications_are_merged():
+    async def scenario():
+        async with StubBot() as bot:
+            notifier = make_notifier(bot)
+            notifier.notify_expenses({"1": "100 ₽"}, "01.01.2026")
+            notifier.notify_expenses({"2": "200 ₽", "1": "150 ₽"}, "01.01.2026")
+            notifier.notify_error([1, 2])
+            notifier.notify_error([2, 3])
+            await notifier.flush(5)
+            return bot.requests, notifier.get_metrics()
+
+    requests, metrics = asyncio.run(scenario())
+    assert sorted(requests, key=lambda request: request[0]) == [
+        ("/errors", {"chat_ids": [1, 2, 3]}),
+        ("/expenses", {"notification_data": {"1": "150 ₽", "2": "200 ₽"}, "today_date": "01.01.2026"}),
+    ]
+    assert metrics["sent"] == 2
+    assert metrics["batched"] == 2
+    assert metrics["queued"] == 0
+
+
+def test_server_errors_are_retried():
+    async def scenario():
+        async with StubBot(statuses=[503, 502]) as bot:
+            notifier = make_notifier(bot)
+            notifier.notify_error([1])
+            await notifier.flush(10)
+            return len(bot.requests), notifier.metrics
+
+    request_count, metrics = asyncio.run(scenario())
+    assert request_count == 3
+    assert (metrics["sent"], metrics["retries"], metrics["failed"]) == (1, 2, 0)
+
+
+def test_rejected_notification_is_not_retried():
+    async def scenario():
+        async with StubBot(statuses=[400]) as bot:
+            notifier = make_notifier(bot)
+            notifier.notify_error([1])
+            await notifier.flush(5)
+            return len(bot.requests), notifier.metrics
+
+    request_count, metrics = asyncio.run(scenario())
+    assert request_count == 1
+    assert (metrics["sent"], metrics["retries"], metrics["failed"]) == (0, 0, 1)
+
+
+def test_full_queue_drops_notifications():
+    async def scenario():
+        async with StubBot() as bot:
+            notifier = make_notifier(bot, queue_size=1)
+            accepted = [notifier.notify_error([1]), notifier.notify_error([2])]
+            await notifier.flush(5)
+            return accepted, notifier.metrics["dropped"]
+
+    assert asyncio.run(scenario()) == ([True, False], 1)
+
+
+def test_flush_delivers_before_temporary_loop_closes():
+    # Как в резервной ветке ExpenseScheduler: отдельный цикл событий на одну загрузку
+    bot_loop = asyncio.new_event_loop()
+    bot = bot_loop.run_until_complete(StubBot().__aenter__())
+    server = threading.Thread(target=bot_loop.run_forever, daemon=True)
+    server.start()
+    notifier = make_notifier(bot)
+
+    async def load_expenses():
+        notifier.notify_expenses({"1": "100 ₽"}, "01.01.2026")
+
+    try:
+        for _ in range(2):
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(load_expenses())
+                loop.run_until_complete(notifier.flush(5))
+            finally:
+                loop.close()
+        assert notifier.metrics["sent"] == 2
+        assert len(bot.requests) == 2
+    finally:
+        asyncio.run_coroutine_threadsafe(bot.__aexit__(None, None, None), bot_loop).result(5)
+        bot_loop.call_soon_threadsafe(bot_loop.stop)
+        server.join(5)
+        bot_loop.close()
+
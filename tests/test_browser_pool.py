@@ -0,0 +1,174 @@
+# tests/test_browser_pool.py
+
+# Стандартные модули Python
+import asyncio
+
+# Собственные модули
+from utils.tinkoff.browser_manager import BrowserManager
+from utils.tinkoff.browser_pool import BrowserPool
+
+
+class FakePage:
+    async def evaluate(self, script):
+        return 0
+
+
+class FakeBrowser:
+    """Открытый браузер со страницей, без запуска Chromium."""
+
+    def __init__(self, page_active=True):
+        self.page = FakePage()
+        self.page_active = page_active
+        self.in_use = False
+
+    async def is_browser_active(self):
+        return True
+
+    async def is_page_active(self):
+        return self.page_active
+
+    def reset_interaction_time(self):
+        pass
+
+
+def make_pool(browser, timeout=180):
+    pool = BrowserPool("./", "./", timeout)
+    pool.browser = browser
+    return pool
+
+
+def test_scheduled_lease_waits_for_interactive_login():
+    async def scenario():
+        pool = make_pool(FakeBrowser())
+        events = []
+
+        async with pool.lease(login=True):
+            events.append("login started")
+
+        async def scheduled_load():
+            async with pool.lease():
+                events.append("scheduled load")
+
+        task = asyncio.create_task(scheduled_load())
+        await asyncio.sleep(0.1)
+        async with pool.lease_page() as browser:
+            assert browser is pool.browser
+            events.append("login step")
+        await asyncio.sleep(0.1)
+        assert not task.done()
+
+        pool.finish_login()
+        await asyncio.wait_for(task, 5)
+        return events
+
+    assert asyncio.run(scenario()) == ["login started", "login step", "scheduled load"]
+
+
+def test_abandoned_login_does_not_block_forever():
+    async def scenario():
+        pool = make_pool(FakeBrowser(), timeout=0.5)
+        async with pool.lease(login=True):
+            pass
+        async with asyncio.timeout(5):
+            async with pool.lease() as browser:
+                return browser
+
+    assert asyncio.run(scenario()) is not None
+
+
+def test_lease_page_does_not_start_expired_session():
+    async def scenario():
+        results = []
+        for pool in (make_pool(None), make_pool(FakeBrowser(page_active=False))):
+            async with pool.lease_page() as browser:
+                results.append(browser)
+        return results
+
+    assert asyncio.run(scenario()) == [None, None]
+
+
+def test_lease_marks_browser_in_use():
+    async def scenario():
+        pool = make_pool(FakeBrowser())
+        async with pool.lease() as browser:
+            in_use = browser.in_use
+        return in_use, browser.in_use
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_close_browser_stops_playwright(tmp_path):
+    class FakeChromium:
+        async def close(self):
+            pass
+
+    class FakePlaywright:
+        stopped = False
+
+        async def stop(self):
+            self.stopped = True
+
+    async def scenario():
+        manager = BrowserManager(str(tmp_path), str(tmp_path), 180)
+        manager.browser = FakeChromium()
+        manager.playwright = playwright = FakePlaywright()
+        await manager.close_browser()
+        return playwright.stopped, manager.playwright
+
+    assert asyncio.run(scenario()) == (True, None)
+
+
+def test_idle_close_does_not_race_a_lease(tmp_path):
+    class SlowCheckManager(BrowserManager):
+        """Проверка страницы при аренде занимает время - окно, в которое раньше успевало закрытие по простою."""
+        closed = 0
+
+        async def is_browser_active(self):
+            return True
+
+        async def is_page_active(self):
+            await asyncio.sleep(0.05)
+            return True
+
+        async def close_context_and_page(self):
+            self.closed += 1
+
+    async def scenario():
+        pool = BrowserPool(str(tmp_path), str(tmp_path), timeout=0.1)
+        manager = SlowCheckManager(str(tmp_path), str(tmp_path), 0.1, lock=pool._lock)
+        manager.idle_check_interval = 0.01
+        pool.browser = manager
+
+        manager.reset_interaction_time()
+        await asyncio.sleep(0.09)  # Простой почти истёк
+        close_task = asyncio.create_task(manager.close_after_timeout())
+        async with pool.lease():
+            await asyncio.sleep(0.2)
+            closed_during_lease = manager.closed
+
+        await asyncio.wait_for(close_task, 1)
+        return closed_during_lease, manager.closed
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_close_saves_session_and_stops_browser():
+    class ClosingBrowser(FakeBrowser):
+        def __init__(self):
+            super().__init__()
+            self.closed = []
+
+        async def close_context_and_page(self):
+            self.closed.append("context")
+
+        async def close_browser(self):
+            self.closed.append("browser")
+
+    async def scenario():
+        browser = ClosingBrowser()
+        pool = make_pool(browser)
+        pool.uses = 3
+        await pool.close()
+        return browser.closed, pool.browser, pool.uses
+
+    assert asyncio.run(scenario()) == (["context", "browser"], None, 0)
@@ -0,0 +1,86 @@
+# tests/test_cache.py
+
+# Стандартные модули Python
+import asyncio
+import threading
+
+# Сторонние модули
+from sqlalchemy.util import await_only, greenlet_spawn
+
+# Собственные модули
+from routes.directory.tinkoff.cache import TTLCache, ttl_cache
+from routes.directory.tinkoff.utils import async_counterpart
+
+
+class GreenletSession:
+    """Повторяет AsyncSession.run_sync: функция выполняется в гринлете в потоке цикла событий."""
+    async def run_sync(self, func, *args, **kwargs):
+        return await greenlet_spawn(func, self, *args, **kwargs)
+
+
+def run_in_thread(coroutine_factory, timeout: float = 5):
+    """Запускает цикл событий в отдельном потоке, чтобы зависание не повесило сами тесты."""
+    result = {}
+
+    def target():
+        result["value"] = asyncio.run(coroutine_factory())
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "Цикл событий завис"
+    return result["value"]
+
+
+def test_concurrent_misses_through_run_sync_do_not_deadlock():
+    loads = []
+
+    @ttl_cache(60)
+    def lookup(db):
+        loads.append(1)
+        await_only(asyncio.sleep(0.05))  # Запрос к БД отдаёт управление циклу событий
+        return ["value"]
+
+    lookup_async = async_counterpart(lookup)
+
+    async def main():
+        db = GreenletSession()
+        return await asyncio.gather(lookup_async(db), lookup_async(db))
+
+    assert run_in_thread(main) == [["value"], ["value"]]
+    assert len(loads) == 2
+
+    # Значение сохранилось, следующий вызов - попадание
+    assert run_in_thread(lambda: lookup_async(GreenletSession())) == ["value"]
+    assert len(loads) == 2
+    assert lookup.cache.hits == 1
+
+
+def test_invalidate_inside_run_sync_while_loading():
+    @ttl_cache(60)
+    def lookup(db):
+        await_only(asyncio.sleep(0.05))
+        return ["old"]
+
+    def invalidate(db):
+        lookup.invalidate()
+
+    lookup_async = async_counterpart(lookup)
+    invalidate_async = async_counterpart(invalidate)
+
+    async def main():
+        db = GreenletSession()
+        await asyncio.gather(lookup_async(db), invalidate_async(db))
+
+    run_in_thread(main)
+
+    # Значение, загруженное до сброса, не кэшируется
+    assert lookup.cache.get(lambda: ["new"]) == ["new"]
+
+
+def test_cache_returns_copies_and_expires():
+    cache = TTLCache("test", ttl=0)
+    value = cache.get(lambda: [1])
+    value.append(2)
+    assert cache.get(lambda: [3]) == [3]
+    assert cache.misses == 2
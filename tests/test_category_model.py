@@ -0,0 +1,85 @@
+# tests/test_category_model.py
+
+# Стандартные модули Python
+import json
+
+# Сторонние модули
+import pytest
+
+# Собственные модули
+from utils.tinkoff.category_model import CategoryModel, get_category_model
+
+
+GROCERIES, TAXI, PHARMACY = 1, 2, 3
+
+MERCHANTS = {
+    GROCERIES: ["Пятерочка", "Перекресток", "Магнит", "ВкусВилл", "Лента"],
+    TAXI: ["Яндекс Такси", "Ситимобил", "Uber", "Wheely"],
+    PHARMACY: ["Аптека Ригла", "Аптека 36.6", "Горздрав", "Столички"],
+}
+CARDS = {GROCERIES: "*1234", TAXI: "*5678", PHARMACY: "*9012"}
+
+
+def make_rows(merchants=MERCHANTS):
+    rows = []
+    for category_id, names in merchants.items():
+        for name in names:
+            for number in range(1, 6):
+                rows.append((f"{name} {number * 137}", CARDS[category_id], category_id))
+                rows.append((f"{name.upper()} MOSCOW RUS", CARDS[category_id], category_id))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def model():
+    return CategoryModel.train(make_rows())
+
+
+def test_known_merchant(model):
+    category_id, confidence = model.predict("ПЕРЕКРЕСТОК 9999", "*0000")
+    assert category_id == GROCERIES
+    assert confidence >= 0.6
+
+
+@pytest.mark.parametrize("description", ["Барбершоп Чук и Гек", "QWFP ZXCV", "Школа танцев", ""])
+def test_out_of_vocabulary_description_is_not_categorized(model, description):
+    # Карта встречалась только в одной категории, но одна карта категорию не даёт
+    assert model.predict(description, CARDS[TAXI]) == (None, 0.0)
+
+
+def test_unseen_merchants_are_rarely_confident():
+    held_out = {GROCERIES: ["Лента"], TAXI: ["Wheely"], PHARMACY: ["Столички"]}
+    train_merchants = {
+        category_id: [name for name in names if name not in held_out[category_id]]
+        for category_id, names in MERCHANTS.items()
+    }
+    model = CategoryModel.train(make_rows(train_merchants))
+
+    predictions = [model.predict(description, card_number) for description, card_number, _ in make_rows(held_out)]
+    confident = [confidence for _, confidence in predictions if confidence >= 0.6]
+    assert len(confident) <= len(predictions) * 0.1
+
+
+def test_card_breaks_ties_between_similar_descriptions():
+    model = CategoryModel.train([
+        ("Перевод Иванову", "*1234", GROCERIES),
+        ("Перевод Иванову", "*5678", TAXI),
+    ])
+    assert model.predict("Перевод Иванову", "*1234")[0] == GROCERIES
+    assert model.predict("Перевод Иванову", "*5678")[0] == TAXI
+
+
+def test_save_and_load(model, tmp_path):
+    path = str(tmp_path / "model.json")
+    model.save(path)
+
+    loaded = get_category_model(path)
+    assert loaded.predict("Яндекс Такси 1", "*5678") == model.predict("Яндекс Такси 1", "*5678")
+    assert get_category_model(path) is loaded  # Файл не менялся - модель не перечитывается
+
+
+def test_old_model_version_is_rejected(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({"version": 1, "idf": {}, "centroids": {}}), encoding="utf-8")
+    assert get_category_model(str(path)) is None
+    assert get_category_model(str(tmp_path / "missing.json")) is None
@@ -0,0 +1,59 @@
+# tests/test_expense_classifier.py
+
+# Стандартные модули Python
+import random
+import re
+
+# Собственные модули
+from utils.tinkoff.expense_classifier import ExpenseCategorizer, KeywordClassifier, build_trie_pattern
+
+
+def test_trie_pattern_matches_like_longest_first_alternation():
+    rng = random.Random(1)
+    words = sorted({"".join(rng.choice("абвгд") for _ in range(rng.randint(1, 5))) for _ in range(200)})
+    trie = re.compile(build_trie_pattern(words))
+    alternation = re.compile("|".join(re.escape(word) for word in sorted(words, key=len, reverse=True)))
+
+    for _ in range(2000):
+        text = "".join(rng.choice("абвгдеж ") for _ in range(rng.randint(0, 20)))
+        trie_match, alternation_match = trie.search(text), alternation.search(text)
+        assert (trie_match and trie_match.span()) == (alternation_match and alternation_match.span()), text
+
+
+def test_special_characters_are_escaped():
+    assert re.fullmatch(build_trie_pattern(["a.b", "a+", "(x)"]), "a.b")
+    assert not re.fullmatch(build_trie_pattern(["a.b"]), "axb")
+
+
+def test_keyword_classifier():
+    classifier = KeywordClassifier([
+        ("Аптека", 1, "Здоровье"),
+        ("аптека ригла", 2, "Лекарства"),
+        ("  ", 3, "Пусто"),
+        ("аптека", 4, "Повтор"),
+    ])
+    assert classifier.classify("АПТЕКА РИГЛА 123") == (2, "Лекарства")  # Самое длинное слово
+    assert classifier.classify("Аптека 36.6") == (1, "Здоровье")  # Для повторяющегося слова побеждает первое
+    assert classifier.classify("Пятерочка") is None
+    assert classifier.classify("") is None
+    assert KeywordClassifier([]).classify("Аптека") is None
+
+
+class FixedModel:
+    def __init__(self, category_id, confidence):
+        self.prediction = (category_id, confidence)
+
+    def predict(self, description, card_number):
+        return self.prediction
+
+
+def test_categorizer_prefers_keywords_and_respects_threshold():
+    keywords = KeywordClassifier([("такси", 1, "Транспорт")])
+    names = {1: "Транспорт", 2: "Еда"}
+
+    assert ExpenseCategorizer(keywords, FixedModel(2, 0.9), names).classify("Яндекс Такси", "*1") == (1, "Транспорт", "keyword")
+    assert ExpenseCategorizer(keywords, FixedModel(2, 0.9), names).classify("Кафе", "*1") == (2, "Еда", "model")
+    assert ExpenseCategorizer(keywords, FixedModel(2, 0.5), names).classify("Кафе", "*1") is None
+    # Категория удалена после обучения модели
+    assert ExpenseCategorizer(keywords, FixedModel(7, 0.9), names).classify("Кафе", "*1") is None
+    assert ExpenseCategorizer(keywords).classify_all([("Такси", "*1"), ("Кафе", "*1")]) == [(1, "Транспорт"), None]
@@ -0,0 +1,104 @@
+# tests/test_expenses_paging.py
+
+# Стандартные модули Python
+import random
+
+# Сторонние модули
+import pytest
+from sqlalchemy import select
+
+# Собственные модули
+from models import Expense
+
+from routes.directory.tinkoff.expenses import get_expenses_from_db, parse_expenses_cursor, save_expenses_to_db
+
+
+# Период выгрузки (28-29.03.2026 по Москве)
+PERIOD = dict(unix_range_start=1774656000000, unix_range_end=1774828800000, timezone_str="Europe/Moscow")
+
+
+def make_expenses(count, seed=1):
+    """Расходы всего за несколько разных секунд: у большинства время совпадает с соседними."""
+    rng = random.Random(seed)
+    return [
+        {
+            "date_time": f"28.03.2026 20:0{rng.randint(0, 2)}:00",
+            "card_number": rng.choice(["*1234", "*5678"]),
+            "amount": 100 + index,  # Расходы различаются только суммой
+            "description": "Пятёрочка",
+        }
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def db(make_db):
+    db = make_db()
+    save_expenses_to_db(db, make_expenses(50), "Europe/Moscow")
+    db.commit()
+    return db
+
+
+def load_pages(db, limit, **arguments):
+    """Все страницы периода по next_cursor."""
+    pages = [get_expenses_from_db(db, **PERIOD, limit=limit, **arguments)]
+    while pages[-1]["next_cursor"]:
+        pages.append(get_expenses_from_db(db, **PERIOD, limit=limit, cursor=pages[-1]["next_cursor"], **arguments))
+    return pages
+
+
+@pytest.mark.parametrize("sort_order", ["desc", "asc"])
+@pytest.mark.parametrize("limit", [1, 7, 10, 49, 50, 51])
+def test_pages_match_unpaged_order(db, sort_order, limit):
+    expected = get_expenses_from_db(db, **PERIOD, sort_order=sort_order)["expenses"]
+    pages = load_pages(db, limit, sort_order=sort_order)
+
+    # При равном времени порядок задаёт id: между страницами расходы не теряются и не повторяются
+    expenses = [expense for page in pages for expense in page["expenses"]]
+    assert expenses == expected
+    timestamps = dict(db.execute(select(Expense.id, Expense.timestamp)).all())
+    keys = [(timestamps[expense["id"]], expense["id"]) for expense in expenses]
+    assert keys == sorted(keys, reverse=sort_order == "desc")
+    assert len(set(timestamps.values())) < len(keys) / 10
+    assert [len(page["expenses"]) for page in pages[:-1]] == [limit] * (len(pages) - 1)
+    assert 0 < len(pages[-1]["expenses"]) <= limit
+
+
+def test_last_page_has_no_cursor(db):
+    # 50 расходов ровно на 5 страниц: пятая заполнена целиком, но следующей нет
+    pages = load_pages(db, 10)
+    assert len(pages) == 5
+    assert [page["next_cursor"] is None for page in pages] == [False] * 4 + [True]
+
+    # Период без расходов - одна пустая страница
+    page = get_expenses_from_db(db, unix_range_start=1, unix_range_end=2, limit=10)
+    assert (page["expenses"], page["next_cursor"]) == ([], None)
+    assert page["summary"]["count"] == 0
+
+
+def test_first_page_carries_period_summary(db):
+    unpaged = get_expenses_from_db(db, **PERIOD)
+    first_page, *next_pages = load_pages(db, 10)
+
+    assert unpaged["next_cursor"] is None
+    assert first_page["summary"] == unpaged["summary"]
+    assert first_page["summary"]["count"] == 50
+    assert sorted(first_page["cards"]) == sorted(unpaged["cards"])
+    assert first_page["message"] == unpaged["message"]
+    # Следующие страницы итогов не содержат
+    assert all(set(page) == {"expenses", "next_cursor"} for page in next_pages)
+
+
+@pytest.mark.parametrize("cursor", ["abc", "1774717200000", "1774717200000_", "x_1", "1_2_3"])
+def test_bad_cursor_is_rejected(db, cursor):
+    # Эндпоинт отвечает на ValueError кодом 422
+    with pytest.raises(ValueError):
+        parse_expenses_cursor(cursor)
+    with pytest.raises(ValueError):
+        get_expenses_from_db(db, **PERIOD, limit=10, cursor=cursor)
+
+
+def test_cursor_format():
+    assert parse_expenses_cursor(None) is None
+    assert parse_expenses_cursor("") is None
+    assert parse_expenses_cursor("1774717200000_42") == (1774717200000, 42)
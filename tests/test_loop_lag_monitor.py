@@ -0,0 +1,123 @@
+# tests/test_loop_lag_monitor.py
+
+# Стандартные модули Python
+import ast
+import asyncio
+import os
+import time
+
+# Собственные модули
+from utils.loop_lag_monitor import LoopLagMonitor
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(wait):
+    """Максимальная задержка и число зависаний цикла событий, пока выполняется wait()."""
+    async def main():
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.1)
+        async with monitor.measure("wait") as section:
+            await asyncio.sleep(0.05)  # Первый замер до ожидания
+            await wait()
+            await asyncio.sleep(0.05)
+        await monitor.stop()
+        return section, monitor
+
+    return asyncio.run(main())
+
+
+def test_blocking_sleep_is_detected():
+    # Прежнее ожидание после перенаправления
+    async def blocking_wait():
+        time.sleep(0.3)
+
+    section, monitor = measure(blocking_wait)
+    assert section["max_lag"] >= 0.25
+    assert section["stalls"] == monitor.stalls == 1
+    assert monitor._task is None
+
+
+def test_async_wait_does_not_block_loop():
+    async def async_wait():
+        await asyncio.sleep(0.3)
+
+    section, monitor = measure(async_wait)
+    assert section["max_lag"] < 0.1
+    assert section["stalls"] == 0
+
+
+def test_sections_only_count_their_own_stalls():
+    monitor = LoopLagMonitor(threshold=0.25)
+    monitor.record(0.5)
+
+    async def main():
+        async with monitor.measure("outer") as outer:
+            monitor.record(0.1)
+            async with monitor.measure("inner") as inner:
+                monitor.record(0.3)
+            monitor.record(0.4)
+        await monitor.stop()
+        return outer, inner
+
+    outer, inner = asyncio.run(main())
+    assert (outer["max_lag"], outer["stalls"]) == (0.4, 2)
+    assert (inner["max_lag"], inner["stalls"]) == (0.3, 1)
+    assert (monitor.max_lag, monitor.stalls) == (0.5, 3)
+    assert monitor._sections == []
+
+
+def iter_blocking_sleeps(tree):
+    """Вызовы time.sleep в теле корутин (без вложенных синхронных функций)."""
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.AsyncFunctionDef):
+            continue
+        nodes = list(node.body)
+        while nodes:
+            child = nodes.pop()
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+                continue
+            if (
+                isinstance(child, ast.Call)
+                and isinstance(child.func, ast.Attribute)
+                and child.func.attr == "sleep"
+                and isinstance(child.func.value, ast.Name)
+                and child.func.value.id == "time"
+            ):
+                yield node.name, child.lineno
+            nodes.extend(ast.iter_child_nodes(child))
+
+
+def test_no_blocking_sleep_in_coroutines():
+    found = []
+    for directory in ("routes", "utils"):
+        for dirpath, _, filenames in os.walk(os.path.join(ROOT, directory)):
+            for filename in filenames:
+                if not filename.endswith(".py"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path, encoding="utf-8-sig") as file:
+                    tree = ast.parse(file.read())
+                found += [(os.path.relpath(path, ROOT), name, line) for name, line in iter_blocking_sleeps(tree)]
+
+    assert found == []
+
+
+def test_restarts_in_a_new_loop():
+    monitor = LoopLagMonitor(interval=0.01)
+
+    async def start():
+        monitor.start()
+        await asyncio.sleep(0.02)
+        return monitor._task
+
+    # Задача первого цикла не завершена (цикл просто остановлен), но во втором цикле нужна своя
+    first_loop = asyncio.new_event_loop()
+    first_task = first_loop.run_until_complete(start())
+    second_task = asyncio.run(start())
+    first_task.cancel()
+    first_loop.run_until_complete(asyncio.sleep(0))
+    first_loop.close()
+
+    assert second_task is not first_task
+    assert second_task.get_loop() is not first_loop
@@ -0,0 +1,101 @@
+# tests/test_page_type_detection.py
+
+# Стандартные модули Python
+import json
+import shutil
+import subprocess
+
+# Сторонние модули
+import pytest
+
+# Собственные модули
+from utils.tinkoff.browser_utils import PAGE_TYPE_DETECT_SCRIPT, PageType, get_marker_selector
+
+
+def get_node():
+    """Node.js из драйвера Playwright (или из PATH), на нём выполняется скрипт определения страницы."""
+    try:
+        from playwright._impl._driver import compute_driver_executable
+        node = compute_driver_executable()[0]
+    except Exception:
+        node = shutil.which("node")
+    return node if node and shutil.which(node) else None
+
+
+# Документ для скрипта: заголовок, текст и разметка. querySelector понимает только селекторы
+# вида [атрибут*="значение"] из get_marker_selector, обращение к outerHTML - ошибка
+RUNNER = """
+const detect = %s;
+const [markers, pages] = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const attributes = html => [...html.matchAll(/([\\w-]+)="([^"]*)"/g)];
+const matches = (html, selector) => selector.split(/,\\s*/).some(part => {
+    const [, name, value] = part.match(/^\\[([\\w-]+)\\*=("(?:[^"\\\\]|\\\\.)*")\\]$/);
+    return attributes(html).some(([, attribute, text]) => attribute === name && text.includes(JSON.parse(value)));
+});
+console.log(JSON.stringify(pages.map(([title, text, html]) => {
+    const documentElement = {textContent: text, get outerHTML() { throw new Error('outerHTML'); }};
+    globalThis.document = {
+        readyState: 'complete', body: {}, title, documentElement,
+        querySelector: selector => matches(html, selector) ? {} : null
+    };
+    return detect(markers);
+})));
+"""
+
+MARKERS = [page_type.value for page_type in PageType]
+
+
+def detect(pages):
+    node = get_node()
+    if node is None:
+        pytest.skip("Node.js недоступен")
+    result = subprocess.run(
+        [node, "-e", RUNNER % PAGE_TYPE_DETECT_SCRIPT],
+        input=json.dumps([[[marker, get_marker_selector(marker)] for marker in MARKERS], pages]),
+        capture_output=True, text=True, encoding="utf-8", timeout=30, check=True
+    )
+    return [PageType(marker) if marker else None for marker in json.loads(result.stdout)]
+
+
+def test_markers_do_not_shadow_each_other():
+    # Маркеры проверяются по порядку PageType: маркер, содержащий более ранний, никогда бы не сработал
+    for index, marker in enumerate(MARKERS):
+        assert not any(earlier in marker for earlier in MARKERS[:index]), marker
+
+
+@pytest.mark.parametrize("page_type", list(PageType))
+def test_every_marker_is_detected_in_text_and_attributes(page_type):
+    marker = page_type.value
+    pages = [
+        ["", f"Т-Банк {marker} ещё текст", f"<html><body><h1>{marker}</h1></body></html>"],
+        [marker, "", "<html><head><title></title></head></html>"],
+        ["", "Войти", f'<html><body><input placeholder="{marker}"></body></html>'],
+        ["", "", f'<html><body><button aria-label="{marker}"></button></body></html>'],
+        ["", "", f'<html><body><input type="submit" value="{marker}"></body></html>'],
+        ["", "", f'<html><body><a title="{marker} (ссылка)" href="#"></a></body></html>'],
+    ]
+    assert detect(pages) == [page_type] * len(pages)
+
+
+def test_unknown_page_and_enum_order():
+    pages = [
+        ["", "Главная", "<html><body>Главная</body></html>"],
+        # Ранний в PageType маркер в атрибуте важнее позднего маркера в тексте
+        ["", PageType.EXPENSES.value, f'<html><body><input placeholder="{PageType.LOGIN_PASSWORD.value}"></body></html>'],
+    ]
+    assert detect(pages) == [None, PageType.LOGIN_PASSWORD]
+
+
+def test_marker_only_in_attribute():
+    # Страница ввода пароля: маркер только в placeholder поля, текст страницы его не содержит
+    pages = [
+        ["Т-Банк", "Войти Забыли? Далее", '<html><body><input name="password" placeholder="Пароль"></body></html>'],
+        ["Т-Банк", "Войти Далее", '<html><body><input name="password" data-hint="Пароль"></body></html>'],
+    ]
+    assert detect(pages) == [PageType.LOGIN_PASSWORD, None]
+
+
+def test_selector_escapes_quotes():
+    assert get_marker_selector('Код "1"') == (
+        '[placeholder*="Код \\"1\\""], [aria-label*="Код \\"1\\""], [value*="Код \\"1\\""], [title*="Код \\"1\\""]'
+    )
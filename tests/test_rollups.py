@@ -0,0 +1,150 @@
+# tests/test_rollups.py
+
+# Стандартные модули Python
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+# Сторонние модули
+import pytest
+from sqlalchemy import func, select, text
+
+# Собственные модули
+from models import CategoryExpenses, Expense, ExpenseDailyRollup
+
+from routes.directory.tinkoff.categories import update_expenses_categories
+from routes.directory.tinkoff.expenses import save_expenses_to_db
+from routes.directory.tinkoff.rollups import get_expense_summary, get_rollup_key
+from utils.tinkoff.expense_classifier import ExpenseCategorizer, KeywordClassifier
+
+
+GROCERIES, TAXI = 1, 2
+
+# Сводка по расходам одним GROUP BY (как в миграции из README): Москва с 2014 года - UTC+3 без переходов
+EXPENSES_GROUP_BY = text("""
+    SELECT date(timestamp / 1000 + 3 * 3600, 'unixepoch') AS day,
+           COALESCE(card_number, '') AS card_number,
+           COALESCE(category_id, 0) AS category_id,
+           ROUND(SUM(ABS(amount)), 2) AS total_amount,
+           COUNT(*) AS expense_count
+    FROM expenses
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+""")
+
+
+def make_expenses(count, seed=1):
+    """Расходы с 28.03 по 03.04.2026 (через границу месяца) по двум картам и переводы без карты."""
+    rng = random.Random(seed)
+    started = datetime(2026, 3, 28)
+    return [
+        {
+            "date_time": (started + timedelta(minutes=rng.randint(0, 7 * 24 * 60))).strftime("%d.%m.%Y %H:%M:%S"),
+            "card_number": rng.choice(["*1234", "*5678", ""]),
+            "amount": rng.choice([99.9, 150, 1234.56, 10.01]),
+            "description": rng.choice(["Пятёрочка", "Яндекс Такси", "Аптека", "Перевод Иван И."]),
+        }
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture
+def db(make_db):
+    db = make_db()
+    db.add_all([CategoryExpenses(id=GROCERIES, title="Продукты"), CategoryExpenses(id=TAXI, title="Такси")])
+    db.commit()
+
+    # Часть расходов получает категорию уже при загрузке
+    classifier = ExpenseCategorizer(KeywordClassifier([("пятёрочка", GROCERIES, "Продукты"), ("такси", TAXI, "Такси")]))
+    save_expenses_to_db(db, make_expenses(1500), "Europe/Moscow", batch_size=400, classifier=classifier)
+    db.commit()
+    return db
+
+
+def get_rollups(db):
+    rows = db.execute(
+        select(ExpenseDailyRollup.day, ExpenseDailyRollup.card_number, ExpenseDailyRollup.category_id,
+               ExpenseDailyRollup.total_amount, ExpenseDailyRollup.expense_count)
+        .order_by(ExpenseDailyRollup.day, ExpenseDailyRollup.card_number, ExpenseDailyRollup.category_id)
+    ).all()
+    return [(day.isoformat(), card_number, category_id, round(float(total), 2), count)
+            for day, card_number, category_id, total, count in rows]
+
+
+def group_expenses(db):
+    return [(day, card_number, category_id, round(total, 2), count)
+            for day, card_number, category_id, total, count in db.execute(EXPENSES_GROUP_BY)]
+
+
+def test_rollups_after_saving(db):
+    rollups = get_rollups(db)
+    assert rollups == group_expenses(db)
+    assert {category_id for _, _, category_id, _, _ in rollups} == {0, GROCERIES, TAXI}
+
+    # Повторная загрузка тех же расходов сводку не меняет
+    save_expenses_to_db(db, make_expenses(1500), "Europe/Moscow")
+    db.commit()
+    assert get_rollups(db) == rollups
+
+
+def test_rollups_after_recategorization(db):
+    rng = random.Random(2)
+    expense_ids = db.execute(select(Expense.id)).scalars().all()
+    assignments = [(expense_id, rng.choice([GROCERIES, TAXI, None])) for expense_id in rng.sample(expense_ids, 600)]
+
+    results = update_expenses_categories(db, assignments)
+    assert set(results.values()) == {"updated"}
+    assert get_rollups(db) == group_expenses(db)
+
+
+def test_emptied_rollup_rows_are_deleted(db):
+    day, card_number, category_id, total, count = next(row for row in get_rollups(db) if row[2] == TAXI)
+
+    # Все расходы строки переносятся в другую категорию: сумма уходит целиком, строка удаляется
+    expense_ids = [
+        expense.id for expense in db.execute(select(Expense).where(Expense.category_id == TAXI)).scalars()
+        if get_rollup_key(expense.timestamp, expense.card_number, expense.category_id) == (date.fromisoformat(day), card_number, TAXI)
+    ]
+    assert len(expense_ids) == count
+    update_expenses_categories(db, [(expense_id, GROCERIES) for expense_id in expense_ids])
+
+    rollups = get_rollups(db)
+    assert rollups == group_expenses(db)
+    assert not any(row[:3] == (day, card_number, TAXI) for row in rollups)
+    assert db.execute(select(func.count()).where(ExpenseDailyRollup.expense_count <= 0)).scalar() == 0
+
+    # Обратный перенос возвращает строку
+    update_expenses_categories(db, [(expense_id, TAXI) for expense_id in expense_ids])
+    assert (day, card_number, TAXI, total, count) in get_rollups(db)
+
+
+@pytest.mark.parametrize("period, anchor_date", [
+    ("month", date(2026, 3, 15)), ("month", date(2026, 4, 30)), ("quarter", date(2026, 2, 1)), ("year", date(2026, 7, 1))
+])
+def test_summary_matches_group_by(db, period, anchor_date):
+    update_expenses_categories(db, [(expense_id, GROCERIES) for expense_id in range(1, 200)])
+    summary = get_expense_summary(db, period, anchor_date)
+
+    expected_total, expected_count = 0.0, 0
+    by_card, by_category, series = defaultdict(float), defaultdict(float), defaultdict(float)
+    for day, card_number, category_id, total, count in group_expenses(db):
+        if not summary["start"] <= day <= summary["end"]:
+            continue
+        expected_total += total
+        expected_count += count
+        by_card[card_number] += total
+        by_category[category_id or None] += total
+        series[day if period == "month" else day[:7]] += total
+
+    assert expected_count > 0
+    assert summary["count"] == expected_count
+    assert summary["total"] == pytest.approx(expected_total)
+    assert summary["by_card"] == pytest.approx(dict(by_card))
+    assert {category["id"]: category["total"] for category in summary["by_category"]} == pytest.approx(dict(by_category))
+    assert {point["date"]: point["total"] for point in summary["series"]} == pytest.approx(dict(series))
+
+
+def test_summary_for_card(db):
+    summary = get_expense_summary(db, "year", date(2026, 1, 1), card_number="1234")
+    assert list(summary["by_card"]) == ["*1234"]
+    assert summary["count"] == db.execute(select(func.count()).where(Expense.card_number == "*1234")).scalar()
@@ -0,0 +1,166 @@
+# tests/test_save_expenses.py
+
+# Стандартные модули Python
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Сторонние модули
+from sqlalchemy import and_, event, select
+
+# Собственные модули
+from models import Expense, ExpenseDailyRollup
+
+from routes.directory.tinkoff.expenses import save_expenses_to_db
+from utils.tinkoff.time_utils import get_unix_time_ms_from_string
+
+
+def save_expenses_one_by_one(db, expenses, time_zone):
+    """Прежняя реализация save_expenses_to_db (запрос и вставка на каждый расход) - эталон для сравнения."""
+    saved_expenses = []
+    for expense in expenses:
+        timestamp = get_unix_time_ms_from_string(expense["date_time"], time_zone)
+        existing_expense = db.execute(select(Expense).where(and_(
+            Expense.timestamp == timestamp,
+            Expense.card_number == expense["card_number"],
+            Expense.amount == expense["amount"],
+            Expense.description == expense["description"],
+        ))).scalars().first()
+
+        if existing_expense is None:
+            existing_expense = Expense(
+                timestamp=timestamp,
+                card_number=expense["card_number"],
+                amount=expense["amount"],
+                description=expense["description"],
+            )
+            db.add(existing_expense)
+            db.flush()
+
+        saved_expenses.append({
+            "id": existing_expense.id,
+            "date_time": expense["date_time"],
+            "card_number": expense["card_number"],
+            "transaction_type": "расход",
+            "amount": expense["amount"],
+            "description": expense["description"],
+            "category": expense.get("category", "Не указана"),
+        })
+    db.commit()
+    return saved_expenses
+
+
+def make_expenses(count, seed=1):
+    """Выгрузка с повторами внутри файла (одинаковые строки) и разными суммами и описаниями."""
+    rng = random.Random(seed)
+    started = datetime(2026, 3, 28, 20, 0)  # Через полночь по Москве
+    expenses = []
+    for index in range(count):
+        if expenses and rng.random() < 0.1:
+            expenses.append(dict(rng.choice(expenses)))
+            continue
+        expenses.append({
+            "date_time": (started + timedelta(minutes=rng.randint(0, 600))).strftime("%d.%m.%Y %H:%M:%S"),
+            "card_number": rng.choice(["*1234", "*5678"]),
+            "amount": rng.choice([99.9, 150, 1234.56, 10.01]),
+            "description": rng.choice(["Пятёрочка", "Яндекс Такси", "Аптека", "Кафе \"Ёлка\""]),
+        })
+    return expenses
+
+
+def get_state(db):
+    expenses = db.execute(
+        select(Expense.id, Expense.timestamp, Expense.card_number, Expense.amount, Expense.description).order_by(Expense.id)
+    ).all()
+    rollups = db.execute(
+        select(ExpenseDailyRollup.day, ExpenseDailyRollup.card_number, ExpenseDailyRollup.total_amount,
+               ExpenseDailyRollup.expense_count)
+        .order_by(ExpenseDailyRollup.day, ExpenseDailyRollup.card_number)
+    ).all()
+    return [tuple(row) for row in expenses], [tuple(row) for row in rollups]
+
+
+def count_lookups(db):
+    """Считает запросы поиска уже сохранённых расходов."""
+    lookups = []
+
+    def record(connection, cursor, statement, *args):
+        if statement.lstrip().startswith("SELECT") and "FROM expenses" in statement:
+            lookups.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    return lookups
+
+
+def count_statements(db):
+    """Считает запросы к БД (обращения к курсору) по виду и таблице: ("INSERT", "expenses") и т.п."""
+    statements = Counter()
+
+    def record(connection, cursor, statement, *args):
+        words = statement.split()
+        statements[words[0], words[2] if words[0] == "INSERT" else ""] += 1
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    return statements
+
+
+def test_batches_match_one_by_one_saving(make_db):
+    first_import, second_import = make_expenses(700, seed=1), make_expenses(700, seed=2)
+    reference_db, db = make_db(), make_db()
+
+    for expenses in (first_import, second_import, first_import):  # Повторная загрузка того же файла
+        expected = save_expenses_one_by_one(reference_db, expenses, "Europe/Moscow")
+        # Пачки меньше файла: повторы попадают и в одну пачку, и в разные
+        assert save_expenses_to_db(db, iter(expenses), "Europe/Moscow", batch_size=128) == expected
+
+    expected_expenses, _ = get_state(reference_db)
+    saved_expenses, rollups = get_state(db)
+    assert saved_expenses == expected_expenses
+
+    # Дневные суммы сходятся с сохранёнными расходами
+    assert sum(count for *_, count in rollups) == len(saved_expenses)
+    assert sum(Decimal(str(total)) for _, _, total, _ in rollups) == sum(Decimal(str(amount)) for *_, amount, _ in saved_expenses)
+
+
+def test_one_lookup_per_batch(make_db):
+    expenses = make_expenses(1000)
+    reference_db, db = make_db(), make_db()
+
+    reference_lookups = count_lookups(reference_db)
+    save_expenses_one_by_one(reference_db, expenses, "Europe/Moscow")
+    lookups = count_lookups(db)
+    save_expenses_to_db(db, expenses, "Europe/Moscow", batch_size=250)
+
+    assert len(reference_lookups) == len(expenses)
+    assert len(lookups) == 4
+
+
+def test_import_round_trips(make_db, capsys):
+    # Выгрузка в 10 000 строк: поиск дублей и вставка - по одному запросу на пачку, а не на строку
+    expenses = make_expenses(10000)
+    reference_db, db = make_db(), make_db()
+
+    reference_statements = count_statements(reference_db)
+    started = time.perf_counter()
+    save_expenses_one_by_one(reference_db, expenses, "Europe/Moscow")
+    reference_time = time.perf_counter() - started
+
+    statements = count_statements(db)
+    started = time.perf_counter()
+    save_expenses_to_db(db, expenses, "Europe/Moscow", batch_size=1000)
+    batch_time = time.perf_counter() - started
+
+    with capsys.disabled():
+        print(f"\nЗагрузка {len(expenses)} строк:")
+        for name, elapsed, counts in (("по одной", reference_time, reference_statements), ("пачками", batch_time, statements)):
+            print(f"  {name:<9} {elapsed:.3f} с, запросов к БД: {sum(counts.values())} {dict(counts)}")
+
+    # get_state ниже тоже обращается к БД, поэтому проверяется снимок счётчиков
+    reference_statements, statements = dict(reference_statements), dict(statements)
+    new_expenses = len(get_state(db)[0])
+    assert reference_statements == {("SELECT", ""): len(expenses), ("INSERT", "expenses"): new_expenses}
+    # Пачка: поиск дублей, вставка расходов, удаление и вставка дневных сумм
+    assert statements == {("SELECT", ""): 10, ("INSERT", "expenses"): 10, ("INSERT", "expense_daily_rollups"): 10, ("DELETE", ""): 10}
+    assert batch_time < reference_time
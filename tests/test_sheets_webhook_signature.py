@@ -0,0 +1,71 @@
+# tests/test_sheets_webhook_signature.py
+
+# Стандартные модули Python
+import hashlib
+import hmac
+import time
+
+# Сторонние модули
+import pytest
+
+# Собственные модули
+import auth
+from auth import is_sheets_webhook_configured, verify_sheets_webhook_signature
+
+
+SECRET = "test-webhook-secret"
+BODY = b'{"changes": [{"expense_id": 1, "category": "\xd0\x95\xd0\xb4\xd0\xb0"}]}'
+
+
+def sign(body, timestamp, secret=SECRET):
+    """Подпись, как в sync_categories.js: HMAC-SHA256 от "<timestamp>.<тело запроса>"."""
+    return hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(auth, "GOOGLE_SHEETS_WEBHOOK_SECRET", SECRET)
+
+
+def test_valid_signature(secret):
+    timestamp = str(int(time.time()))
+    verify_sheets_webhook_signature(BODY, timestamp, sign(BODY, timestamp))
+    verify_sheets_webhook_signature(BODY, timestamp, sign(BODY, timestamp).upper())
+
+
+@pytest.mark.parametrize("signature", [None, "", "0" * 64])
+def test_bad_signature(secret, signature):
+    with pytest.raises(ValueError, match="Подпись"):
+        verify_sheets_webhook_signature(BODY, str(int(time.time())), signature)
+
+
+def test_signature_of_other_body_or_secret(secret):
+    timestamp = str(int(time.time()))
+    with pytest.raises(ValueError, match="Подпись"):
+        verify_sheets_webhook_signature(BODY, timestamp, sign(b"{}", timestamp))
+    with pytest.raises(ValueError, match="Подпись"):
+        verify_sheets_webhook_signature(BODY, timestamp, sign(BODY, timestamp, secret="other"))
+
+
+@pytest.mark.parametrize("age", [auth.GOOGLE_SHEETS_WEBHOOK_MAX_AGE + 60, -(auth.GOOGLE_SHEETS_WEBHOOK_MAX_AGE + 60)])
+def test_stale_timestamp(secret, age):
+    timestamp = str(int(time.time()) - age)
+    with pytest.raises(ValueError, match="устарел"):
+        verify_sheets_webhook_signature(BODY, timestamp, sign(BODY, timestamp))
+
+
+@pytest.mark.parametrize("timestamp", [None, "", "abc"])
+def test_bad_timestamp(secret, timestamp):
+    with pytest.raises(ValueError, match="метка времени"):
+        verify_sheets_webhook_signature(BODY, timestamp, sign(BODY, str(timestamp)))
+
+
+@pytest.mark.parametrize("placeholder", ["", "..."])
+def test_unconfigured_secret_rejects_any_signature(monkeypatch, placeholder):
+    monkeypatch.setattr(auth, "GOOGLE_SHEETS_WEBHOOK_SECRET", placeholder)
+    timestamp = str(int(time.time()))
+
+    assert not is_sheets_webhook_configured()
+    # Подпись известным секретом-заглушкой не принимается
+    with pytest.raises(ValueError, match="не настроен"):
+        verify_sheets_webhook_signature(BODY, timestamp, sign(BODY, timestamp, secret=placeholder))
@@ -0,0 +1,118 @@
+# tests/test_time_utils.py
+
+# Стандартные модули Python
+import random
+from datetime import datetime, timedelta
+
+# Сторонние модули
+import pytest
+import pytz
+
+# Собственные модули
+from utils.tinkoff.time_utils import (
+    DATE_TIME_FORMAT,
+    EPOCH,
+    format_unix_times,
+    get_fixed_utc_offset,
+    get_local_datetime_from_unix,
+    get_unix_time_ms_from_local_datetime,
+    get_unix_time_ms_from_string,
+    parse_date_time
+)
+
+
+# Пояса с постоянным смещением (в т.ч. с отменёнными переходами) и с действующими переходами
+TIMEZONES = [
+    "Europe/Moscow", "Europe/Samara", "Asia/Yekaterinburg", "Asia/Kolkata", "Asia/Kathmandu",
+    "UTC", "Etc/GMT-3", "Europe/Berlin", "America/New_York", "Australia/Lord_Howe"
+]
+
+
+def make_unix_times(count=3000, seed=1):
+    """Моменты с 2009 по 2027 год (переходы Москвы 2011 и 2014 годов, границы суток), с миллисекундами."""
+    rng = random.Random(seed)
+    start = (datetime(2009, 1, 1) - EPOCH) // timedelta(milliseconds=1)
+    end = (datetime(2027, 1, 1) - EPOCH) // timedelta(milliseconds=1)
+    return sorted(rng.randrange(start, end) for _ in range(count))
+
+
+def to_local_reference(unix_time_ms, timezone_str):
+    """Эталон: перевод через публичный API pytz (astimezone)."""
+    utc_dt = pytz.UTC.localize(EPOCH + timedelta(milliseconds=unix_time_ms))
+    return utc_dt.astimezone(pytz.timezone(timezone_str)).replace(tzinfo=None)
+
+
+@pytest.mark.parametrize("timezone_str", TIMEZONES)
+def test_unix_to_local_matches_astimezone(timezone_str):
+    unix_times = make_unix_times()
+    expected = [to_local_reference(unix_time_ms, timezone_str) for unix_time_ms in unix_times]
+
+    assert [get_local_datetime_from_unix(unix_time_ms, timezone_str) for unix_time_ms in unix_times] == expected
+    assert format_unix_times(unix_times, timezone_str) == [local_dt.strftime(DATE_TIME_FORMAT) for local_dt in expected]
+
+
+@pytest.mark.parametrize("timezone_str", TIMEZONES)
+def test_local_to_unix_matches_localize(timezone_str):
+    tz = pytz.timezone(timezone_str)
+    for unix_time_ms in make_unix_times(seed=2):
+        local_dt = to_local_reference(unix_time_ms, timezone_str)
+        expected = int(tz.localize(local_dt).timestamp() * 1000)
+        assert get_unix_time_ms_from_local_datetime(local_dt, timezone_str) == expected, local_dt
+
+
+@pytest.mark.parametrize("timezone_str", TIMEZONES)
+def test_fixed_offset_matches_astimezone(timezone_str):
+    fixed_offset = get_fixed_utc_offset(timezone_str)
+    if fixed_offset is None:
+        assert timezone_str in ("Europe/Berlin", "America/New_York", "Australia/Lord_Howe")
+        return
+
+    since, offset = fixed_offset
+    tz = pytz.timezone(timezone_str)
+    start = max(since, datetime(2000, 1, 1))
+    for days in range(0, 365 * 30, 17):
+        local_dt = start + timedelta(days=days, hours=days % 24)
+        assert tz.localize(local_dt).utcoffset() == offset, local_dt
+
+
+class ReorderedTransitionInfo(list):
+    """Поле _transition_info в другом формате: последний элемент читается не так, как ожидает быстрый путь."""
+
+    def __getitem__(self, index):
+        item = super().__getitem__(index)
+        return item[::-1] if index == -1 else item
+
+
+@pytest.mark.parametrize("broken", ["empty", "reordered"])
+def test_fixed_offset_falls_back_when_pytz_internals_differ(monkeypatch, broken):
+    # Быстрый путь опирается на внутренние поля pytz: пустые или расходящиеся с astimezone данные - медленный путь
+    tz = pytz.timezone("Europe/Moscow")
+    transition_info = [] if broken == "empty" else ReorderedTransitionInfo(tz._transition_info)
+    monkeypatch.setattr(tz, "_transition_info", transition_info)
+    get_fixed_utc_offset.cache_clear()
+    try:
+        assert get_fixed_utc_offset("Europe/Moscow") is None
+    finally:
+        get_fixed_utc_offset.cache_clear()
+
+
+def test_moscow_offset_history():
+    # 2010: зимой UTC+3, летом UTC+4; 2011-2014: UTC+4; с 26.10.2014: UTC+3
+    assert get_local_datetime_from_unix(1263000000000, "Europe/Moscow") == datetime(2010, 1, 9, 4, 20)
+    assert get_local_datetime_from_unix(1278000000000, "Europe/Moscow") == datetime(2010, 7, 1, 20, 0)
+    assert get_local_datetime_from_unix(1357000000000, "Europe/Moscow") == datetime(2013, 1, 1, 4, 26, 40)
+    assert get_local_datetime_from_unix(1700000000000, "Europe/Moscow") == datetime(2023, 11, 15, 1, 13, 20)
+    assert get_unix_time_ms_from_string("15.11.2023 01:13:20", "Europe/Moscow") == 1700000000000
+
+
+@pytest.mark.parametrize("date_str", [
+    "01.02.2026 03:04:05", "31.12.1999 23:59:59", "29.02.2024 00:00:00", "1.2.2026 3:04:05", "01.02.2026 3:4:5"
+])
+def test_parse_date_time_matches_strptime(date_str):
+    assert parse_date_time(date_str) == datetime.strptime(date_str, DATE_TIME_FORMAT)
+
+
+@pytest.mark.parametrize("date_str", ["31.02.2026 00:00:00", "01.02.2026", "2026-02-01 00:00:00"])
+def test_parse_date_time_rejects_invalid_dates(date_str):
+    with pytest.raises(ValueError):
+        parse_date_time(date_str)
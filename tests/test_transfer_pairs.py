@@ -0,0 +1,143 @@
+# tests/test_transfer_pairs.py
+
+# Стандартные модули Python
+import random
+from datetime import datetime, timezone
+
+# Сторонние модули
+import pytest
+
+# Собственные модули
+import utils.tinkoff.expenses_utils as expenses_utils
+from utils.tinkoff.expenses_utils import TRANSFERS_CATEGORY, find_transfer_pairs, format_expense, iter_expenses
+
+
+def iter_expenses_adjacent(transactions):
+    """Прежняя реализация iter_expenses (пара ищется только среди соседних операций) - эталон для сравнения."""
+    i = 0
+    while i < len(transactions) - 1:
+        current = transactions[i]
+        next_transaction = transactions[i + 1]
+
+        transaction_time = current["datetime"].replace(second=0)
+        next_transaction_time = next_transaction["datetime"].replace(second=0)
+
+        if (
+            expenses_utils.fuzz.token_sort_ratio(current["description"], next_transaction["description"]) > 70
+            and abs((next_transaction_time - transaction_time).total_seconds()) <= 60
+            and abs(current["amount"]) == abs(next_transaction["amount"])
+            and (current["amount"] * next_transaction["amount"] < 0)
+            and current["category"] != "Переводы"
+        ):
+            i += 2
+            continue
+
+        if current["amount"] < 0:
+            yield format_expense(current)
+        i += 1
+
+    if i == len(transactions) - 1:
+        last_transaction = transactions[i]
+        if last_transaction["amount"] < 0:
+            yield format_expense(last_transaction)
+
+
+def make_transaction(timestamp, amount, description, category="Другое"):
+    return {
+        "timestamp": timestamp,
+        "datetime": datetime.fromtimestamp(timestamp / 1000, timezone.utc).replace(tzinfo=None),
+        "card": "*1234",
+        "amount": amount,
+        "description": description,
+        "category": category,
+    }
+
+
+def make_statement(count, seed):
+    """
+    Выписка из покупок, возвратов и взаимных переводов, которые идут подряд (как их видела прежняя реализация).
+    Отсортирована от поздних операций к ранним, как после parse_transactions.
+    """
+    rng = random.Random(seed)
+    merchants = ["Пятерочка", "Яндекс Такси", "Аптека Ригла", "Кофе Хауз", "Ozon", "Перевод Иван И."]
+    categories = ["Супермаркеты", "Такси", "Аптеки", "Кафе", TRANSFERS_CATEGORY]
+    started = 1_767_225_600_000  # 01.01.2026 00:00 UTC
+
+    transactions = []
+    timestamp = started
+    while len(transactions) < count:
+        timestamp += rng.randint(1, 40) * 1000
+        amount = round(rng.uniform(10, 5000), 2)
+        if rng.random() < 0.15:
+            # Взаимный перевод: две операции подряд в пределах минуты
+            description = rng.choice(["Перевод между счетами", "Иван И.", "Пополнение Кубышки"])
+            category = rng.choice(categories)
+            transactions.append(make_transaction(timestamp, -amount, description, category))
+            timestamp += rng.randint(0, 50) * 1000
+            transactions.append(make_transaction(timestamp, amount, description, category))
+        else:
+            sign = 1 if rng.random() < 0.1 else -1
+            transactions.append(make_transaction(timestamp, sign * amount, rng.choice(merchants), rng.choice(categories)))
+
+    transactions.sort(key=lambda transaction: transaction["timestamp"], reverse=True)
+    return transactions
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_same_result_as_adjacent_scan(seed):
+    transactions = make_statement(2000, seed)
+    assert list(iter_expenses(transactions)) == list(iter_expenses_adjacent(transactions))
+
+
+def test_pair_split_by_unrelated_operation():
+    minute = 1_767_225_600_000
+    transactions = [
+        make_transaction(minute + 50_000, 100.0, "Иван И."),
+        make_transaction(minute + 40_000, -5.0, "Кофе Хауз"),
+        make_transaction(minute + 30_000, -100.0, "Иван И."),
+    ]
+    assert find_transfer_pairs(transactions) == {0, 2}
+    assert [expense["description"] for expense in iter_expenses(transactions)] == ["Кофе Хауз"]
+    # Прежняя реализация пропускала такую пару
+    assert len(list(iter_expenses_adjacent(transactions))) == 2
+
+
+def test_pair_rules():
+    minute = 1_767_225_600_000
+    # Операции в категории "Переводы", с одним знаком или дальше соседней минуты парой не считаются
+    assert find_transfer_pairs([
+        make_transaction(minute, 100.0, "Иван И.", TRANSFERS_CATEGORY),
+        make_transaction(minute, -100.0, "Иван И."),
+    ]) == set()
+    assert find_transfer_pairs([
+        make_transaction(minute, -100.0, "Иван И."),
+        make_transaction(minute, -100.0, "Иван И."),
+    ]) == set()
+    assert find_transfer_pairs([
+        make_transaction(minute + 120_000, 100.0, "Иван И."),
+        make_transaction(minute, -100.0, "Иван И."),
+    ]) == set()
+    # Соседняя минута - пара
+    assert find_transfer_pairs([
+        make_transaction(minute + 61_000, 100.0, "Иван И."),
+        make_transaction(minute + 59_000, -100.0, "Иван И."),
+    ]) == {0, 1}
+
+
+def test_fewer_description_comparisons(monkeypatch):
+    calls = {"count": 0}
+    token_sort_ratio = expenses_utils.fuzz.token_sort_ratio
+
+    def counting_ratio(*args):
+        calls["count"] += 1
+        return token_sort_ratio(*args)
+
+    monkeypatch.setattr(expenses_utils.fuzz, "token_sort_ratio", counting_ratio)
+    transactions = make_statement(2000, seed=1)
+
+    list(iter_expenses_adjacent(transactions))
+    adjacent_calls, calls["count"] = calls["count"], 0
+    list(iter_expenses(transactions))
+
+    # Нечёткое сравнение описаний - самая дорогая часть, теперь только для операций с той же суммой
+    assert calls["count"] * 4 < adjacent_calls
@@ -0,0 +1,138 @@
+# Обучение модели категорий на ручной разметке расходов и разметка расходов без категории
+#
+# python train_category_model.py                  - оценка на отложенной выборке, обучение и сохранение модели
+# python train_category_model.py --score-backlog  - то же + категории для уже сохранённых расходов без категории
+
+import argparse
+import random
+import time
+
+import config as config
+from database import Session
+
+from routes.directory.tinkoff.expenses import get_categorized_expenses, get_uncategorized_expenses
+from routes.directory.tinkoff.categories import get_categories_from_db, update_expenses_categories
+from utils.tinkoff.category_model import CategoryModel, normalize_description
+
+
+def evaluate(rows, test_share, threshold, seed=42):
+    """
+    Обучает модель на части размеченных расходов и проверяет на остальных:
+    точность по всем расходам, точность и покрытие с порогом уверенности, скорость оценки.
+    """
+    rows = list(rows)
+    random.Random(seed).shuffle(rows)
+    test_size = int(len(rows) * test_share)
+    if test_size == 0:
+        print("Слишком мало размеченных расходов для оценки модели.")
+        return
+
+    test_rows, train_rows = rows[:test_size], rows[test_size:]
+
+    started = time.perf_counter()
+    model = CategoryModel.train(train_rows)
+    train_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    predictions = [model.predict(description, card_number) for description, card_number, _ in test_rows]
+    predict_time = time.perf_counter() - started
+
+    correct = sum(1 for (category_id, _), row in zip(predictions, test_rows) if category_id == row[2])
+    confident = [(category_id, row[2]) for (category_id, confidence), row in zip(predictions, test_rows) if confidence >= threshold]
+    confident_correct = sum(1 for predicted, actual in confident if predicted == actual)
+
+    print(f"Обучение: {len(train_rows)} расходов за {train_time:.2f} с, проверка: {len(test_rows)} расходов")
+    print(f"Точность без порога: {correct / len(test_rows):.1%}")
+    print(
+        f"С порогом {threshold}: покрытие {len(confident) / len(test_rows):.1%}, "
+        f"точность {confident_correct / len(confident) if confident else 0:.1%}"
+    )
+    print(f"Скорость оценки: {len(test_rows) / predict_time if predict_time else float('inf'):.0f} строк/с")
+
+
+def evaluate_unseen(rows, test_share, threshold, seed=42):
+    """
+    Проверка на новых продавцах: часть описаний целиком убирается из обучения.
+    Для таких расходов модель должна чаще промолчать, чем уверенно ошибиться
+    (номер карты сам по себе категорию не даёт).
+    """
+    descriptions = sorted({normalize_description(description) for description, _, _ in rows})
+    random.Random(seed).shuffle(descriptions)
+    unseen = set(descriptions[:int(len(descriptions) * test_share)])
+    if not unseen:
+        print("Слишком мало разных описаний для проверки на новых продавцах.")
+        return
+
+    test_rows = [row for row in rows if normalize_description(row[0]) in unseen]
+    train_rows = [row for row in rows if normalize_description(row[0]) not in unseen]
+    if not train_rows:
+        return
+
+    model = CategoryModel.train(train_rows)
+    predictions = [model.predict(description, card_number) for description, card_number, _ in test_rows]
+    confident = [(category_id, row[2]) for (category_id, confidence), row in zip(predictions, test_rows) if confidence >= threshold]
+    confident_correct = sum(1 for predicted, actual in confident if predicted == actual)
+
+    print(
+        f"Новые описания ({len(unseen)} описаний, {len(test_rows)} расходов): с порогом {threshold} "
+        f"размечено {len(confident) / len(test_rows):.1%}, из них верно {confident_correct / len(confident) if confident else 0:.1%}"
+    )
+
+
+def score_backlog(db, model, threshold, batch_size):
+    """
+    Проставляет категории уже сохранённым расходам без категории, если модель уверена.
+    Расходы просматриваются пачками по возрастанию ID.
+    """
+    category_ids = {category["id"] for category in get_categories_from_db(db)}
+    last_id = 0
+    scored = updated = 0
+    started = time.perf_counter()
+
+    while batch := get_uncategorized_expenses(db, last_id, batch_size):
+        last_id = batch[-1].id
+        assignments = []
+        for expense in batch:
+            category_id, confidence = model.predict(expense.description, expense.card_number)
+            if confidence >= threshold and category_id in category_ids:
+                assignments.append((expense.id, category_id))
+
+        scored += len(batch)
+        if assignments:
+            results = update_expenses_categories(db, assignments)
+            updated += sum(1 for status in results.values() if status == "updated")
+
+    elapsed = time.perf_counter() - started
+    print(f"Расходов без категории: {scored}, категория проставлена: {updated} "
+          f"({scored / elapsed if elapsed else 0:.0f} строк/с)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение модели категорий расходов")
+    parser.add_argument("--output", default=config.CATEGORY_MODEL_PATH, help="Куда сохранить модель")
+    parser.add_argument("--threshold", type=float, default=config.CATEGORY_MODEL_THRESHOLD, help="Порог уверенности")
+    parser.add_argument("--test-share", type=float, default=0.2, help="Доля расходов для проверки точности")
+    parser.add_argument("--score-backlog", action="store_true", help="Проставить категории расходам без категории")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Размер пачки при разметке расходов")
+    args = parser.parse_args()
+
+    with Session() as db:
+        rows = [tuple(row) for row in get_categorized_expenses(db)]
+        if not rows:
+            print("Нет расходов с категориями, обучать модель не на чем.")
+            return
+
+        evaluate(rows, args.test_share, args.threshold)
+        evaluate_unseen(rows, args.test_share, args.threshold)
+
+        # Итоговая модель обучается на всех размеченных расходах
+        model = CategoryModel.train(rows)
+        model.save(args.output)
+        print(f"Модель сохранена в {args.output} ({len(model.centroids)} категорий, {model.samples} расходов)")
+
+        if args.score_backlog:
+            score_backlog(db, model, args.threshold, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# utils/google_clients.py
+
+# Стандартные модули Python
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Сторонние модули
+import gspread
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+from requests.adapters import HTTPAdapter
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KEYS_FILE = "./credentials.json"
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # За сколько до истечения обновлять токен
+TOKEN_REFRESH_RETRY_DELAY = 60  # Пауза (с) перед повтором неудачного обновления
+
+
+class GoogleClientRegistry:
+    def __init__(self, keys_file: str = KEYS_FILE, scopes=SCOPES, pool_size: int = 10):
+        """
+        Общие клиенты Google API для всего процесса: одни учётные данные, один gspread-клиент
+        с keep-alive сессией и кэш листов. Всё создаётся лениво при первом обращении,
+        токен обновляется в фоновом потоке до истечения срока.
+        """
+        self.keys_file = keys_file
+        self.scopes = scopes
+        self.pool_size = pool_size
+        self._credentials = None
+        self._gspread_client = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._thread_local = threading.local()  # Клиенты googleapiclient (httplib2) не потокобезопасны
+        self._lock = threading.RLock()
+        self._refresh_thread = None
+
+
+    def get_credentials(self) -> Credentials:
+        """Возвращает учётные данные сервисного аккаунта."""
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = Credentials.from_service_account_file(self.keys_file, scopes=self.scopes)
+                self._start_refresh_thread()  # Первый токен получит фоновый поток
+            return self._credentials
+
+
+    def refresh_token(self):
+        """Обновляет токен доступа."""
+        with self._lock:
+            self._credentials.refresh(Request())
+
+
+    def _start_refresh_thread(self):
+        if self._refresh_thread is None or not self._refresh_thread.is_alive():
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_loop,
+                name="GoogleTokenRefresher",
+                daemon=True
+            )
+            self._refresh_thread.start()
+
+
+    def _refresh_loop(self):
+        while True:
+            expiry = self._credentials.expiry
+            delay = (expiry - datetime.utcnow() - TOKEN_REFRESH_MARGIN).total_seconds() if expiry else 0
+            time.sleep(max(delay, 0))
+
+            try:
+                self.refresh_token()
+            except Exception as e:
+                logger.error(f"Ошибка обновления токена Google: {e}")
+                time.sleep(TOKEN_REFRESH_RETRY_DELAY)
+
+
+    def get_gspread_client(self) -> gspread.Client:
+        """Возвращает общий gspread-клиент с keep-alive сессией."""
+        with self._lock:
+            if self._gspread_client is None:
+                credentials = self.get_credentials()
+                session = AuthorizedSession(credentials)
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                self._gspread_client = gspread.Client(auth=credentials, session=session)
+            return self._gspread_client
+
+
+    def get_spreadsheet(self, url: str) -> gspread.Spreadsheet:
+        """Возвращает открытую таблицу по ссылке (открывается один раз)."""
+        with self._lock:
+            if url not in self._spreadsheets:
+                self._spreadsheets[url] = self.get_gspread_client().open_by_url(url)
+            return self._spreadsheets[url]
+
+
+    def get_worksheet(self, url: str, index: int = 0, title: str | None = None) -> gspread.Worksheet:
+        """Возвращает лист таблицы по названию или порядковому номеру (дескриптор кэшируется)."""
+        key = (url, title if title is not None else index)
+        with self._lock:
+            if key not in self._worksheets:
+                spreadsheet = self.get_spreadsheet(url)
+                self._worksheets[key] = spreadsheet.worksheet(title) if title is not None else spreadsheet.get_worksheet(index)
+            return self._worksheets[key]
+
+
+    def get_drive_service(self):
+        """Возвращает клиент Google Drive для текущего потока (создаётся один раз на поток)."""
+        service = getattr(self._thread_local, "drive_service", None)
+        if service is None:
+            service = build("drive", "v3", credentials=self.get_credentials(), cache_discovery=False)
+            self._thread_local.drive_service = service
+        return service
+
+
+google_clients = GoogleClientRegistry()
@@ -1,12 +1,7 @@
 # utils/google_drive.py
 
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
+from utils.google_clients import google_clients
 
-# Укажи путь к файлу с ключами
-KEYS_FILE = "./credentials.json"
-
-# Подключаемся к API Google Drive
+# Подключаемся к API Google Drive (клиент переиспользуется, а не собирается заново на каждый вызов)
 def get_drive_service():
-    creds = Credentials.from_service_account_file(KEYS_FILE, scopes=["https://www.googleapis.com/auth/drive"])
-    return build("drive", "v3", credentials=creds)
\ No newline at end of file
+    return google_clients.get_drive_service()
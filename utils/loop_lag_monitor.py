@@ -0,0 +1,82 @@
+# utils/loop_lag_monitor.py
+
+# Стандартные модули Python
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25):
+        """
+        Замеряет задержки цикла событий: раз в interval секунд проверяет, насколько позже
+        положенного проснулась задача. Задержки больше threshold секунд считаются зависаниями.
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._sections = []  # Замеры активных блоков measure()
+        self._task = None
+
+
+    def start(self):
+        """Запускает фоновую задачу замера в текущем цикле событий."""
+        # Задача из другого цикла (например, временного цикла планировщика) в этом цикле не работает
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.create_task(self._run())
+
+
+    async def stop(self):
+        """Останавливает фоновую задачу замера."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(loop.time() - started - self.interval)
+
+
+    def record(self, lag: float):
+        """Учитывает очередной замер задержки."""
+        self.max_lag = max(self.max_lag, lag)
+        for section in self._sections:
+            section["max_lag"] = max(section["max_lag"], lag)
+
+        if lag > self.threshold:
+            self.stalls += 1
+            for section in self._sections:
+                section["stalls"] += 1
+            logger.warning(f"Цикл событий был заблокирован на {lag:.3f} с")
+
+
+    @asynccontextmanager
+    async def measure(self, name: str):
+        """
+        Замеряет максимальную задержку цикла событий и число зависаний за время блока.
+        Возвращает словарь с результатами, который заполняется по ходу выполнения.
+        """
+        self.start()
+        section = {"name": name, "max_lag": 0.0, "stalls": 0}
+        self._sections.append(section)
+        try:
+            yield section
+        finally:
+            self._sections.remove(section)
+            logger.info(f"{name}: максимальная задержка цикла событий {section['max_lag']:.3f} с, зависаний: {section['stalls']}")
+
+
+loop_lag_monitor = LoopLagMonitor()
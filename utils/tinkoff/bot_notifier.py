@@ -0,0 +1,202 @@
+# utils/tinkoff/bot_notifier.py
+
+# Стандартные модули Python
+import asyncio
+import logging
+import time
+
+# Сторонние модули
+import aiohttp
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # Ответы бота, после которых есть смысл повторить
+
+
+class BotNotifier:
+    def __init__(self, expenses_url: str, errors_url: str, queue_size: int = 100, max_retries: int = 3,
+                 timeout: float = 10, connections: int = 10):
+        """
+        Асинхронная отправка уведомлений на сервер бота: одна сессия aiohttp с пулом соединений
+        и ограниченная очередь, которую разбирает фоновая задача. Накопившиеся в очереди
+        уведомления одного типа объединяются в один запрос, неудачные отправки повторяются.
+        """
+        self.expenses_url = expenses_url
+        self.errors_url = errors_url
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.connections = connections
+        self.metrics = {
+            "sent": 0,
+            "failed": 0,
+            "dropped": 0,
+            "retries": 0,
+            "batched": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+            "last_latency": 0.0,
+        }
+        self._loop = None
+        self._queue = None
+        self._session = None
+        self._worker = None
+
+
+    def _ensure_started(self):
+        """Создаёт очередь, сессию и задачу отправки в текущем цикле событий."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Объекты asyncio привязаны к циклу, в котором созданы
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._session = None
+            self._worker = None
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+
+    def notify_expenses(self, notification_data: dict, today_date: str):
+        """Ставит в очередь рассылку сумм расходов (словарь chat_id -> текст)."""
+        return self._enqueue("expenses", {"notification_data": notification_data, "today_date": today_date})
+
+
+    def notify_error(self, chat_ids: list):
+        """Ставит в очередь рассылку сообщения об ошибке автозагрузки."""
+        return self._enqueue("error", {"chat_ids": chat_ids})
+
+
+    def _enqueue(self, kind: str, payload: dict):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((kind, payload, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            self.metrics["dropped"] += 1
+            logger.warning(f"Очередь уведомлений переполнена, уведомление ({kind}) отброшено")
+            return False
+
+
+    async def join(self):
+        """Ожидает отправки всех уведомлений из очереди."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+
+    async def flush(self, timeout: float = None):
+        """
+        Досылает уведомления из очереди (не дольше timeout секунд) и закрывает сессию.
+        Вызывается перед остановкой цикла событий, иначе очередь пропадает вместе с ним.
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return  # Очередь принадлежит другому циклу (или ещё не создана)
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не все уведомления отправлены за {timeout} с, в очереди осталось {self._queue.qsize()}")
+        await self.close()
+
+
+    async def close(self):
+        """Останавливает фоновую задачу и закрывает сессию."""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._worker = None
+        self._session = None
+
+
+    async def _run(self):
+        while True:
+            items = [await self._queue.get()]
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            try:
+                for kind, payload, enqueued_at in self.merge_items(items):
+                    url = self.expenses_url if kind == "expenses" else self.errors_url
+                    await self.deliver(url, payload, enqueued_at)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке уведомлений: {e}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+
+    def merge_items(self, items):
+        """
+        Объединяет накопившиеся уведомления: суммы расходов - по дате (последнее значение для chat_id
+        побеждает), ошибки - в один список chat_id. Время постановки берётся от самого раннего.
+        """
+        merged = {}
+        for kind, payload, enqueued_at in items:
+            key = (kind, payload.get("today_date"))
+            if key not in merged:
+                merged[key] = (kind, {name: value.copy() if isinstance(value, (dict, list)) else value
+                                      for name, value in payload.items()}, enqueued_at)
+                continue
+
+            self.metrics["batched"] += 1
+            merged_payload = merged[key][1]
+            if kind == "expenses":
+                merged_payload["notification_data"].update(payload["notification_data"])
+            else:
+                merged_payload["chat_ids"] = list(dict.fromkeys(merged_payload["chat_ids"] + payload["chat_ids"]))
+
+        return list(merged.values())
+
+
+    async def deliver(self, url: str, payload: dict, enqueued_at: float):
+        """Отправляет запрос боту с повторами и экспоненциальной паузой."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._session.post(url, json=payload) as response:
+                    if response.status < 400:
+                        self.record_delivery(enqueued_at)
+                        return True
+                    if response.status not in RETRY_STATUSES:
+                        logger.error(f"Сервер бота отклонил уведомление: {response.status} {await response.text()}")
+                        break
+                    logger.warning(f"Сервер бота ответил {response.status}, повтор отправки")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Ошибка при отправке данных на сервер бота: {e}")
+
+            if attempt < self.max_retries:
+                self.metrics["retries"] += 1
+                await asyncio.sleep(2 ** attempt)
+
+        self.metrics["failed"] += 1
+        return False
+
+
+    def record_delivery(self, enqueued_at: float):
+        """Учитывает время от постановки уведомления в очередь до его доставки."""
+        latency = time.perf_counter() - enqueued_at
+        self.metrics["sent"] += 1
+        self.metrics["total_latency"] += latency
+        self.metrics["max_latency"] = max(self.metrics["max_latency"], latency)
+        self.metrics["last_latency"] = latency
+
+
+    def get_metrics(self):
+        """Возвращает метрики доставки уведомлений (время в секундах)."""
+        sent = self.metrics["sent"]
+        return {
+            **self.metrics,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "avg_latency": self.metrics["total_latency"] / sent if sent else 0.0,
+        }
@@ -1,7 +1,6 @@
 ﻿# utils/tinkoff/browser_input_utils.py
 
 # Стандартные модули Python
-import time
 import re
 
 # Сторонние модули
@@ -156,7 +155,6 @@ async def close_login_via_sms_page(browser: BrowserManager):
         initial_url = browser.page.url
         # Отмена входа по смс
         await click_button(browser.page, reset_button_selector)
-        time.sleep(1)
         return await detect_page_type_after_url_change(browser, initial_url)
     except Exception as e:
         raise Exception(f"Ошибка при закрытии входа через смс-код: {str(e)}")
@@ -185,7 +183,6 @@ async def skip_control_questions(browser: BrowserManager):
     try:
         initial_url = browser.page.url
         await click_button(page=browser.page, button_selector=cancel_button_selector)
-        time.sleep(1)
         return await detect_page_type_after_url_change(browser, initial_url)
     except Exception as e:
         raise Exception(f"Ошибка при закрытии входа через смс-код: {str(e)}")
@@ -2,6 +2,7 @@
 
 # Стандартные библиотеки Python
 import asyncio, shutil, os, json
+from urllib.parse import urlparse
 
 # Сторонние модули
 from playwright.async_api import async_playwright
@@ -10,12 +11,40 @@ from playwright.async_api import async_playwright
 from utils.google_drive_file_utils import download_file
 
 
+# Тайминги загрузки текущей страницы (мс от начала навигации) и объём переданных данных (байт)
+PAGE_LOAD_TIMING_SCRIPT = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return null;
+    const resources = performance.getEntriesByType('resource');
+    return {
+        dom_content_loaded: Math.round(nav.domContentLoadedEventEnd),
+        load: Math.round(nav.loadEventEnd),
+        transfer_size: resources.reduce((total, r) => total + (r.transferSize || 0), nav.transferSize || 0),
+        resources: resources.length
+    };
+}"""
+
+
 class BrowserManager:
-    def __init__(self, path_to_profile, download_dir, timeout):
-        """Инициализация BrowserManager с путем к профилю, папкой загрузок и таймаутом."""
+    def __init__(self, path_to_profile, download_dir, timeout,
+                 blocked_resource_types=(), blocked_domains=(), viewport=None, lock: asyncio.Lock | None = None):
+        """
+        Инициализация BrowserManager с путем к профилю, папкой загрузок и таймаутом.
+        blocked_resource_types и blocked_domains - типы ресурсов (image, font, media...) и домены
+        трекеров, запросы к которым отменяются; viewport - уменьшенный размер окна, например {"width": 1024, "height": 768}.
+        lock - блокировка аренды браузера (у BrowserPool), под ней контекст закрывается по простою.
+        """
         self.path_to_profile = path_to_profile
         self.download_dir = download_dir
         self.timeout = timeout
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_domains = tuple(blocked_domains)
+        self.viewport = viewport
+        self.blocked_requests = 0
+        self.in_use = False  # Браузер арендован, закрывать контекст по простою нельзя
+        self.lock = lock or asyncio.Lock()
+        self.idle_check_interval = 5  # Как часто проверять простой (с)
+        self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
@@ -25,8 +54,9 @@ class BrowserManager:
     async def initialize_browser(self):
         """Инициализирует браузер, если он еще не запущен."""
         if self.browser is None:
-            play = await async_playwright().start()
-            self.browser = await play.chromium.launch(
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(
                 headless=False,
                 args=["--start-maximized", '--disable-blink-features=AutomationControlled'],
                 downloads_path = self.download_dir
@@ -46,19 +76,62 @@ class BrowserManager:
                         json.dump({}, f)
             
             # Создаем контекст
+            context_options = {}
+            if self.viewport:
+                context_options["viewport"] = self.viewport
             self.context = await self.browser.new_context(
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.121 Safari/537.36",
                 storage_state=storage_state_file,
                 accept_downloads=True,  # Включаем возможность загрузки
-                permissions=["notifications"]
+                permissions=["notifications"],
+                **context_options
             )
 
+            # Отмена загрузки тяжёлых ресурсов и трекеров
+            if self.blocked_resource_types or self.blocked_domains:
+                await self.context.route("**/*", self.route_request)
+
             self.page = await self.context.new_page()
             print("Контекст и страница созданы")
 
         # Обновляем время последнего взаимодействия
         self.reset_interaction_time()
-        self.close_task = asyncio.create_task(self.close_after_timeout())
+        if not hasattr(self, 'close_task') or self.close_task.done():
+            self.close_task = asyncio.create_task(self.close_after_timeout())
+
+
+    def is_request_blocked(self, request):
+        """Проверяет, нужно ли отменить запрос (тяжёлый ресурс или трекер)."""
+        if request.resource_type in self.blocked_resource_types:
+            return True
+        hostname = urlparse(request.url).hostname or ""
+        return any(hostname == domain or hostname.endswith("." + domain) for domain in self.blocked_domains)
+
+
+    async def route_request(self, route):
+        """Обработчик всех запросов контекста."""
+        if self.is_request_blocked(route.request):
+            self.blocked_requests += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+
+    async def log_page_load_timing(self, label: str = ""):
+        """Выводит тайминги загрузки текущей страницы и число отменённых запросов."""
+        try:
+            timing = await self.page.evaluate(PAGE_LOAD_TIMING_SCRIPT)
+        except Exception as e:
+            print(f"Не удалось получить тайминги загрузки страницы: {e}")
+            return None
+
+        if timing:
+            print(
+                f"Загрузка страницы {label}: DOMContentLoaded {timing['dom_content_loaded']} мс, "
+                f"load {timing['load']} мс, ресурсов {timing['resources']}, "
+                f"передано {timing['transfer_size'] // 1024} КБ, отменено запросов: {self.blocked_requests}"
+            )
+        return timing
 
 
     async def close_context_and_page(self):
@@ -95,11 +168,25 @@ class BrowserManager:
         self.last_interaction_time = asyncio.get_event_loop().time()
 
 
+    def is_idle(self):
+        """Проверяет, что браузер не арендован и с последнего взаимодействия прошло больше timeout."""
+        return (
+            not self.in_use
+            and self.last_interaction_time is not None
+            and asyncio.get_event_loop().time() - self.last_interaction_time > self.timeout
+        )
+
+
     async def close_after_timeout(self):
         """Закрывает контекст и страницу, если время ожидания превышено."""
         while True:
-            await asyncio.sleep(5)
-            if self.last_interaction_time and asyncio.get_event_loop().time() - self.last_interaction_time > self.timeout:
+            await asyncio.sleep(self.idle_check_interval)
+            if not self.is_idle():
+                continue
+            async with self.lock:
+                # Пока ждали блокировку, браузер могли арендовать
+                if not self.is_idle():
+                    continue
                 await self.close_context_and_page()
                 break
 
@@ -159,3 +246,11 @@ class BrowserManager:
                 print(f"Ошибка при закрытии браузера: {e}")
             self.browser = None
             print("Браузер закрыт")
+
+        # Без остановки драйвер Playwright остаётся жить после каждого пересоздания браузера
+        if self.playwright:
+            try:
+                await self.playwright.stop()
+            except Exception as e:
+                print(f"Ошибка при остановке Playwright: {e}")
+            self.playwright = None
@@ -0,0 +1,160 @@
+# utils/tinkoff/browser_pool.py
+
+# Стандартные библиотеки Python
+import asyncio
+from contextlib import asynccontextmanager
+
+# Собственные модули
+from utils.tinkoff.browser_manager import BrowserManager
+
+
+class BrowserPool:
+    def __init__(self, path_to_profile, download_dir, timeout, max_uses: int = 50, max_js_heap_mb: int = 512,
+                 **browser_options):
+        """
+        Долгоживущий браузер с тёплым контекстом, который арендуют автозагрузка и вход через сайт.
+        Браузер пересоздаётся после max_uses аренд или при росте JS-кучи страницы выше max_js_heap_mb.
+        browser_options передаются в BrowserManager (блокировка ресурсов, размер окна).
+        """
+        self.path_to_profile = path_to_profile
+        self.download_dir = download_dir
+        self.timeout = timeout
+        self.browser_options = browser_options
+        self.max_uses = max_uses
+        self.max_js_heap_size = max_js_heap_mb * 1024 * 1024
+        self.browser: BrowserManager | None = None
+        self.uses = 0
+        self.loop = None
+        self.login_deadline = None  # До какого момента (время цикла событий) страница занята входом пользователя
+        self._lock = asyncio.Lock()
+
+
+    def bind_loop(self, loop):
+        """Запоминает цикл событий приложения (объекты Playwright работают только в своём цикле)."""
+        self.loop = loop
+
+
+    def is_loop_running(self):
+        """Проверяет, запущен ли цикл событий, к которому привязан пул."""
+        return self.loop is not None and self.loop.is_running()
+
+
+    async def get_browser(self) -> BrowserManager:
+        """Возвращает рабочий браузер с открытым контекстом, при необходимости запуская или пересоздавая его."""
+        if self.browser and await self.needs_recycle():
+            await self.recycle()
+
+        if not self.browser or not await self.browser.is_browser_active():
+            if self.browser:
+                await self.browser.close_browser()  # Останавливает Playwright упавшего браузера
+            self.browser = BrowserManager(self.path_to_profile, self.download_dir, self.timeout,
+                                          lock=self._lock, **self.browser_options)
+            self.uses = 0
+
+        if await self.browser.is_page_active():
+            self.browser.reset_interaction_time()
+        else:
+            # Страница упала или контекст закрыт по таймауту - поднимаем заново из storage_state
+            if self.browser.context:
+                await self.browser.close_context_and_page()
+            await self.browser.create_context_and_page()
+
+        return self.browser
+
+
+    @asynccontextmanager
+    async def lease(self, login: bool = False):
+        """
+        Арендует браузер на время операции (одновременно браузером пользуется один арендатор).
+        Пока пользователь проходит вход (login=True начинает вход), остальные арендаторы ждут его окончания
+        или простоя входа дольше timeout, чтобы не увести страницу с формы входа.
+        """
+        if not login:
+            await self.wait_for_login()
+        async with self._lock:
+            browser = await self.get_browser()
+            browser.in_use = True
+            try:
+                yield browser
+            finally:
+                browser.in_use = False
+                browser.reset_interaction_time()
+                self.uses += 1
+                if login:
+                    self.extend_login()
+
+
+    @asynccontextmanager
+    async def lease_page(self):
+        """
+        Арендует уже открытую страницу для следующего шага входа, ничего не запуская заново.
+        Отдаёт None, если страница закрыта (сессия истекла).
+        """
+        async with self._lock:
+            browser = self.browser
+            if not browser or not await browser.is_page_active():
+                yield None
+                return
+
+            browser.in_use = True
+            try:
+                yield browser
+            finally:
+                browser.in_use = False
+                browser.reset_interaction_time()
+                self.extend_login()
+
+
+    def extend_login(self):
+        """Отмечает шаг входа пользователя: страница остаётся за ним ещё timeout секунд."""
+        self.login_deadline = asyncio.get_running_loop().time() + self.timeout
+
+
+    def finish_login(self):
+        """Вход завершён или брошен - страница снова доступна остальным арендаторам."""
+        self.login_deadline = None
+
+
+    def is_login_in_progress(self):
+        return self.login_deadline is not None and asyncio.get_running_loop().time() < self.login_deadline
+
+
+    async def wait_for_login(self):
+        """Ждёт окончания входа пользователя (не дольше timeout после его последнего шага)."""
+        while self.is_login_in_progress():
+            await asyncio.sleep(1)
+
+
+    async def needs_recycle(self):
+        """Проверяет, пора ли пересоздать браузер."""
+        if self.uses >= self.max_uses:
+            return True
+        return await self.get_js_heap_size() > self.max_js_heap_size
+
+
+    async def get_js_heap_size(self):
+        """Возвращает размер JS-кучи текущей страницы в байтах (0, если узнать не удалось)."""
+        if not self.browser or not self.browser.page:
+            return 0
+        try:
+            return await self.browser.page.evaluate(
+                "() => performance.memory ? performance.memory.usedJSHeapSize : 0"
+            )
+        except Exception:
+            return 0
+
+
+    async def recycle(self):
+        """Закрывает текущий браузер, следующий вызов get_browser запустит новый."""
+        if self.browser:
+            print(f"Браузер пересоздаётся после {self.uses} использований")
+        await self.close()
+
+
+    async def close(self):
+        """Закрывает браузер пула, сохраняя состояние сессии, и останавливает Playwright."""
+        if self.browser:
+            await self.browser.close_context_and_page()  # Сохраняет состояние сессии
+            await self.browser.close_browser()
+        self.browser = None
+        self.uses = 0
@@ -3,14 +3,48 @@
 # Стандартные модули Python
 from enum import Enum
 import asyncio
+import time
 
 # Сторонние модули
-from playwright.async_api import Page, expect
+from playwright.async_api import Page, expect, TimeoutError as PlaywrightTimeoutError
 
 # Собственные модули
 from utils.tinkoff.browser_manager import BrowserManager
 
 
+# Атрибуты, в которых маркер типа страницы может быть вместо текста (поля ввода и кнопки)
+PAGE_TYPE_MARKER_ATTRIBUTES = ("placeholder", "aria-label", "value", "title")
+
+# Скрипт определения типа страницы: возвращает первый маркер, найденный в тексте документа
+# или в атрибутах элементов (точечным querySelector, без сериализации всей разметки)
+PAGE_TYPE_DETECT_SCRIPT = """(markers) => {
+    if (document.readyState === 'loading' || !document.body) return null;
+    const text = document.title + document.documentElement.textContent;
+    const found = markers.find(([marker, selector]) => text.includes(marker) || document.querySelector(selector));
+    return found ? found[0] : null;
+}"""
+
+
+def get_marker_selector(marker: str) -> str:
+    """
+    CSS-селектор элементов, у которых маркер содержится в одном из PAGE_TYPE_MARKER_ATTRIBUTES.
+    """
+    value = marker.replace("\\", "\\\\").replace('"', '\\"')
+    return ", ".join(f'[{attribute}*="{value}"]' for attribute in PAGE_TYPE_MARKER_ATTRIBUTES)
+
+
+# Метрики определения типа страницы
+page_detection_metrics = {
+    "detections": 0,
+    "failures": 0,
+    "attempts": 0,
+    "retries": 0,
+    "total_latency": 0.0,
+    "max_latency": 0.0,
+    "last_latency": 0.0,
+}
+
+
 # Типы страниц при входе на сайт
 class PageType(Enum):
     LOGIN_SMS_CODE = 'Мы отправим вам СМС-код'
@@ -52,22 +86,52 @@ async def detect_page_type(browser: BrowserManager, retries: int = 3):
     """
     Определяет тип страницы, основываясь на содержимом.
     """
+    started = time.perf_counter()
     attempt_current_page = 0
     last_except = ''
     while attempt_current_page < retries:
         try:
             page_type = await get_page_type(browser)
             if page_type:
+                record_page_detection(started, attempt_current_page + 1, True)
                 return page_type
         except Exception as e:
             last_except = e
         finally:
             attempt_current_page += 1
     
+    record_page_detection(started, attempt_current_page, False)
     print(f"Ошибка при определении типа страницы: {last_except}")
     return None
 
 
+def record_page_detection(started: float, attempts: int, success: bool):
+    """
+    Учитывает длительность и число попыток определения типа страницы.
+    """
+    latency = time.perf_counter() - started
+    page_detection_metrics["detections"] += 1
+    page_detection_metrics["attempts"] += attempts
+    page_detection_metrics["retries"] += max(attempts - 1, 0)
+    page_detection_metrics["total_latency"] += latency
+    page_detection_metrics["max_latency"] = max(page_detection_metrics["max_latency"], latency)
+    page_detection_metrics["last_latency"] = latency
+    if not success:
+        page_detection_metrics["failures"] += 1
+
+
+def get_page_detection_metrics():
+    """
+    Возвращает метрики определения типа страницы (время в секундах).
+    """
+    detections = page_detection_metrics["detections"]
+    return {
+        **page_detection_metrics,
+        "avg_latency": page_detection_metrics["total_latency"] / detections if detections else 0.0,
+        "avg_attempts": page_detection_metrics["attempts"] / detections if detections else 0.0,
+    }
+
+
 async def detect_page_type_after_url_change(browser: BrowserManager, initial_url: str, retries: int = 3):
     """
     Ожидает, пока текущий URL изменится с `initial_url`, затем определяет тип страницы по содержимому.
@@ -114,25 +178,36 @@ async def wait_for_url_change_from(page: Page, initial_url: str, timeout: int =
         return False
 
 
-async def get_page_type(browser: BrowserManager):
-    browser.reset_interaction_time()
-    page = browser.page
+async def wait_for_page_ready(page: Page, state: str = "load", timeout: int = 5):
+    """
+    Ожидает нужное состояние загрузки страницы (вместо фиксированной паузы).
+    Возвращает False, если состояние не наступило за timeout секунд.
+    """
+    try:
+        await page.wait_for_load_state(state, timeout=timeout * 1000)
+        return True
+    except Exception as e:
+        print(f"Страница не достигла состояния {state}: {e}")
+        return False
 
-    # Ожидаем окончания загрузки страницы
-    await browser.page.wait_for_function('document.readyState === "complete"', timeout=8000)
 
-    if await page.is_visible('body'):
-        try:
-            content = await page.content()  # Получаем HTML-код страницы
-        except Exception as e:
-            print(f"Не удалось получить контент страницы: {e}")
-            await asyncio.sleep(1)  # Задержка перед повторной попыткой
-            return None
+async def get_page_type(browser: BrowserManager, timeout: int = 2):
+    """
+    Ждёт в браузере появления на странице маркера одного из типов страниц
+    и возвращает первый найденный тип (в порядке PageType). Содержимое страницы не передаётся.
+    """
+    browser.reset_interaction_time()
 
-        # Проверяем содержимое на соответствие типам страниц
-        for page_type in PageType:
-            if page_type.value in content:
-                return page_type
+    markers = [[page_type.value, get_marker_selector(page_type.value)] for page_type in PageType]
+    try:
+        handle = await browser.page.wait_for_function(
+            PAGE_TYPE_DETECT_SCRIPT, arg=markers, polling=100, timeout=timeout * 1000
+        )
+    except PlaywrightTimeoutError:
+        return None
+
+    marker = await handle.json_value()
+    return PageType(marker) if marker else None
 
 
 async def get_element(page: Page, selector: str, timeout: int = 5):
@@ -0,0 +1,176 @@
+# utils/tinkoff/category_model.py
+
+# Стандартные модули Python
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+
+MODEL_VERSION = 2
+NGRAM_RANGE = (3, 5)  # Длины символьных n-грамм описания
+MIN_FEATURE_WEIGHT = 1e-3  # Меньшие веса центроидов не сохраняются
+MIN_SIMILARITY = 0.2  # Расходы, описание которых ещё менее похоже на ближайшую категорию, не размечаются
+CARD_FEATURE_PREFIX = "card:"
+CARD_FEATURE_WEIGHT = 0.1  # Номер карты лишь уточняет выбор между категориями с похожими описаниями
+
+
+def normalize_description(description: str) -> str:
+    """Описание в нижнем регистре, "ё" заменяется на "е", числа - на 0 (номера заказов и терминалов не мешают)."""
+    return re.sub(r'[0-9]+', '0', (description or '').lower().replace('ё', 'е'))
+
+
+def get_features(description: str, card_number: str) -> Counter:
+    """
+    Признаки расхода: символьные n-граммы нормализованного описания и номер карты.
+    """
+    text = f" {normalize_description(description)} "
+    features = Counter(
+        text[start:start + size]
+        for size in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1)
+        for start in range(len(text) - size + 1)
+    )
+    features[f"{CARD_FEATURE_PREFIX}{card_number or ''}"] += 1
+    return features
+
+
+def normalize(vector: dict) -> dict:
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {feature: weight / norm for feature, weight in vector.items()} if norm else vector
+
+
+class CategoryModel:
+    def __init__(self, idf: dict, centroids: dict, trained_at: str = None, samples: int = 0):
+        """
+        Модель категорий по истории ручной разметки: TF-IDF по символьным n-граммам
+        и центроид каждой категории. Категория расхода - ближайший по косинусу центроид.
+        Сходство и уверенность считаются только по описанию: расход, описание которого
+        похоже на категорию слабее MIN_SIMILARITY, не размечается, иначе уверенность -
+        доля категории в сумме сходства описания со всеми категориями (от 0 до 1).
+        Работает на чистом Python без GPU и сторонних библиотек.
+        """
+        self.idf = idf
+        self.centroids = centroids
+        self.trained_at = trained_at
+        self.samples = samples
+
+        # Обратный индекс {признак: [(ID категории, вес)]}: при оценке просматриваются только признаки расхода
+        self.index = defaultdict(list)
+        for category_id, centroid in centroids.items():
+            for feature, weight in centroid.items():
+                self.index[feature].append((category_id, weight))
+
+
+    @classmethod
+    def train(cls, rows):
+        """
+        Обучает модель на тройках (описание, номер карты, ID категории).
+        """
+        samples = [(get_features(description, card_number), category_id) for description, card_number, category_id in rows]
+
+        document_frequency = Counter()
+        for features, _ in samples:
+            document_frequency.update(features.keys())
+        total = len(samples)
+        idf = {
+            feature: math.log((1 + total) / (1 + frequency)) + 1
+            for feature, frequency in document_frequency.items()
+        }
+
+        sums = defaultdict(lambda: defaultdict(float))
+        for features, category_id in samples:
+            for feature, weight in cls.weigh(features, idf).items():
+                sums[category_id][feature] += weight
+
+        centroids = {}
+        for category_id, vector in sums.items():
+            centroid = normalize(vector)
+            centroids[category_id] = {
+                feature: weight for feature, weight in centroid.items() if weight >= MIN_FEATURE_WEIGHT
+            }
+
+        return cls(idf, centroids, datetime.now().isoformat(timespec="seconds"), total)
+
+
+    @staticmethod
+    def weigh(features: Counter, idf: dict) -> dict:
+        """
+        TF-IDF вектор расхода (логарифмическая частота, нормировка L2, номер карты с весом CARD_FEATURE_WEIGHT).
+        Неизвестные признаки отбрасываются.
+        """
+        return normalize({
+            feature: (1 + math.log(count)) * idf[feature] * (CARD_FEATURE_WEIGHT if feature.startswith(CARD_FEATURE_PREFIX) else 1)
+            for feature, count in features.items()
+            if feature in idf
+        })
+
+
+    def predict(self, description: str, card_number: str):
+        """Возвращает (ID категории, уверенность) или (None, 0.0), если расход не похож ни на одну категорию."""
+        similarity = defaultdict(float)  # Сходство по описанию
+        card_similarity = defaultdict(float)  # Добавка за номер карты
+        for feature, weight in self.weigh(get_features(description, card_number), self.idf).items():
+            scores = card_similarity if feature.startswith(CARD_FEATURE_PREFIX) else similarity
+            for category_id, centroid_weight in self.index.get(feature, ()):
+                scores[category_id] += weight * centroid_weight
+
+        # Одна карта без похожего описания категорию не даёт
+        category_id = max(similarity, key=lambda category_id: similarity[category_id] + card_similarity[category_id],
+                          default=None)
+        if category_id is None or similarity[category_id] < MIN_SIMILARITY:
+            return None, 0.0
+        return category_id, similarity[category_id] / sum(similarity.values())
+
+
+    def save(self, path: str):
+        """Сохраняет модель в JSON (запись через временный файл, чтобы работающий сервер не прочитал половину)."""
+        data = {
+            "version": MODEL_VERSION,
+            "trained_at": self.trained_at,
+            "samples": self.samples,
+            "idf": self.idf,
+            "centroids": {str(category_id): centroid for category_id, centroid in self.centroids.items()}
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"Неподдерживаемая версия модели категорий: {data.get('version')}")
+
+        centroids = {int(category_id): centroid for category_id, centroid in data["centroids"].items()}
+        return cls(data["idf"], centroids, data.get("trained_at"), data.get("samples", 0))
+
+
+_loaded_models = {}  # {путь: (время изменения файла, модель)}
+_load_lock = threading.Lock()
+
+
+def get_category_model(path: str):
+    """
+    Возвращает модель из файла или None, если модель ещё не обучена.
+    Файл перечитывается, только если его заменила новая тренировка.
+    """
+    try:
+        modified_at = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _load_lock:
+        loaded = _loaded_models.get(path)
+        if loaded is None or loaded[0] != modified_at:
+            try:
+                _loaded_models[path] = (modified_at, CategoryModel.load(path))
+            except (OSError, ValueError) as e:
+                print(f"Не удалось загрузить модель категорий {path}: {e}")
+                return loaded[1] if loaded else None
+        return _loaded_models[path][1]
@@ -0,0 +1,117 @@
+# utils/tinkoff/expense_classifier.py
+
+# Стандартные модули Python
+import logging
+import re
+import time
+from collections import Counter
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def build_trie_pattern(words):
+    """
+    Собирает регулярное выражение из слов с общими префиксами, вынесенными за скобки
+    (как в префиксном дереве). В отличие от простого перечисления через "|", на каждой позиции
+    описания проверяется один путь по дереву, а не все слова по очереди.
+    Из нескольких слов с одной позиции совпадает самое длинное.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # Конец слова
+
+    def to_pattern(node):
+        is_end = "" in node
+        branches = [re.escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if is_end:
+            # Жадный необязательный хвост: сначала пробуется более длинное слово
+            return f"(?:{pattern})?" if len(branches) == 1 else f"{pattern}?"
+        return pattern
+
+    return to_pattern(trie)
+
+
+class KeywordClassifier:
+    def __init__(self, keywords):
+        """
+        Определяет категорию расхода по ключевым словам в описании.
+        Все ключевые слова собираются в одно регулярное выражение по префиксному дереву,
+        поэтому описание просматривается один раз и скорость слабо зависит от числа слов.
+        :param keywords: Тройки (ключевое слово, ID категории, название категории)
+        """
+        self.categories = {}
+        for keyword, category_id, category_name in keywords:
+            keyword = (keyword or "").strip().lower()
+            if keyword and keyword not in self.categories:  # Для повторяющегося слова побеждает первое
+                self.categories[keyword] = (category_id, category_name)
+
+        self.pattern = re.compile(build_trie_pattern(self.categories), re.IGNORECASE) if self.categories else None
+
+
+    def classify(self, description: str):
+        """Возвращает (ID категории, название) по первому найденному в описании слову или None."""
+        if self.pattern is None or not description:
+            return None
+
+        match = self.pattern.search(description)
+        if match:
+            return self.categories.get(match.group(0).lower())
+        return None
+
+
+class ExpenseCategorizer:
+    def __init__(self, keyword_classifier: KeywordClassifier, model=None, category_names: dict = None,
+                 threshold: float = 0.6):
+        """
+        Категоризация новых расходов: сначала по ключевым словам, затем обученной моделью
+        (категория проставляется, только если уверенность модели не ниже threshold).
+        :param model: CategoryModel или None, если модель не обучена
+        :param category_names: {ID категории: название} существующих категорий
+        """
+        self.keyword_classifier = keyword_classifier
+        self.model = model
+        self.category_names = category_names or {}
+        self.threshold = threshold
+
+
+    def classify(self, description: str, card_number: str):
+        """Возвращает (ID категории, название, источник - "keyword" или "model") или None."""
+        match = self.keyword_classifier.classify(description)
+        if match:
+            return (*match, "keyword")
+
+        if self.model is not None:
+            category_id, confidence = self.model.predict(description, card_number)
+            # Категория могла быть удалена после обучения модели
+            if confidence >= self.threshold and category_id in self.category_names:
+                return category_id, self.category_names[category_id], "model"
+        return None
+
+
+    def classify_all(self, expenses):
+        """
+        Определяет категории списка пар (описание, номер карты) и пишет в лог скорость разбора.
+        Возвращает список (ID категории, название) или None для каждого расхода.
+        """
+        started = time.perf_counter()
+        matches = [self.classify(description, card_number) for description, card_number in expenses]
+        elapsed = time.perf_counter() - started
+
+        if matches:
+            sources = Counter(match[2] for match in matches if match)
+            rows_per_second = len(matches) / elapsed if elapsed else float("inf")
+            logger.info(
+                f"Автокатегоризация: {sources['keyword']} по ключевым словам, {sources['model']} моделью "
+                f"из {len(matches)} расходов, {rows_per_second:.0f} строк/с"
+            )
+
+        return [match[:2] if match else None for match in matches]
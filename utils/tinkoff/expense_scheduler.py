@@ -10,6 +10,10 @@ from apscheduler.triggers.cron import CronTrigger
 import pytz
 
 # Собственные модули
+import config
+
+from database import async_engine
+
 from utils.tinkoff.fixed_time_import_expenses import load_expenses
 
 
@@ -73,10 +77,26 @@ class ExpenseScheduler:
     
     # Обёртка для вызова асинхронной функции в синхронном контексте
     def async_to_sync(self, async_func, export_type):
+        # Общий браузер живёт в цикле событий приложения, поэтому задача выполняется в нём
+        if config.browser_pool.is_loop_running():
+            future = asyncio.run_coroutine_threadsafe(async_func(export_type), config.browser_pool.loop)
+            return future.result()
+
         try:
             loop = asyncio.get_running_loop()
         except RuntimeError:
             # Если нет текущего цикла событий, создаём новый
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-        return loop.run_until_complete(async_func(export_type))
\ No newline at end of file
+
+        # Блокировка и объекты Playwright общего пула привязались бы к этому временному циклу,
+        # поэтому задача получает свой пул, который закрывается вместе с циклом
+        browser_pool = config.create_browser_pool()
+        try:
+            return loop.run_until_complete(async_func(export_type, browser_pool))
+        finally:
+            loop.run_until_complete(browser_pool.close())
+            # Уведомления, поставленные в очередь в этом цикле, отправляются до его остановки
+            loop.run_until_complete(config.bot_notifier.flush(config.BOT_NOTIFIER_TIMEOUT))
+            # Соединения асинхронного пула привязаны к циклу, в котором созданы
+            loop.run_until_complete(async_engine.dispose())
\ No newline at end of file
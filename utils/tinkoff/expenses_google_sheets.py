@@ -2,6 +2,9 @@
 
 import locale
 import re
+import time
+import random
+import hashlib
 import logging
 
 from pytz import timezone
@@ -9,8 +12,16 @@ from datetime import datetime
 import gspread
 
 from routes.directory.tinkoff.expenses import get_expenses_from_db
+from routes.directory.tinkoff.google_sheets_sync import (
+    get_sync_state,
+    save_sync_state,
+    get_row_checksums,
+    save_row_checksums,
+    clear_row_checksums
+)
 from utils.tinkoff.time_utils import get_period_range
 from utils.tinkoff.sync_google_category import request_sync
+from utils.google_clients import google_clients
 
 from config import GOOGLE_SHEETS_URL
 
@@ -21,12 +32,12 @@ logger = logging.getLogger(__name__)
 moscow_tz = timezone('Europe/Moscow')
 locale.setlocale(locale.LC_TIME, "ru_RU.utf8")  # Устанавливаем русскую локаль
 
-try:
-    gc = gspread.service_account(filename="credentials.json")
-    sht2 = gc.open_by_url(GOOGLE_SHEETS_URL)
-    worksheet = sht2.get_worksheet(0)
-except Exception as e:
-    logger.error(f"Ошибка при инициализации gspread: {str(e)}")
+# Ограничения на размер запросов к Google Sheets
+SHEETS_MAX_ROWS_PER_RANGE = 500  # Строк в одном диапазоне
+SHEETS_MAX_CELLS_PER_REQUEST = 10000  # Ячеек в одном запросе batch_update
+
+# Формат строк с датами
+DATE_ROW_FORMAT = {"backgroundColor": {"red": 0.85, "green": 0.92, "blue": 0.83}}
 
 MONTHS_NOMINATIVE = {
     "января": "ЯНВАРЬ", "февраля": "ФЕВРАЛЬ", "марта": "МАРТ",
@@ -36,6 +47,11 @@ MONTHS_NOMINATIVE = {
 }
 
 
+def get_expenses_worksheet():
+    """Возвращает лист расходов (клиент и дескриптор листа общие на весь процесс)."""
+    return google_clients.get_worksheet(GOOGLE_SHEETS_URL, index=0)
+
+
 def sync_expenses_to_sheet_no_id(db, period="3month", timezone_str="Europe/Moscow"):
     """
     Синхронизация расходов из базы данных в Google Sheets. ВЕРСИЯ БЕЗ АЙДИШНИКОВ.
@@ -46,6 +62,7 @@ def sync_expenses_to_sheet_no_id(db, period="3month", timezone_str="Europe/Mosco
     - Вывод месяца при его смене
     - Вывод числа и месяца при смене дня
     - Закрашивание строк с датами
+    - Инкрементальную выгрузку по сохранённому курсору (читается только хвост таблицы)
     """
     request_sync()  # Экстренный запрос на изменение категорий
 
@@ -60,37 +77,102 @@ def sync_expenses_to_sheet_no_id(db, period="3month", timezone_str="Europe/Mosco
         sort_order='asc'
     )
 
-    # Получаем текущие данные
-    existing_rows = worksheet.get_all_values()
-
-    last_month = None
-    last_date = None
-    if (existing_rows and len(existing_rows) > 0 and len(existing_rows[0]) > 0):
-        # Вычисляем последний месяц и дату
-        last_month, last_date = get_last_month_and_date([row[0] for row in existing_rows]) 
-
-    # Формируем данные для добавления
-    expenses_to_add = get_expenses_to_add(preprocess_existing_expenses(existing_rows), expenses_data, last_date)
-
-    update_existing_categories(db, existing_rows, timezone_str)
+    # Состояние прошлой синхронизации (при первом запуске таблица читается целиком)
+    sync_state = get_sync_state(db) or bootstrap_sync_state(db)
+    if not update_existing_categories(db, expenses_data["expenses"]):
+        # Строки в таблице сдвинули вручную - номера строк и курсор пересоздаются по таблице
+        sync_state = bootstrap_sync_state(db)
+        update_existing_categories(db, expenses_data["expenses"])
+
+    last_expense_id = sync_state.last_expense_id
+    row_count = sync_state.row_count
+    last_month = sync_state.last_month
+    last_date = sync_state.last_date
+
+    worksheet = get_expenses_worksheet()
+
+    # Строки, дописанные в таблицу вручную после прошлой синхронизации.
+    # Курсор встаёт после последней непустой строки, пустые строки между ними тоже занимают место
+    tail_rows = worksheet.get(f"A{row_count + 1}:I")
+    filled_rows = [index for index, row in enumerate(tail_rows) if any(row)]
+    if filled_rows:
+        row_count += filled_rows[-1] + 1
+        tail_rows = [row for row in tail_rows if any(row)]
+        tail_month, tail_date = get_last_month_and_date([row[0] for row in tail_rows if row])
+        last_month = tail_month or last_month
+        last_date = tail_date or last_date
+
+    # Формируем данные для добавления (только расходы после курсора)
+    new_expenses = {"expenses": [expense for expense in expenses_data["expenses"] if expense["id"] > last_expense_id]}
+    expenses_to_add = get_expenses_to_add(preprocess_existing_expenses(tail_rows), new_expenses, last_date)
+    new_last_expense_id = max([last_expense_id] + [expense["id"] for expense in new_expenses["expenses"]])
 
     if not expenses_to_add:
+        save_sync_state(db, new_last_expense_id, row_count, last_month, last_date)
         logger.info("Нет новых расходов для добавления.")
         return
 
     # Группируем по дате
     expenses_to_add.sort(key=lambda x: datetime.strptime(x[0], "%d %B %Y"))
 
+    updates, expense_rows, date_rows, row_count, last_month, last_date = get_updates_to_table(
+        row_count, expenses_to_add, last_month, last_date
+    )
+
+    # Выполняем пакетное обновление сплошными блоками строк
+    for updates_chunk in split_updates(updates):
+        call_with_backoff(worksheet.batch_update, updates_chunk, value_input_option="USER_ENTERED")
 
-    updates = get_updates_to_table(existing_rows, expenses_to_add, last_month, last_date)
+    # Закрашиваем строки с датами одним запросом
+    if date_rows:
+        call_with_backoff(worksheet.batch_format, [
+            {"range": cells_range, "format": DATE_ROW_FORMAT}
+            for cells_range in coalesce_rows(date_rows, "A", "I")
+        ])
 
-    # Выполняем пакетное обновление
-    worksheet.batch_update(updates, value_input_option="USER_ENTERED")
-    
+    # Запоминаем выгруженные строки и сдвигаем курсор
+    save_row_checksums(db, {
+        expense[8]: (expense_rows[expense[8]], get_category_checksum(expense[5]))
+        for expense in expenses_to_add
+    })
+    save_sync_state(db, new_last_expense_id, row_count, last_month, last_date)
 
     logger.info("Синхронизация завершена.")
 
 
+def bootstrap_sync_state(db):
+    """
+    Первая синхронизация: читает таблицу целиком и сохраняет курсор и строки расходов.
+    """
+    existing_rows = get_expenses_worksheet().get_all_values()
+
+    last_month = None
+    last_date = None
+    if (existing_rows and len(existing_rows) > 0 and len(existing_rows[0]) > 0):
+        # Вычисляем последний месяц и дату
+        last_month, last_date = get_last_month_and_date([row[0] for row in existing_rows])
+
+    rows = {}
+    for row_num, row in enumerate(existing_rows[1:], start=2):  # Пропускаем заголовок
+        if len(row) < 9 or not row[8].strip().isdigit():
+            continue
+        sheet_category = row[5] if len(row) > 5 else ""
+        rows[int(row[8].strip())] = (row_num, get_category_checksum(sheet_category))
+
+    clear_row_checksums(db)  # Строки удалённых из таблицы расходов больше не нужны
+    save_row_checksums(db, rows)
+    logger.info(f"Курсор синхронизации создан по {len(existing_rows)} строкам таблицы")
+    return save_sync_state(db, max(rows, default=0), len(existing_rows), last_month, last_date)
+
+
+def get_category_checksum(category):
+    """
+    Контрольная сумма категории в строке таблицы ("Не указана" равна пустой ячейке).
+    """
+    category = "" if category == "Не указана" else deep_clean_string(category) or ""
+    return hashlib.md5(category.encode()).hexdigest()
+
+
 def get_last_month_and_date(existing_rows):
     """
     Функция для извлечения последнего месяца и последней даты из строк таблицы,
@@ -205,49 +287,68 @@ def get_expenses_to_add(existing_expenses, expenses_data, last_date):
     return expenses_to_add
 
 
-def update_existing_categories(db, existing_rows, timezone_str):
+def update_existing_categories(db, db_expenses):
     """
-    Обновляет категории в существующих строках на основе переданных keywords.
+    Обновляет категории в уже выгруженных строках, если категория в БД
+    не совпадает с сохранённой контрольной суммой. Из таблицы читаются только ID
+    в изменяемых строках. Возвращает False, если строки в таблице сдвинулись
+    (ничего не записано, номера строк нужно пересоздать).
     """
-    unix_range_start, unix_range_end = get_period_range(timezone=timezone_str, period="3month")
-    db_expenses = get_expenses_from_db(
-        db=db,
-        unix_range_start=unix_range_start,
-        unix_range_end=unix_range_end,
-        sort_order='asc'
-    )["expenses"]
+    row_checksums = get_row_checksums(db, [expense["id"] for expense in db_expenses if expense.get("id")])
 
-    db_categories = {
-        str(expense["id"]): expense["category"] 
-        for expense in db_expenses
-        if expense.get("id") and expense.get("category")
-    }
+    category_cells = {}
+    changed_rows = {}
 
-    updates = []
-    
-    for row_num, row in enumerate(existing_rows[1:], start=2):  # Пропускаем заголовок
-        if len(row) < 9 or not row[8]:
+    for expense in db_expenses:
+        if expense.get("id") not in row_checksums:
             continue
 
-        expense_id = row[8].strip()
-        sheet_category = row[5] if len(row) > 5 else "" 
-        db_category = db_categories.get(expense_id) if not db_categories.get(expense_id) == "Не указана" else ""
+        row_num, checksum = row_checksums[expense["id"]]
+        db_category = expense.get("category") if not expense.get("category") == "Не указана" else ""
+        db_checksum = get_category_checksum(db_category)
 
-        # Если категория в БД существует и отличается от той, что в таблице
-        if deep_clean_string(db_category) != deep_clean_string(sheet_category):
-            updates.append({
-                "range": f"F{row_num}",
-                "values": [[db_category]]
-            })
+        # Если категория в БД отличается от той, что в таблице
+        if db_checksum != checksum:
+            category_cells[row_num] = db_category
+            changed_rows[expense["id"]] = (row_num, db_checksum)
 
-    if updates:
+    if category_cells:
         try:
-            worksheet.batch_update(updates, value_input_option="USER_ENTERED")
-            logger.info(f"Обновлено {len(updates)} категорий в Google Sheets")
+            worksheet = get_expenses_worksheet()
+            expected_ids = {row_num: expense_id for expense_id, (row_num, _) in changed_rows.items()}
+            if not check_row_ids(worksheet, expected_ids):
+                logger.warning("Строки расходов в Google Sheets сдвинулись, номера строк будут пересозданы")
+                return False
+
+            # Соседние ячейки объединяются в один диапазон
+            updates = coalesce_column_updates(category_cells, "F")
+            for updates_chunk in split_updates(updates):
+                call_with_backoff(worksheet.batch_update, updates_chunk, value_input_option="USER_ENTERED")
+            save_row_checksums(db, changed_rows)
+            logger.info(f"Обновлено {len(category_cells)} категорий в Google Sheets")
         except Exception as e:
             logger.error(f"Ошибка при обновлении категорий: {str(e)}")
     else:
         logger.info("Не найдено расхождений в категориях между БД и Google Sheets")
+    return True
+
+
+def check_row_ids(worksheet, expected_ids):
+    """
+    Проверяет одним запросом, что в строках таблицы по-прежнему стоят ожидаемые ID расходов
+    (столбец I). Строки могли вставить, удалить или отсортировать вручную.
+    :param expected_ids: Словарь {номер строки: id расхода}
+    """
+    runs = get_row_runs(sorted(expected_ids))
+    value_ranges = call_with_backoff(worksheet.batch_get, [f"I{start}:I{end}" for start, end in runs])
+
+    for (start, end), values in zip(runs, value_ranges):
+        for row_num in range(start, end + 1):
+            offset = row_num - start
+            cell = values[offset][0].strip() if offset < len(values) and values[offset] else ""
+            if cell != str(expected_ids[row_num]):
+                return False
+    return True
 
 
 def deep_clean_string(s):
@@ -258,9 +359,17 @@ def deep_clean_string(s):
     return ' '.join(cleaned.split())
 
 
-def get_updates_to_table(existing_rows, expenses_to_add, last_month, last_date):
-    row_index = len(existing_rows) + 1  # Начальный индекс строки (без заголовка)
-    updates = []
+def get_updates_to_table(row_count, expenses_to_add, last_month, last_date):
+    """
+    Формирует обновления таблицы для новых расходов: строки идут подряд с первой свободной,
+    поэтому записываются сплошными блоками A{n}:I{m} с полными значениями строк.
+    Возвращает (обновления, {id расхода: номер строки}, номера строк с датами,
+    число строк, последний месяц, последний день).
+    """
+    first_row = row_count + 1  # Первая свободная строка
+    rows = []
+    expense_rows = {}
+    date_rows = []
 
     for expense in expenses_to_add:
         date = datetime.strptime(expense[0], "%d %B %Y")  # Берём только дату без времени
@@ -271,28 +380,94 @@ def get_updates_to_table(existing_rows, expenses_to_add, last_month, last_date):
 
         # Если месяц изменился — записываем его
         if month != last_month:
-            updates.append({"range": f"A{row_index}:H{row_index}", "values": [[month] + [""]*7]})
-            row_index += 1
+            rows.append([month] + [""]*8)
             last_month = month
 
         # Если день изменился — записываем "02 февраля"
         if day != last_date:
-            updates.append({"range": f"A{row_index}:H{row_index}", "values": [[date] + [""]*7]})
-            row_index += 1
+            rows.append([date] + [""]*8)
+            date_rows.append(first_row + len(rows) - 1)
             last_date = day
 
-        # Формируем список обновлений
-        updates += [
-            {"range": f"B{row_index}", "values": [[expense[1]]]},  # Карта
-            {"range": f"C{row_index}", "values": [[expense[2]]]},  # Сумма
-            {"range": f"D{row_index}", "values": [[expense[3]]]},  # Описание
-            {"range": f"I{row_index}", "values": [[expense[8]]]},  # id
-        ]
+        # Карта, сумма, описание, статья, категория, уточнение, комментарий, id
+        category = expense[5] if expense[5] != "Не указана" else ""
+        rows.append(["", expense[1], expense[2], expense[3], expense[4], category, expense[6], expense[7], expense[8]])
+        expense_rows[expense[8]] = first_row + len(rows) - 1
 
-        if expense[5] != "Не указана":
-            updates.append({"range": f"F{row_index}", "values": [[expense[5]]]})
+    updates = [
+        {"range": f"A{block_start}:I{block_start + len(block) - 1}", "values": block}
+        for block_start, block in (
+            (first_row + offset, rows[offset:offset + SHEETS_MAX_ROWS_PER_RANGE])
+            for offset in range(0, len(rows), SHEETS_MAX_ROWS_PER_RANGE)
+        )
+    ]
 
+    return updates, expense_rows, date_rows, row_count + len(rows), last_month, last_date
+
+
+def coalesce_rows(row_numbers, first_column, last_column):
+    """
+    Объединяет номера строк в диапазоны из соседних строк, например [3, 4, 5, 9] -> ["A3:I5", "A9:I9"].
+    """
+    ranges = []
+    for start, end in get_row_runs(sorted(set(row_numbers))):
+        ranges.append(f"{first_column}{start}:{last_column}{end}")
+    return ranges
 
-        row_index += 1
-    
-    return updates
\ No newline at end of file
+
+def coalesce_column_updates(cells, column):
+    """
+    Объединяет значения ячеек одного столбца {номер строки: значение} в обновления по соседним строкам.
+    """
+    updates = []
+    for start, end in get_row_runs(sorted(cells)):
+        updates.append({
+            "range": f"{column}{start}:{column}{end}",
+            "values": [[cells[row_num]] for row_num in range(start, end + 1)]
+        })
+    return updates
+
+
+def get_row_runs(sorted_rows):
+    """
+    Разбивает отсортированные номера строк на отрезки из идущих подряд строк.
+    """
+    runs = []
+    for row_num in sorted_rows:
+        if runs and row_num == runs[-1][1] + 1:
+            runs[-1][1] = row_num
+        else:
+            runs.append([row_num, row_num])
+    return [tuple(run) for run in runs]
+
+
+def split_updates(updates, max_cells=SHEETS_MAX_CELLS_PER_REQUEST):
+    """
+    Делит обновления на части, чтобы один запрос batch_update не превышал max_cells ячеек.
+    """
+    chunk, chunk_cells = [], 0
+    for update in updates:
+        cells = sum(len(row) for row in update["values"])
+        if chunk and chunk_cells + cells > max_cells:
+            yield chunk
+            chunk, chunk_cells = [], 0
+        chunk.append(update)
+        chunk_cells += cells
+    if chunk:
+        yield chunk
+
+
+def call_with_backoff(method, *args, retries: int = 5, **kwargs):
+    """
+    Вызывает метод gspread, при превышении квоты или ошибке сервера повторяет с экспоненциальной паузой.
+    """
+    for attempt in range(retries):
+        try:
+            return method(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            status = e.response.status_code if e.response is not None else None
+            if attempt == retries - 1 or not (status == 429 or (status and status >= 500)):
+                raise
+            delay = 2 ** attempt + random.random()
+            logger.warning(f"Google Sheets вернул {status}, повтор через {delay:.1f} с")
+            time.sleep(delay)
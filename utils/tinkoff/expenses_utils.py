@@ -2,18 +2,17 @@
 
 # Стандартные модули Python
 import os
-import csv
-import time
 import asyncio
-from datetime import datetime
+import csv
+import uuid
+import codecs
+from collections import defaultdict
 
 # Сторонние модули
 from fastapi import HTTPException
 import aiofiles
 from playwright.async_api import Page
-import pytz
 from fuzzywuzzy import fuzz
-import chardet
 
 # Собственные модули
 import config as config
@@ -22,16 +21,33 @@ from utils.tinkoff.browser_manager import BrowserManager
 from utils.tinkoff.browser_utils import (
     PageType,
     detect_page_type,
-    click_button
+    click_button,
+    wait_for_page_ready
 )
 
-from routes.directory.tinkoff.expenses import save_expenses_to_db
-
-from routes.auth_tinkoff import (
-    save_browser_cache,
-    check_for_page
+from utils.tinkoff.category_model import get_category_model
+from utils.tinkoff.time_utils import (
+    DATE_TIME_FORMAT,
+    parse_date_time,
+    get_local_datetime_from_unix,
+    get_unix_time_ms_from_local_datetime
 )
 
+from routes.directory.tinkoff.expenses import save_expenses_to_db_async
+from routes.directory.tinkoff.keywords import get_expense_categorizer_async
+
+from routes.auth_tinkoff import check_for_page
+
+
+# Размер начала файла, по которому определяется кодировка выгрузки
+CSV_ENCODING_SNIFF_SIZE = 4096
+# Размер куска, которым читается выгрузка
+CSV_CHUNK_SIZE = 64 * 1024
+# Часовой пояс, в котором банк выгружает время операций
+BANK_TIMEZONE = "Europe/Moscow"
+# Категория операций, которые не считаются парой взаимного перевода
+TRANSFERS_CATEGORY = "Переводы"
+
 
 async def load_expenses_from_site(browser, unix_range_start, unix_range_end, db, time_zone):
     """
@@ -48,14 +64,8 @@ async def load_expenses_from_site(browser, unix_range_start, unix_range_end, db,
         except Exception:
             raise HTTPException(status_code=500, detail="Ошибка при переходе на страницу расходов.")
 
-        # Перенаправление на страницу по периоду и скачивание CSV
-        if await expenses_redirect(browser.page, unix_range_start, unix_range_end):
-            await save_browser_cache()
-            time.sleep(1)  # Ожидание после перенаправления
-        
-        start_time = time.time()
-        await download_csv_from_expenses_page(browser.page, 20)
-        file_path = await wait_for_new_download(start_time=start_time, timeout=20)
+        # Скачивание CSV за период (через API, при ошибке - через страницу)
+        file_path = await download_expenses_csv(browser, unix_range_start, unix_range_end, 20)
 
         # Обработка CSV и сохранение в БД
         expenses = await get_json_expenses_from_csv(db, file_path, time_zone)
@@ -70,35 +80,75 @@ async def load_expenses_from_site(browser, unix_range_start, unix_range_end, db,
         raise HTTPException(status_code=500, detail="Ошибка при загрузке расходов с Тинькофф")
 
 
-async def download_csv_from_expenses_page(page: Page, timeout=5):
+async def download_expenses_csv(browser: BrowserManager, unix_range_start, unix_range_end, timeout=20):
     """
-    Загружает CSV файл со страницы расходов.
+    Скачивает CSV с расходами за период и возвращает путь к файлу.
+    Сначала пробует один запрос к API банка, при ошибке выгружает через страницу расходов.
     """
-    await click_button(page, '[data-qa-id="export"]', timeout)
-    await click_button(page, '//span[text()="Выгрузить все операции в CSV"]', timeout)
+    try:
+        return await download_csv_from_api(browser, unix_range_start, unix_range_end, timeout)
+    except Exception as e:
+        print(f"Не удалось выгрузить CSV через API, выгрузка через страницу: {e}")
+
+    # Перенаправление на страницу по периоду и скачивание CSV
+    if await expenses_redirect(browser.page, unix_range_start, unix_range_end):
+        await browser.save_browser_cache()
+        await wait_for_page_ready(browser.page)  # Ожидание загрузки после перенаправления
+
+    return await download_csv_from_expenses_page(browser.page, timeout)
 
 
-async def wait_for_new_download(start_time=None, timeout=10):
+async def download_csv_from_api(browser: BrowserManager, unix_range_start, unix_range_end, timeout=20):
     """
-    Ожидает загрузки первого файла, созданного после времени `start_time`.
+    Выгружает CSV напрямую из API банка с куками авторизованного контекста.
     """
-    if not start_time:
-        start_time = time.time()
-
-    end_time = start_time + timeout
-    while time.time() < end_time:
-        # Проверяем файлы в директории загрузок
-        for filename in os.listdir(config.DOWNLOAD_DIRECTORY):
-            file_path = os.path.join(config.DOWNLOAD_DIRECTORY, filename)
-            
-            # Проверяем, что файл был создан после `start_time`
-            if os.path.getmtime(file_path) > start_time:
-                # Проверяем, чтобы файл не был временным (с расширением .crdownload)
-                if not filename.endswith('.crdownload'):
-                    return file_path  # Возвращаем путь к загруженному файлу
-        
-        await asyncio.sleep(0.5)  # Ждём, чтобы не перегружать процессор
-    raise TimeoutError(f"Новый файл не был загружен в течение {timeout} секунд.")
+    cookies = await browser.context.cookies(config.EXPENSES_EXPORT_API_URL)
+    session_id = next(
+        (cookie["value"] for cookie in cookies if cookie["name"] == config.EXPENSES_EXPORT_SESSION_COOKIE),
+        None
+    )
+    if not session_id:
+        raise ValueError("В контексте браузера нет сессии для выгрузки через API")
+
+    response = await browser.context.request.get(
+        config.EXPENSES_EXPORT_API_URL,
+        params={
+            "format": "csv",
+            "sessionid": session_id,
+            "start": unix_range_start,
+            "end": unix_range_end
+        },
+        timeout=timeout * 1000
+    )
+    if not response.ok:
+        raise Exception(f"API выгрузки вернуло код {response.status}")
+
+    # При истёкшей сессии API отвечает JSON с ошибкой, а не CSV
+    content_type = response.headers.get("content-type", "")
+    if "json" in content_type or "html" in content_type:
+        raise Exception(f"API выгрузки вернуло {content_type} вместо CSV")
+
+    file_path = os.path.join(browser.download_dir, f"operations_{uuid.uuid4().hex}.csv")
+    async with aiofiles.open(file_path, mode='wb') as file:
+        await file.write(await response.body())
+
+    browser.reset_interaction_time()
+    return file_path
+
+
+async def download_csv_from_expenses_page(page: Page, timeout=5):
+    """
+    Загружает CSV файл со страницы расходов и возвращает путь к скачанному файлу.
+    """
+    await click_button(page, '[data-qa-id="export"]', timeout)
+
+    # Ждём событие загрузки, которое вызывает именно этот клик
+    async with page.expect_download(timeout=timeout * 1000) as download_info:
+        await click_button(page, '//span[text()="Выгрузить все операции в CSV"]', timeout)
+    download = await download_info.value
+
+    # path() дожидается окончания загрузки
+    return await download.path()
 
 
 async def expenses_redirect(page: Page, unix_range_start: str, unix_range_end: str):
@@ -135,123 +185,205 @@ async def get_json_expenses_from_csv(db, file_path, target_timezone):
     """
     Обрабатывает CSV в JSON по заданному пути к файлу.
     """
-    total_expense = 0.0
-    categorized_expenses = []
+    # Построчное чтение CSV-файла
+    transactions = await parse_transactions(read_csv_rows(file_path), target_timezone)
+
+    os.remove(file_path)
+
+    # Расходы без взаимных переводов сохраняются в БД пачками, новым расходам категория
+    # проставляется по ключевым словам или моделью категорий
+    # Чтение и разбор файла модели - в отдельном потоке, а не в цикле событий внутри run_sync
+    model = await asyncio.to_thread(get_category_model, config.CATEGORY_MODEL_PATH)
+    classifier = await get_expense_categorizer_async(db, model, config.CATEGORY_MODEL_THRESHOLD)
+    saved_expenses = await save_expenses_to_db_async(
+        db, iter_expenses(transactions), target_timezone, classifier=classifier
+    )
+
+    total_expense = sum(saved_expense["amount"] for saved_expense in saved_expenses)
+    unique_cards = list({saved_expense["card_number"] for saved_expense in saved_expenses})
+
+    return {
+        "total_expense": total_expense,
+        "cards": unique_cards,
+        "expenses": saved_expenses
+    }
+
+
+def detect_csv_encoding(prefix: bytes) -> str:
+    """
+    Определяет кодировку выгрузки по началу файла (банк выгружает только в utf-8 или cp1251).
+    """
+    if prefix.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+
+    try:
+        # final=False, чтобы не упасть на символе, обрезанном концом префикса
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+async def read_csv_lines(file, chunk_size: int = CSV_CHUNK_SIZE):
+    """
+    Читает текстовый файл кусками и отдаёт его построчно.
+    """
+    tail = ""
+    while chunk := await file.read(chunk_size):
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line
+
+    if tail:
+        yield tail
 
-    await asyncio.sleep(0.5)
 
-    # Чтение CSV-файла
+async def read_csv_rows(file_path):
+    """
+    Построчно читает CSV-выгрузку и отдаёт строки в виде словарей {заголовок: значение}.
+    """
     async with aiofiles.open(file_path, mode='rb') as file:
-        content = await file.read()
-            
-        # Автоматическое определение кодировки
-        detected_encoding = chardet.detect(content)['encoding']
-        decoded_content = content.decode(detected_encoding or 'utf-8', errors='replace')
-
-        # Разделяем содержимое на строки
-        lines = decoded_content.splitlines()
-        
-        # Читаем заголовки из первой строки
-        headers = [header.strip('"') for header in lines[0].strip().split(';')]
-        
-        reader = csv.DictReader(
-            lines[1:],
-            delimiter=';',
-            fieldnames=headers,
-            quotechar='"'
-        )
-        
-        transactions = []
-        for row in reader:
-            amount = float(row["Сумма платежа"].replace(",", "."))
-            description = row["Описание"]
-            status = row["Статус"]
-            date = row["Дата платежа"]
-
-            # Проверка на "Перевод между счетами"
-            if ( 
-                description == "Перевод между счетами" 
-                or description == "Пополнение брокерского счета"
-                or description == "Оплата покупки в рассрочку"
-                or not status == "OK"
-                or date == ""
-            ):
+        prefix = await file.read(CSV_ENCODING_SNIFF_SIZE)
+    encoding = detect_csv_encoding(prefix)
+
+    async with aiofiles.open(file_path, mode='r', encoding=encoding, errors='replace') as file:
+        headers = None
+        record = ""
+
+        async for line in read_csv_lines(file):
+            record = f"{record}\n{line}" if record else line
+
+            # Нечётное число кавычек - поле в кавычках продолжается на следующей строке
+            if record.count('"') % 2:
                 continue
 
-            # Конвертация времени
-            msk_time = datetime.strptime(row["Дата операции"], "%d.%m.%Y %H:%M:%S")
-            msk_timezone = pytz.timezone("Europe/Moscow")
-            timezone = pytz.timezone(target_timezone) if isinstance(target_timezone, str) else target_timezone
-            utc_time = msk_timezone.localize(msk_time).astimezone(timezone)
-
-            transactions.append({
-                "datetime": utc_time.replace(tzinfo=None),
-                "card": row["Номер карты"],
-                "amount": amount,
-                "description": description,
-                "category": row["Категория"]
-            })
-        # Сортируем транзакции по дате и времени
-        transactions.sort(key=lambda x: x["datetime"], reverse=True)
-
-        i = 0
-        while i < len(transactions) - 1:
-            current = transactions[i]
-            next_transaction = transactions[i + 1]
-
-            transaction_time = current["datetime"].replace(second=0)
-            next_transaction_time = next_transaction["datetime"].replace(second=0)
-
-            # Проверка на дублирующие записи
-            if (
-                fuzz.token_sort_ratio(current["description"], next_transaction["description"]) > 70  # Если сходство описаний больше 70%
-                and abs((next_transaction_time - transaction_time).total_seconds()) <= 60  # Если разница не больше минуты
-                and abs(current["amount"]) == abs(next_transaction["amount"])  # Если одинаковая стоимость
-                and (current["amount"] * next_transaction["amount"] < 0)  # Если одно из чисел - отрицательное
-                and current["category"] != "Переводы"
-            ):
-                # Если текущая и следующая транзакции совпадают по условиям, удаляем обе
-                i += 2  # Пропускаем обе записи
+            values = next(csv.reader([record], delimiter=';', quotechar='"'), None)
+            record = ""
+
+            if not values:
                 continue
 
-            # Обработка текущей транзакции как расхода
-            if current["amount"] < 0:
-                current["category"] = None
-                total_expense += abs(current["amount"])
-
-                categorized_expenses.append({
-                    "date_time": current["datetime"].strftime("%d.%m.%Y %H:%M:%S"),
-                    "card_number": current["card"],
-                    "transaction_type": "расход",
-                    "amount": abs(current["amount"]),
-                    "description": current["description"],
-                    "category": "Не указана"
-                })
-            i += 1
-
-        # Проверка последнего элемента, если он не был частью пары для удаления
-        if i == len(transactions) - 1:
-            last_transaction = transactions[i]
-            if last_transaction["amount"] < 0:
-                total_expense += abs(last_transaction["amount"])
-
-                categorized_expenses.append({
-                    "date_time": last_transaction["datetime"].strftime("%d.%m.%Y %H:%M:%S"),
-                    "card_number": last_transaction["card"],
-                    "transaction_type": "расход",
-                    "amount": abs(last_transaction["amount"]),
-                    "description": last_transaction["description"],
-                    "category": "Не указана"
-                })
-        
-        unique_cards = list({categorized_expense["card_number"] for categorized_expense in categorized_expenses})
+            # Заголовки берутся из первой строки
+            if headers is None:
+                headers = [header.strip() for header in values]
+                continue
 
-    os.remove(file_path)
+            yield dict(zip(headers, values))
 
-    saved_expenses = save_expenses_to_db(db, categorized_expenses, target_timezone)
 
+async def parse_transactions(rows, target_timezone):
+    """
+    Отбирает нужные операции из строк выгрузки и возвращает их отсортированными от поздних к ранним.
+    """
+    transactions = []
+    async for row in rows:
+        amount = float(row["Сумма платежа"].replace(",", "."))
+        description = row["Описание"]
+        status = row["Статус"]
+        date = row["Дата платежа"]
+
+        # Проверка на "Перевод между счетами"
+        if ( 
+            description == "Перевод между счетами" 
+            or description == "Пополнение брокерского счета"
+            or description == "Оплата покупки в рассрочку"
+            or not status == "OK"
+            or date == ""
+        ):
+            continue
+
+        # Конвертация времени (банк выгружает время по Москве)
+        timestamp = get_unix_time_ms_from_local_datetime(parse_date_time(row["Дата операции"]), BANK_TIMEZONE)
+
+        transactions.append({
+            "timestamp": timestamp,
+            "datetime": get_local_datetime_from_unix(timestamp, target_timezone),
+            "card": row["Номер карты"],
+            "amount": amount,
+            "description": description,
+            "category": row["Категория"]
+        })
+
+    # Сортируем транзакции по дате и времени
+    transactions.sort(key=lambda x: x["timestamp"], reverse=True)
+    return transactions
+
+
+def format_expense(transaction):
     return {
-        "total_expense": total_expense,
-        "cards": unique_cards,
-        "expenses": saved_expenses
-    }
\ No newline at end of file
+        "timestamp": transaction["timestamp"],
+        "date_time": transaction["datetime"].strftime(DATE_TIME_FORMAT),
+        "card_number": transaction["card"],
+        "transaction_type": "расход",
+        "amount": abs(transaction["amount"]),
+        "description": transaction["description"],
+        "category": "Не указана"
+    }
+
+
+def get_transaction_minute(transaction):
+    """
+    Номер минуты операции (для группировки операций по времени).
+    """
+    return transaction["timestamp"] // 60000
+
+
+def is_transfer_pair(current, other):
+    """
+    Проверяет, что две операции на одинаковую сумму являются взаимным переводом.
+    """
+    return (
+        current["amount"] * other["amount"] < 0  # Если одно из чисел - отрицательное
+        and current["category"] != TRANSFERS_CATEGORY
+        and fuzz.token_sort_ratio(current["description"], other["description"]) > 70  # Если сходство описаний больше 70%
+    )
+
+
+def find_transfer_pairs(transactions):
+    """
+    Находит взаимные переводы в отсортированных от поздних к ранним транзакциях.
+    Операции группируются по (сумма, минута), описания сравниваются только внутри группы
+    и соседней минуты, поэтому пары находятся и между несвязанными операциями.
+    Возвращает множество индексов операций, попавших в пары.
+    """
+    paired = set()
+    buckets = defaultdict(list)  # (сумма, минута) -> индексы операций без пары
+
+    for i, transaction in enumerate(transactions):
+        amount = abs(transaction["amount"])
+        minute = get_transaction_minute(transaction)
+
+        # Уже просмотренные операции не раньше текущей, поэтому смотрим её минуту и следующую
+        partner = None
+        for bucket_minute in (minute, minute + 1):
+            bucket = buckets.get((amount, bucket_minute))
+            if not bucket:
+                continue
+
+            # Сначала ближайшие по времени кандидаты
+            for position in range(len(bucket) - 1, -1, -1):
+                if is_transfer_pair(transactions[bucket[position]], transaction):
+                    partner = bucket.pop(position)
+                    break
+
+            if partner is not None:
+                break
+
+        if partner is None:
+            buckets[(amount, minute)].append(i)
+        else:
+            paired.update((partner, i))
+
+    return paired
+
+
+def iter_expenses(transactions):
+    """
+    Отдаёт расходы из отсортированных транзакций, пропуская взаимные переводы.
+    """
+    paired = find_transfer_pairs(transactions)
+
+    for i, transaction in enumerate(transactions):
+        if i not in paired and transaction["amount"] < 0:
+            yield format_expense(transaction)
@@ -1,7 +1,7 @@
 # utils/tinkoff/fixed_time_import_expenses.py
 
 # Стандартные модули Python
-import time
+import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
 import pytz
@@ -12,23 +12,22 @@ from fastapi import HTTPException
 # Собственные модули
 import config
 
-from database import Session
+from database import AsyncSessionLocal, Session
 
-from routes.directory.tinkoff.errors import set_last_error
-from routes.directory.tinkoff.scheduler import get_import_times
-from routes.directory.tinkoff.temporary_codes import get_temporary_code
+from routes.directory.tinkoff.errors import set_last_error_async
+from routes.directory.tinkoff.scheduler import get_import_times_async
+from routes.directory.tinkoff.temporary_codes import get_temporary_code_async
 
+from utils.loop_lag_monitor import loop_lag_monitor
 from utils.tinkoff.time_utils import get_period_range
-from utils.tinkoff.browser_manager import BrowserManager
 from utils.tinkoff.expenses_google_sheets import sync_expenses_to_sheet_no_id
+from utils.tinkoff.browser_pool import BrowserPool
 from utils.tinkoff.browser_utils import PageType, detect_page_type
 from utils.tinkoff.browser_input_utils import otp_page, check_for_error_message
 from utils.tinkoff.send_notifications import send_error_notification, send_expense_notification
 from utils.tinkoff.expenses_utils import (
-    expenses_redirect,
-    download_csv_from_expenses_page,
-    get_json_expenses_from_csv,
-    wait_for_new_download
+    download_expenses_csv,
+    get_json_expenses_from_csv
 )
 
 from auth import verify_bot_token
@@ -41,7 +40,7 @@ logger = logging.getLogger(__name__)
 moscow_tz = pytz.timezone("Europe/Moscow")
 
 
-async def resume_load_expenses(db, token):
+async def resume_load_expenses(token):
     # Получаем текущее время в Москве
     now = datetime.now(moscow_tz)
 
@@ -51,7 +50,8 @@ async def resume_load_expenses(db, token):
     error_date = datetime.fromtimestamp(auth_date, moscow_tz).date()
 
     # Получаем времена из базы
-    schedule_time = get_import_times(db)
+    async with AsyncSessionLocal() as db:
+        schedule_time = await get_import_times_async(db)
     expense_time = schedule_time["expenses"]
     full_time = schedule_time["full"]
 
@@ -76,27 +76,31 @@ async def resume_load_expenses(db, token):
 
 
 
-async def load_expenses(export_type: str):
+async def load_expenses(export_type: str, browser_pool: BrowserPool | None = None):
     """
     Загружает расходы и отправляет пользователям уведомления.
+    browser_pool - пул браузера для задачи вне цикла событий приложения (по умолчанию общий config.browser_pool).
     """
+    browser_pool = browser_pool or config.browser_pool
     logger.info(f"Начата автозагрузка расходов (Время (UTC): {datetime.now(timezone.utc).strftime('%d.%m.%Y %H:%M:%S')})  |  тип выгрузки: {export_type}")
     retries = 3
     attempts_completed = 0
     last_error = ""
-    db, browser = None, None
     while attempts_completed < retries:
         try:
-            db, browser = await setup_browser_and_db()
-            await go_to_expenses(browser, db)
-            expenses = await fetch_expenses(browser, db)
-            if export_type == "expenses":
-                send_expense_notification(db)
-            elif export_type == "full":
-                sync_expenses_to_sheet_no_id(db)
-            elif export_type == "all":
-                send_expense_notification(db)
-                sync_expenses_to_sheet_no_id(db)
+            async with AsyncSessionLocal() as db:
+                # Аренда тёплого общего браузера вместо запуска нового
+                async with loop_lag_monitor.measure("Автозагрузка расходов"), browser_pool.lease() as browser:
+                    await go_to_expenses(browser, db)
+                    expenses = await fetch_expenses(browser, db)
+                # Синхронизация с таблицей (с паузами при превышении квоты) выполняется вне цикла событий
+                if export_type == "expenses":
+                    await send_expense_notification(db)
+                elif export_type == "full":
+                    await asyncio.to_thread(sync_expenses_to_sheet)
+                elif export_type == "all":
+                    await send_expense_notification(db)
+                    await asyncio.to_thread(sync_expenses_to_sheet)
             logger.info(f"Успешно завершена автозагрузка расходов (Время (UTC): {datetime.now(timezone.utc).strftime('%d.%m.%Y %H:%M:%S')})")
             return
         except ValueError as e:
@@ -105,11 +109,9 @@ async def load_expenses(export_type: str):
         except Exception as e:
             last_error = e
             attempts_completed += 1
-        finally:
-            await cleanup(browser, db)
             
     logger.warning(f"Автозагрузка расходов завершена с ошибкой (Время (UTC): {datetime.now(timezone.utc).strftime('%d.%m.%Y %H:%M:%S')}) : ${last_error}")
-    await handle_error(last_error, db, browser)
+    await handle_error(last_error)
 
 
 async def fetch_expenses(browser, db):
@@ -124,6 +126,7 @@ async def fetch_expenses(browser, db):
 
 async def go_to_expenses(browser, db):
     await browser.page.goto(config.EXPENSES_URL, timeout=30000)  # Переход на страницу расходов
+    await browser.log_page_load_timing("расходов (автозагрузка)")
     detected_type = await detect_page_type(browser, 40)  # Асинхронное определение типа страницы
 
     if detected_type:
@@ -132,7 +135,7 @@ async def go_to_expenses(browser, db):
             pass
         
         elif detected_type == PageType.LOGIN_OTP:
-            otp = get_temporary_code(db)
+            otp = await get_temporary_code_async(db)
 
             await otp_page(browser, otp)
             if await check_for_error_message(browser, 2):
@@ -147,33 +150,21 @@ async def go_to_expenses(browser, db):
         raise Exception("Проблема с определением типа страницы при автозагрузке расходов")
 
 
-async def setup_browser_and_db():
-    """
-    Подключает БД и браузер.
-    """
-    db = Session()
-    browser = BrowserManager(config.PATH_TO_CHROME_PROFILE, config.DOWNLOAD_DIRECTORY, config.BROWSER_TIMEOUT)
-    await browser.create_context_and_page()
-    return db, browser
-
-
-async def handle_error(error, db, browser):
+async def handle_error(error):
     """
     Логирование ошибок и уведомление.
     """
-    if db:
-        set_last_error(db, str(error))
-    send_error_notification(db)
+    async with AsyncSessionLocal() as db:
+        await set_last_error_async(db, str(error))
+        await send_error_notification(db)
 
 
-async def cleanup(browser, db):
+def sync_expenses_to_sheet():
     """
-    Закрывает браузер и соединение с БД.
+    Синхронизация с таблицей для запуска в отдельном потоке (со своей синхронной сессией).
     """
-    if browser:
-        await browser.close_browser()
-    if db:
-        db.close()
+    with Session() as db:
+        sync_expenses_to_sheet_no_id(db)
 
 
 async def load_expenses_from_site(browser, unix_range_start, unix_range_end, db, time_zone):
@@ -181,12 +172,8 @@ async def load_expenses_from_site(browser, unix_range_start, unix_range_end, db,
     Возвращает расходы с расходов Тинькофф.
     """
     try:
-        # Перенаправление на страницу по периоду и скачивание CSV
-        if await expenses_redirect(browser.page, unix_range_start, unix_range_end):
-            time.sleep(1)  # Ожидание после перенаправления
-        start_time = time.time()
-        await download_csv_from_expenses_page(browser.page, 20)
-        file_path = await wait_for_new_download(start_time=start_time, timeout=20)
+        # Скачивание CSV за период (через API, при ошибке - через страницу)
+        file_path = await download_expenses_csv(browser, unix_range_start, unix_range_end, 20)
 
         # Обработка CSV и сохранение в БД
         expenses = await get_json_expenses_from_csv(db, file_path, time_zone)
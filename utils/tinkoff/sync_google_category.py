@@ -1,22 +1,21 @@
 # utils/tinkoff/sync_google_category.py
 
-import asyncio
-import aiohttp
 import logging
 from datetime import datetime, timedelta
 import queue
 import threading
 from typing import Literal
 
-import gspread
+import requests
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.base import JobLookupError
 
-from routes.directory.tinkoff.categories import get_categories_from_db, update_expense_category
+from utils.google_clients import google_clients
+from routes.directory.tinkoff.categories import get_categories_from_db, update_expenses_categories
+from routes.directory.tinkoff.utils import async_counterpart
 
 from database import Session
 
-from config import GOOGLE_SHEETS_API_EXPENSES_SCRIPT, GOOGLE_SHEETS_URL
+from config import GOOGLE_SHEETS_API_EXPENSES_SCRIPT, GOOGLE_SHEETS_URL, GOOGLE_SHEETS_SYNC_FALLBACK_MINUTES
 
 
 
@@ -33,10 +32,8 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 scheduler = BackgroundScheduler()
-current_job = None
 
-_gsheets_client = None
-_gsheets_worksheet = None
+HIDDEN_SHEET_NAME = "HiddenChanges"
 
 
 def sync_worker():
@@ -82,15 +79,12 @@ def shutdown_sync():
     scheduler.shutdown()
 
 
-def init_gsheets():
-    global _gsheets_client, _gsheets_worksheet
-    _gsheets_client = gspread.service_account("credentials.json")
-    _gsheets_worksheet = _gsheets_client.open_by_url(GOOGLE_SHEETS_URL).worksheet("HiddenChanges")
+def get_hidden_worksheet():
+    """Возвращает скрытый лист с изменениями категорий (из общего реестра клиентов Google)."""
+    return google_clients.get_worksheet(GOOGLE_SHEETS_URL, title=HIDDEN_SHEET_NAME)
 
 
 def start_inactivity_scheduler():
-    init_gsheets()
-
     # Запускаем worker-поток
     worker_thread = threading.Thread(
         target=sync_worker,
@@ -99,103 +93,96 @@ def start_inactivity_scheduler():
     )
     worker_thread.start()
 
-    scheduler.start()  
-    schedule_next_run(immediate=True)
-
-def schedule_next_run(immediate=False):
-    global current_job
-    
-    # Удаляем предыдущую задачу если существует
-    if current_job and current_job in scheduler.get_jobs():
-        try:
-            scheduler.remove_job(current_job.id)
-        except Exception as e:
-            logger.debug(f"Задача уже удалена: {e}")
-    
-    # Определяем время следующего выполнения
-    if immediate:
-        next_run_time = datetime.now() + timedelta(seconds=30)
-    else:
-        next_run_time = datetime.now() + timedelta(minutes=3)  # Пауза 3 минуты
-    
-    # Создаем новую задачу
-    current_job = scheduler.add_job(
-        lambda: asyncio.run(check_for_inactivity()),
-        'date',
-        run_date=next_run_time,
-        max_instances=1
+    # Основной путь - вебхук от Apps Script, опрос остаётся редкой подстраховкой
+    scheduler.start()
+    scheduler.add_job(
+        check_for_inactivity,
+        'interval',
+        minutes=GOOGLE_SHEETS_SYNC_FALLBACK_MINUTES,
+        next_run_time=datetime.now() + timedelta(seconds=30),
+        max_instances=1,
+        coalesce=True
     )
 
-    logger.debug(f"Запланирована следующая проверка на {next_run_time}")
-
 
-async def check_for_inactivity():
+def check_for_inactivity():
+    """Резервная проверка накопленных в таблице изменений (на случай, если вебхук не дошёл)."""
     try:
-        async with aiohttp.ClientSession() as client:
-            async with client.get(
-                GOOGLE_SHEETS_API_EXPENSES_SCRIPT,
-                params={"action": "check_inactivity"},
-                timeout=aiohttp.ClientTimeout(total=60.0)
-            ) as response:
-                
-                if response.status == 200:
-                    response_text = (await response.text()).strip().lower()
-                    
-                    if response_text == "true: ready to process":
-                        print(response_text)
-                        print("Категории обновлены")
-                        get_categories_from_google_sheets()
-                        schedule_next_run(immediate=False)
-                    elif "no changes detected" in response_text:
-                        print("Нет изменений")
-                        schedule_next_run(immediate=False)
-                    elif "waiting period not passed" in response_text:
-                        print("Время ожидания не прошло")
-                        schedule_next_run(immediate=True)
-                    else:
-                        logger.warning(f"Неизвестный ответ от GAS: {response_text}")
-                        schedule_next_run(immediate=True)
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Ошибка запроса. Код: {response.status}\n{error_text}")
-                    schedule_next_run(immediate=True)
-    
+        response = requests.get(
+            GOOGLE_SHEETS_API_EXPENSES_SCRIPT,
+            params={"action": "check_inactivity"},
+            timeout=60
+        )
+
+        if response.status_code != 200:
+            logger.error(f"Ошибка запроса. Код: {response.status_code}\n{response.text}")
+            return
+
+        response_text = response.text.strip().lower()
+        if response_text == "true: ready to process":
+            logger.info("Вебхук не доставил изменения, забираем их опросом")
+            with sheets_lock:
+                get_categories_from_google_sheets()
+        elif "no changes detected" in response_text:
+            logger.debug("Нет изменений")
+        elif "waiting period not passed" in response_text:
+            logger.debug("Время ожидания не прошло")
+        else:
+            logger.warning(f"Неизвестный ответ от GAS: {response_text}")
+
     except Exception as e:
         logger.error(f"Ошибка проверки на неактивность: {str(e)}")
-        schedule_next_run(immediate=True)
+
+
+def apply_sheet_category_changes(db, changes):
+    """
+    Применяет изменения категорий из таблицы.
+    :param changes: Пары (название категории, ID расхода)
+    :return: Словарь {ID расхода: статус обновления}
+    """
+    db_categories = {category["category_name"].strip().lower(): category["id"] for category in get_categories_from_db(db)}
+
+    assignments = []
+    for category_name, expense_id in changes:
+        category_name = category_name.strip().lower()
+        if category_name in db_categories:
+            assignments.append((expense_id, db_categories[category_name]))
+        else:
+            logger.info(f"Категория {category_name} не нашлась в базе данных")
+
+    results = update_expenses_categories(db, assignments)
+    for expense_id, status in results.items():
+        if status != "updated":
+            logger.warning(f"Категория расхода {expense_id} не обновлена: {status}")
+
+    return results
+
+
+apply_sheet_category_changes_async = async_counterpart(apply_sheet_category_changes)
 
 
 def get_categories_from_google_sheets():
     db = Session()
     try:
-        db_categories = {category["category_name"].strip().lower(): category["id"] for category in get_categories_from_db(db)}
-
-        google_categories = get_hidden_sheet_categories()
-
-        for category_name, expense_id in google_categories.items():
-            if category_name in db_categories:
-                print(expense_id, db_categories[category_name])
-                update_expense_category(db, expense_id, db_categories[category_name])
-            else:
-                logger.info(f"Категория {category_name} не нашлась в базе данных")
+        apply_sheet_category_changes(db, get_hidden_sheet_categories())
     finally:
         db.close()
 
 
 def get_hidden_sheet_categories():
     try:
-        values = _gsheets_worksheet.get_all_values()
+        worksheet = get_hidden_worksheet()
+        values = worksheet.get_all_values()
 
         logger.info(values)
         
-        categories = {}
-        for value in values:
-            if value[3] and value[4]:
-                categories[value[3].strip().lower()] = value[4]
+        # Пары (категория, ID расхода): у нескольких расходов может оказаться одна категория
+        categories = [(value[3], value[4]) for value in values if value[3] and value[4]]
         
-        _gsheets_worksheet.clear()
+        worksheet.clear()
         
         return categories
     
     except Exception as e:
         logger.error("Ошибка при получении категорий из HiddenSheet: %s", str(e))
+        return []
@@ -1,7 +1,8 @@
 # utils/tinkoff/time_utils.py
 
 # Стандартные модули Python
-from datetime import timezone, datetime, timedelta
+from datetime import datetime, timedelta
+from functools import lru_cache
 
 # Сторонние модули
 import pytz
@@ -9,6 +10,70 @@ from pytz import UTC
 from dateutil.relativedelta import relativedelta
 
 
+# Формат даты и времени в выгрузках банка и ответах API
+DATE_TIME_FORMAT = "%d.%m.%Y %H:%M:%S"
+DATE_FORMAT = "%d.%m.%Y"
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+# Начало юникс времени (наивное UTC)
+EPOCH = datetime(1970, 1, 1)
+
+
+@lru_cache(maxsize=None)
+def get_timezone(timezone_str):
+    """
+    Возвращает объект часового пояса (объекты кэшируются).
+    """
+    return pytz.timezone(timezone_str) if isinstance(timezone_str, str) else timezone_str
+
+
+@lru_cache(maxsize=None)
+def get_fixed_utc_offset(timezone_str):
+    """
+    Для часовых поясов, у которых больше нет переходов на летнее/зимнее время, возвращает
+    кортеж (с какого локального времени смещение постоянно, смещение). Иначе None.
+    """
+    tz = get_timezone(timezone_str)
+    transition_times = getattr(tz, "_utc_transition_times", None)  # Внутренние поля pytz
+    transition_info = getattr(tz, "_transition_info", None)
+
+    if transition_times is None:
+        # Пояс без переходов (UTC, Etc/GMT+3 и т.п.)
+        return datetime.min, tz.utcoffset(EPOCH)
+
+    if not transition_times or not transition_info:
+        return None
+
+    last_transition = transition_times[-1]
+    if last_transition > datetime.utcnow():
+        return None  # Переходы ещё будут
+
+    offset = transition_info[-1][0]
+    if not isinstance(offset, timedelta):
+        return None
+    # Сутки запаса, чтобы не попасть в неоднозначное время последнего перехода
+    since = last_transition + offset + timedelta(days=1)
+
+    # Сверка с публичным API: если внутреннее устройство pytz изменится, работаем по медленному пути
+    for utc_dt in (since - offset, datetime.utcnow()):
+        if UTC.localize(utc_dt).astimezone(tz).utcoffset() != offset:
+            return None
+    return since, offset
+
+
+def parse_date_time(date_str: str) -> datetime:
+    """
+    Быстрый разбор строки формата "dd.mm.YYYY HH:MM:SS" в наивный datetime.
+    """
+    try:
+        return datetime(
+            int(date_str[6:10]), int(date_str[3:5]), int(date_str[0:2]),
+            int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19])
+        )
+    except ValueError:
+        return datetime.strptime(date_str, DATE_TIME_FORMAT)
+
+
 def get_period_range(timezone: str, range_start: str = None, range_end: str = None, period: str = 'month'):
     """
     Преобразовывает строковые значения периодов (как дефолтных, так и заданных) в юникс время.
@@ -26,7 +91,7 @@ def get_period_from_default_range(period, timezone):
     Преобразовывает дефолтные периоды в юникс время.
     """
     # Определяем текущую дату и время с учётом переданного часового пояса
-    tz = pytz.timezone(timezone)
+    tz = get_timezone(timezone)
     now = datetime.now(tz).replace(microsecond=0)
 
     if period == "day":
@@ -69,7 +134,7 @@ def get_period_from_range(range_start, range_end, user_timezone_name):
     """
     Преобразовывает заданные периоды в юникс время.
     """
-    user_timezone = pytz.timezone(user_timezone_name)  # Используем функцию timezone из pytz
+    user_timezone = get_timezone(user_timezone_name)
         
     # Преобразуем start_date и end_date в datetime с временной зоной пользователя
     start_datetime = user_timezone.localize(datetime.strptime(range_start, "%Y-%m-%d"))
@@ -89,33 +154,73 @@ def get_unix_time_ms_from_date(date):
     return int(date.astimezone(UTC).timestamp() * 1000)
 
 
+def get_unix_time_ms_from_local_datetime(local_dt: datetime, timezone_str: str) -> int:
+    """
+    Преобразовывает наивное локальное время часового пояса в юникс время (мс).
+    """
+    fixed_offset = get_fixed_utc_offset(timezone_str)
+    if fixed_offset and local_dt >= fixed_offset[0]:
+        return (local_dt - fixed_offset[1] - EPOCH) // timedelta(milliseconds=1)
+
+    localized_date = get_timezone(timezone_str).localize(local_dt)
+    return int(localized_date.timestamp() * 1000)
+
+
 def get_unix_time_ms_from_string(date_str: str, timezone_str: str) -> int:
     """
     Преобразовывает дату из строки + часовой пояс в юникс время.
     """
-    # Преобразование строки в объект datetime
-    date = datetime.strptime(date_str, "%d.%m.%Y %H:%M:%S")
-    
-    # Применение часового пояса
-    user_timezone = pytz.timezone(timezone_str)
-    localized_date = user_timezone.localize(date)
-    
-    # Преобразование в Unix-время в миллисекундах
-    unix_time_ms = int(localized_date.timestamp() * 1000)
-    
-    return unix_time_ms
+    return get_unix_time_ms_from_local_datetime(parse_date_time(date_str), timezone_str)
+
+
+def get_local_datetime_from_unix(unix_time_ms: int, timezone_str: str) -> datetime:
+    """
+    Преобразовывает юникс время (мс) в наивное локальное время часового пояса.
+    """
+    utc_dt = EPOCH + timedelta(milliseconds=unix_time_ms)
+
+    fixed_offset = get_fixed_utc_offset(timezone_str)
+    if fixed_offset and utc_dt + fixed_offset[1] >= fixed_offset[0]:
+        return utc_dt + fixed_offset[1]
+
+    user_timezone = get_timezone(timezone_str)
+    return UTC.localize(utc_dt).astimezone(user_timezone).replace(tzinfo=None)
 
 
 def convert_unix_to_local_datetime(unix_time_ms: int, timezone_str: str) -> str:
     """
     Преобразовывает юникс время в дату и время по часовому поясу.
     """
-    unix_time_sec = unix_time_ms / 1000
-    utc_dt = datetime.fromtimestamp(unix_time_sec, tz=timezone.utc)
-    
-    user_timezone = pytz.timezone(timezone_str)
-    local_dt = utc_dt.astimezone(user_timezone)
+    return get_local_datetime_from_unix(unix_time_ms, timezone_str).strftime(DATE_TIME_FORMAT)
+
 
-    formatted_dt = local_dt.strftime("%d.%m.%Y %H:%M:%S")
-    
-    return formatted_dt
\ No newline at end of file
+def format_unix_times(unix_times_ms, timezone_str: str) -> list:
+    """
+    Преобразовывает список юникс времён (мс) в строки DATE_TIME_FORMAT за один проход.
+    При постоянном смещении пояса время считается арифметикой, а дата форматируется один раз на день.
+    """
+    fixed_offset = get_fixed_utc_offset(timezone_str)
+    if not fixed_offset:
+        return [convert_unix_to_local_datetime(unix_time_ms, timezone_str) for unix_time_ms in unix_times_ms]
+
+    one_ms = timedelta(milliseconds=1)
+    offset_ms = fixed_offset[1] // one_ms
+    since_ms = (fixed_offset[0] - EPOCH) // one_ms
+
+    dates = {}
+    result = []
+    for unix_time_ms in unix_times_ms:
+        local_ms = unix_time_ms + offset_ms
+        if local_ms < since_ms:
+            result.append(convert_unix_to_local_datetime(unix_time_ms, timezone_str))
+            continue
+
+        day, ms_of_day = divmod(local_ms, MS_PER_DAY)
+        date = dates.get(day)
+        if date is None:
+            date = dates[day] = (EPOCH + timedelta(days=day)).strftime(DATE_FORMAT)
+
+        seconds = ms_of_day // 1000
+        result.append(f"{date} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}")
+
+    return result